@@ -0,0 +1 @@
+from .benchmarks import *
@@ -0,0 +1,28 @@
+import json
+import sys
+
+import tyro
+
+from .benchmarks import BenchmarkConfig, CompareConfig, compare_results, run_benchmarks, save_results
+
+
+# Usage (from the repository root):
+#     python -m benchmarks run --output ./benchmarks/baselines/baseline.json
+#     python -m benchmarks compare --baseline ./benchmarks/baselines/baseline.json
+if __name__ == "__main__":
+    cfg = tyro.extras.subcommand_cli_from_dict({"run": BenchmarkConfig,
+                                                "compare": CompareConfig})
+
+    if isinstance(cfg, BenchmarkConfig):
+        save_results(run_benchmarks(cfg), cfg.output)
+    else:
+        with open(cfg.baseline) as f:
+            baseline = json.load(f)
+        with open(cfg.current) as f:
+            current = json.load(f)
+
+        comparison = compare_results(baseline, current, cfg.threshold)
+        print(comparison)
+
+        if (comparison["status"] == "regression").any():
+            sys.exit(1)
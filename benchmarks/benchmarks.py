@@ -0,0 +1,251 @@
+import json
+import platform
+import tempfile
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Optional
+
+import mujoco
+import numpy as np
+import pandas as pd
+from matplotlib import pyplot as plt
+from mujoco._functions import mj_forward, mj_resetDataKeyframe
+from omegaconf import OmegaConf
+
+import dynamics as dyn
+import transformations as tf
+from core import (SimulationConfig, autoinstantiate, generate_model_data, get_element_id,
+                  get_inverse_dynamics, render, simulate)
+from main import Scorer
+from transformations import Poses
+from utilities import get_code_version
+
+
+plt.switch_backend("Agg")  # simulate() calls plt.show(), which must not block here
+
+
+@dataclass
+class BenchmarkConfig:
+    target_name: str = "wooden-tray-2"  # small and fixed so that runs are comparable
+    read_config: str = "./configurations/base.yaml"
+    seed: int = 0
+    repeat: int = 7  # number of timed rounds per benchmark
+    warmup: int = 1  # number of untimed rounds per benchmark
+    duration: float = 0.2  # [s], planner duration of the end-to-end simulation
+    fig_height: int = 128
+    fig_width: int = 128
+    n_frames: int = 60  # number of synthetic frames fed to Logger._process_split
+    n_replicas: int = 8  # number of manipulators of dyn.inverse_batch
+    only: list[str] = field(default_factory=list)  # run every benchmark if empty
+    output: str = "./benchmarks/baselines/latest.json"
+
+
+@dataclass
+class CompareConfig:
+    baseline: str
+    current: str = "./benchmarks/baselines/latest.json"
+    threshold: float = 0.1  # relative slow-down of the median flagged as a regression
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[..., Any]
+    number: int = 1  # calls per timed round
+    setup: Optional[Callable[[], tuple]] = None  # untimed, called before every round
+
+
+def measure(benchmark: Benchmark,
+            repeat: int,
+            warmup: int,
+            ) -> dict[str, float]:
+    """Time a benchmark and summarize the per-call wall-clock time in seconds."""
+
+    per_call = []
+    for i in range(warmup + repeat):
+        args = () if benchmark.setup is None else benchmark.setup()
+        start = perf_counter()
+        for _ in range(benchmark.number):
+            benchmark.func(*args)
+        elapsed = perf_counter() - start
+
+        if warmup <= i:
+            per_call.append(elapsed / benchmark.number)
+
+    per_call = np.array(per_call)
+    q1, median, q3 = np.percentile(per_call, [25, 50, 75])
+
+    return dict(median=median,
+                mean=per_call.mean(),
+                stdev=per_call.std(),
+                min=per_call.min(),
+                max=per_call.max(),
+                iqr=q3 - q1,
+                repeat=repeat,
+                number=benchmark.number,
+                )
+
+
+def load_simulation_config(cfg: BenchmarkConfig, dataset_dir: Path):
+    sim_cfg = OmegaConf.merge(OmegaConf.structured(SimulationConfig),
+                              OmegaConf.load(cfg.read_config))
+    sim_cfg.target_name = cfg.target_name
+    sim_cfg.planner.duration = cfg.duration
+    sim_cfg.logger.fig_height = cfg.fig_height
+    sim_cfg.logger.fig_width = cfg.fig_width
+    sim_cfg.logger.dataset_dir = str(dataset_dir)
+
+    return sim_cfg
+
+
+def get_benchmarks(cfg: BenchmarkConfig, dataset_dir: Path) -> list[Benchmark]:
+    sim_cfg = load_simulation_config(cfg, dataset_dir)
+    m, d, gt = generate_model_data(sim_cfg)
+    aabb_scale = m.numeric_data[get_element_id(m, "numeric", "target/aabb_scale")]
+    sim_cfg.logger.aabb_scale = float(aabb_scale)
+    reset_key_id = get_element_id(m, "keyframe", sim_cfg.reset_keyframe)
+    mj_forward(m, d)  # populate the global poses read by Poses and Logger.render
+
+    logger = autoinstantiate(sim_cfg.logger, m, d)
+    planner = autoinstantiate(sim_cfg.planner, m, d)
+
+    poses = Poses(m, d)
+    inverse = get_inverse_dynamics(m, poses)
+    id_ll = get_element_id(m, "body", "link6")
+    simats_bi_b = dyn.get_spatial_inertia_matrix(m.body_mass, m.body_inertia)[:id_ll+1]
+
+    # Fixed inputs drawn from a seeded generator ==================================
+    rng = np.random.default_rng(cfg.seed)
+    traj = rng.standard_normal((3, m.nu))
+    trajs = rng.standard_normal((cfg.n_replicas, 3, m.nu))
+    twist, dtwist = rng.standard_normal((2, 6))
+
+    regressors = rng.standard_normal((cfg.n_frames, 6, 10))
+    fts_sen = rng.standard_normal((cfg.n_frames, 6))
+    xis = rng.standard_normal((cfg.n_frames, 6))
+    frames = []
+    for i, ft in enumerate(fts_sen):
+        frames.append(dict(file_path=str(logger.complete_image_dir / f"{i:04}.png"),
+                           transform_matrix=np.eye(4).tolist(),
+                           pose_sen_obj=np.eye(4).tolist(),
+                           twist_sen=twist.tolist(),
+                           dtwist_sen=dtwist.tolist(),
+                           ft_sen=ft.tolist(),
+                           ))
+
+    gt_total_mass = gt["mass"]
+    scorer = Scorer(gt_total_mass, gt_total_mass * gt["com"], gt["globalinertia"], aabb_scale)
+
+    # The dynamics of a step of simulate(), of the target and the actual trajectories
+    def get_inverse_step(inverse_dynamics):
+        def inverse_step(tgt_traj, act_traj):
+            inverse_dynamics.get_ctrl(tgt_traj)
+            inverse_dynamics.get_twists_sen(act_traj)
+        return inverse_step
+
+    def plan_all():
+        for step in range(planner.n_steps):
+            planner.plan(step)
+
+    def simulate_and_render(m, d, logger, planner, controller):
+        physics = simulate(m, d, logger, planner, controller)
+        return render(m, d, logger, physics["states"])
+
+    def setup_simulate():
+        mj_resetDataKeyframe(m, d, reset_key_id)
+        plt.close("all")
+        return (m, d,
+                autoinstantiate(sim_cfg.logger, m, d),
+                autoinstantiate(sim_cfg.planner, m, d),
+                autoinstantiate(sim_cfg.controller, m, d),
+                )
+
+    return [
+        Benchmark("dyn.inverse", inverse, number=100, setup=lambda: (traj,)),
+        Benchmark("dyn.inverse_batch", dyn.stack_inverse_dynamics([inverse] * cfg.n_replicas),
+                  number=100, setup=lambda: (trajs,)),
+        Benchmark("RneaInverseDynamics.step",
+                  get_inverse_step(dyn.RneaInverseDynamics(dyn.InverseDynamicsConfig(), m, d)),
+                  number=100, setup=lambda: (traj, trajs[0])),
+        Benchmark("NativeInverseDynamics.step",
+                  get_inverse_step(dyn.NativeInverseDynamics(dyn.InverseDynamicsConfig(), m, d)),
+                  number=100, setup=lambda: (traj, trajs[0])),
+        Benchmark("dyn.get_regressor_matrix", dyn.get_regressor_matrix, number=1000,
+                  setup=lambda: (twist, dtwist)),
+        Benchmark("dyn.transfer_simat", dyn.transfer_simat, number=100,
+                  setup=lambda: (poses.lj_li, simats_bi_b)),
+        Benchmark("transformations.compose", tf.compose, number=100,
+                  setup=lambda: (d.xpos, d.xmat)),
+        Benchmark("transformations.se3_exp", tf.se3_exp, number=100, setup=lambda: (xis,)),
+        Benchmark("traj_5th_spline", plan_all, number=1),
+        Benchmark("Logger.render", logger.render, number=10,
+                  setup=lambda: (d, "0000.png")),
+        Benchmark("Logger._process_split", logger._process_split, number=1,
+                  setup=lambda: (frames, dyn.GramAccumulator(regressors, fts_sen), scorer)),
+        Benchmark("simulate", simulate_and_render, number=1, setup=setup_simulate),
+    ]
+
+
+def get_metadata(cfg: BenchmarkConfig) -> dict[str, Any]:
+    return dict(date_time=datetime.now().strftime("%d/%m/%Y_%H:%M:%S"),
+                commit=get_code_version(),
+                machine=platform.machine(),
+                processor=platform.processor(),
+                python=platform.python_version(),
+                numpy=np.__version__,
+                mujoco=mujoco.__version__,
+                config=OmegaConf.to_container(OmegaConf.structured(cfg)),
+                )
+
+
+def run_benchmarks(cfg: BenchmarkConfig) -> dict[str, Any]:
+    results = {}
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        for benchmark in get_benchmarks(cfg, Path(dataset_dir)):
+            if cfg.only and benchmark.name not in cfg.only:
+                continue
+
+            results[benchmark.name] = measure(benchmark, cfg.repeat, cfg.warmup)
+            print(f"{benchmark.name:<28}: {1e3 * results[benchmark.name]['median']:10.4f} [ms]")
+
+    return dict(meta=get_metadata(cfg), results=results)
+
+
+def save_results(results: dict[str, Any], path: str) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def compare_results(baseline: dict[str, Any],
+                    current: dict[str, Any],
+                    threshold: float = 0.1,
+                    ) -> pd.DataFrame:
+    """Compare the median timings of two benchmark results.
+
+    A benchmark is flagged as a regression (improvement) if its current median
+    is slower (faster) than the baseline one by more than the threshold ratio.
+    """
+
+    rows = {}
+    for name in baseline["results"].keys() | current["results"].keys():
+        base = baseline["results"].get(name, {}).get("median", np.nan)
+        curr = current["results"].get(name, {}).get("median", np.nan)
+        ratio = curr / base
+
+        if np.isnan(ratio):
+            status = "missing"
+        elif 1 + threshold < ratio:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+
+        rows[name] = dict(baseline_ms=1e3*base, current_ms=1e3*curr, ratio=ratio, status=status)
+
+    return pd.DataFrame.from_dict(rows, orient="index").sort_index()
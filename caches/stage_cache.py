@@ -0,0 +1,176 @@
+import hashlib
+import json
+import pickle
+import shutil
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+from mujoco._functions import mj_saveModel, mj_sizeModel
+from mujoco._structs import MjData, MjModel
+from omegaconf import OmegaConf
+
+
+@dataclass
+class StageCacheConfig:
+    target_class: str = "StageCache"
+    enabled: bool = True  # run every stage and overwrite its entry if False
+    cache_dir: str = "./datasets/.cache"
+    track_code: bool = True  # invalidate every entry when any python source changes
+
+
+def _default(obj: Any) -> Any:
+    """Make the inputs of a stage json serializable to hash them"""
+
+    if OmegaConf.is_config(obj):
+        return OmegaConf.to_container(obj, resolve=True)
+    if isinstance(obj, np.ndarray):
+        return dict(dtype=str(obj.dtype), shape=obj.shape,
+                    sha256=hashlib.sha256(np.ascontiguousarray(obj).tobytes()).hexdigest())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, bytes):
+        return hashlib.sha256(obj).hexdigest()
+    if isinstance(obj, Path):
+        return str(obj)
+
+    raise TypeError(f"'{type(obj).__name__}' is not hashable as an input of a stage.")
+
+
+def hash_inputs(*inputs: Any) -> str:
+    payload = json.dumps(inputs, default=_default, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def hash_model(m: MjModel) -> str:
+    """Hash the compiled model, which covers all the assets embedded in it"""
+
+    buffer = np.empty(mj_sizeModel(m), dtype=np.uint8)
+    mj_saveModel(m, None, buffer)
+    return hashlib.sha256(buffer.tobytes()).hexdigest()
+
+
+def hash_files(paths: Iterable[Union[str, Path]]) -> str:
+    """Hash the contents of files, walking directories recursively"""
+
+    digest = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in files:
+            if file.is_file() and "__pycache__" not in file.parts:
+                digest.update(str(file.relative_to(path.parent)).encode())
+                digest.update(file.read_bytes())
+
+    return digest.hexdigest()
+
+
+def hash_sources() -> str:
+    """Hash the python sources of the repository, i.e., its modules and packages"""
+
+    repo_dir = Path(__file__).parents[1]
+    sources = [p for p in repo_dir.iterdir()
+               if p.suffix == ".py" or (p / "__init__.py").is_file()]
+    return hash_files(sources)
+
+
+class StageCache:
+    """Content-addressed outputs of the stages of the pipeline.
+
+    An entry is a directory `{cache_dir}/{stage}/{key}` holding the pickled
+    outputs of a stage and the files it wrote, where the key is the hash of
+    everything the stage reads: a subset of the resolved config, the model hash,
+    the keys of the upstream stages and the python sources. The entry is
+    published by renaming a complete temporary directory so that an interrupted
+    run leaves no partial one, and the first one published is kept when runs of
+    the same key race.
+    """
+
+    OUTPUTS = "outputs.pkl"
+    FILES = "files"
+
+    def __init__(self,
+                 cfg: StageCacheConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.enabled = cfg.enabled
+        self.cache_dir = Path(cfg.cache_dir)
+        self.code_hash = hash_sources() if cfg.track_code else None
+        self.hits: dict[str, bool] = {}  # whether each stage was skipped in this run
+
+    def key(self, stage: str, *inputs: Any) -> str:
+        return hash_inputs(stage, self.code_hash, *inputs)
+
+    def entry_dir(self, stage: str, key: str) -> Path:
+        return self.cache_dir / stage / key
+
+    def load(self,
+             stage: str,
+             key: str,
+             restore_dir: Optional[Path] = None,
+             ) -> Optional[Any]:
+        """Get the outputs of an entry, copying its files into restore_dir, or None if missed"""
+
+        entry_dir = self.entry_dir(stage, key)
+        if not self.enabled or not (entry_dir / self.OUTPUTS).is_file():
+            return None
+
+        if restore_dir is not None and (entry_dir / self.FILES).is_dir():
+            shutil.copytree(entry_dir / self.FILES, restore_dir, dirs_exist_ok=True)
+
+        with open(entry_dir / self.OUTPUTS, "rb") as f:
+            return pickle.load(f)
+
+    def save(self,
+             stage: str,
+             key: str,
+             outputs: Any,
+             files: Iterable[Path] = (),
+             files_dir: Optional[Path] = None,
+             ) -> None:
+        """Store the outputs and the files, kept relative to files_dir, of a stage"""
+
+        entry_dir = self.entry_dir(stage, key)
+        tmp_dir = entry_dir.with_name(f".{key}.{uuid.uuid4().hex[:8]}.tmp")  # per writer
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        (tmp_dir / self.FILES).mkdir(parents=True)
+
+        for file in files:
+            file = Path(file)
+            dst = tmp_dir / self.FILES / file.relative_to(files_dir)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(file, dst)
+
+        with open(tmp_dir / self.OUTPUTS, "wb") as f:
+            pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if not self.enabled:  # the entry is stale
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            tmp_dir.rename(entry_dir)
+        except OSError:  # published in the meantime by a concurrent run of the same key,
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # kept as it may be being loaded
+
+    def run(self,
+            stage: str,
+            key: str,
+            func: Callable[[], Any],
+            files: Optional[Callable[[Any], Iterable[Path]]] = None,
+            files_dir: Optional[Path] = None,
+            ) -> Any:
+        """Load the outputs of a stage if cached, otherwise run it and cache them.
+
+        files maps the outputs to the paths of the files written by the stage
+        under files_dir, which are restored into files_dir on a hit.
+        """
+
+        outputs = self.load(stage, key, files_dir)
+        self.hits[stage] = outputs is not None
+        if outputs is None:
+            outputs = func()
+            self.save(stage, key, outputs, [] if files is None else files(outputs), files_dir)
+
+        return outputs
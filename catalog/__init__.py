@@ -0,0 +1,2 @@
+from .mesh_lod import *
+from .target_catalog import *
@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+import tyro
+
+from .mesh_lod import LevelOfDetailConfig, build_lods
+from .target_catalog import TargetCatalog, TargetCatalogConfig
+
+
+@dataclass
+class BuildConfig:
+    catalog: TargetCatalogConfig = field(default_factory=TargetCatalogConfig)
+
+
+@dataclass
+class ListConfig:
+    catalog: TargetCatalogConfig = field(default_factory=TargetCatalogConfig)
+    sort_by: str = "n_faces"  # column of the table, e.g., the expected rendering cost
+    ascending: bool = True
+    valid_only: bool = False  # skip the targets which failed to load
+    max_faces: Optional[int] = None
+
+
+@dataclass
+class LodConfig:
+    catalog: TargetCatalogConfig = field(default_factory=TargetCatalogConfig)
+    lod: LevelOfDetailConfig = field(default_factory=LevelOfDetailConfig)
+    targets: Optional[list[str]] = None  # every target loaded without error if None
+
+
+# Usage (from the repository root):
+#     python -m catalog build
+#     python -m catalog list --sort-by asset_bytes --valid-only
+#     python -m catalog lod --targets hammer skillet --lod.face-counts 20000 5000 1000
+if __name__ == "__main__":
+    cfg = tyro.extras.subcommand_cli_from_dict({"build": BuildConfig,
+                                                "list": ListConfig,
+                                                "lod": LodConfig})
+    catalog = TargetCatalog(cfg.catalog)
+    updated = catalog.refresh()
+
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        if isinstance(cfg, BuildConfig):
+            print(f"Indexed {len(catalog.entries)} targets into '{catalog.path}', "
+                  f"rebuilt {len(updated)}: {updated}")
+        elif isinstance(cfg, LodConfig):
+            targets = cfg.targets or [name for name, entry in catalog.entries.items()
+                                      if entry["error"] is None]
+            for name in targets:
+                for obj_path in catalog.get_mesh_paths(name):
+                    for lod_path in build_lods(obj_path, cfg.lod.face_counts):
+                        print(f"Wrote '{lod_path}'")
+            catalog.refresh(targets)
+        else:
+            table = catalog.table()
+            if cfg.valid_only:
+                table = table[table["error"].isna()]
+            if cfg.max_faces is not None:
+                table = table[table["n_faces"] <= cfg.max_faces]
+            print(table.sort_values(cfg.sort_by, ascending=cfg.ascending))
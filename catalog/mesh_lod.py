@@ -0,0 +1,254 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+from dm_control import mjcf
+from numpy.typing import NDArray
+
+from dynamics import load_obj
+
+
+@dataclass
+class LevelOfDetailConfig:
+    # Max number of faces of each mesh, its full resolution if non-positive
+    collision: int = 0  # of the collision geoms
+    dataset: int = 0  # of the visual geoms, rendering the dataset
+    preview: int = 0  # of the visual geoms, rendering a preview
+    render: str = "dataset"  # level of the visual geoms, either "dataset" or "preview"
+    # Numbers of faces of the variants built by "python -m catalog lod"
+    face_counts: list[int] = field(default_factory=lambda: [20000, 5000, 1000])
+
+
+def get_lod_path(obj_path: Union[str, Path], n_faces: int) -> Path:
+    """Path of a decimated variant next to the original, e.g., object_0.lod5000.obj"""
+
+    obj_path = Path(obj_path)
+    return obj_path.with_name(f"{obj_path.stem}.lod{n_faces}{obj_path.suffix}")
+
+
+def find_lod(obj_path: Union[str, Path], max_faces: int) -> Optional[Path]:
+    """Built variant with the most faces up to max_faces, None for the original.
+
+    The original is kept if non-positive max_faces or if it has no more faces.
+    """
+
+    obj_path = Path(obj_path)
+    if max_faces <= 0:
+        return None
+    n_faces = count_faces(obj_path.read_bytes())
+    if n_faces <= max_faces:
+        return None
+
+    candidates = [int(p.stem.rsplit(".lod", 1)[1])
+                  for p in obj_path.parent.glob(f"{obj_path.stem}.lod*{obj_path.suffix}")]
+    candidates = [n for n in candidates if n <= max_faces]
+    if not candidates:
+        raise FileNotFoundError(f"No variant of '{obj_path}' has up to {max_faces} faces. "
+                                f"Build them with 'python -m catalog lod'.")
+
+    return get_lod_path(obj_path, max(candidates))
+
+
+def count_faces(contents: bytes) -> int:
+    """Number of triangles of an OBJ of triangles, without parsing it"""
+    return contents.count(b"\nf ") + contents.startswith(b"f ")
+
+
+def _cluster(keys: NDArray) -> NDArray:
+    _, clusters = np.unique(keys, axis=0, return_inverse=True)
+    return clusters.ravel()
+
+
+def _get_cells(vertices: NDArray, uvs: Optional[NDArray], cell_size: float) -> tuple[NDArray, NDArray]:
+    """Clusters of the vertices in the cells of a grid and those further split by
+    the cells of the texture coordinates, i.e., at the seams"""
+
+    keys = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    cells = _cluster(keys)
+    if uvs is None:
+        return cells, cells
+
+    extent = np.ptp(vertices, axis=0).max()
+    uv_keys = np.floor(uvs * extent / cell_size).astype(np.int64)
+    return cells, _cluster(np.hstack([cells[:, np.newaxis], uv_keys]))
+
+
+def _get_valid(faces: NDArray, cells: NDArray) -> NDArray:
+    """Mask of the faces neither degenerate nor duplicate once the cells are merged"""
+
+    merged = cells[faces]
+    valid = (merged[:, 0] != merged[:, 1]) & (merged[:, 1] != merged[:, 2]) \
+          & (merged[:, 2] != merged[:, 0])
+    _, first = np.unique(np.sort(merged[valid], axis=1), axis=0, return_index=True)
+    mask = np.zeros(len(faces), dtype=bool)
+    mask[np.flatnonzero(valid)[first]] = True
+    return mask
+
+
+def decimate(vertices: NDArray,  # (V, 3)
+             faces: NDArray,  # (F, 3)
+             n_faces: int,  # max number of the faces of the result
+             uvs: Optional[NDArray] = None,  # (V, 2), texture coordinates of the vertices
+             n_iterations: int = 24,
+             ) -> tuple[NDArray, NDArray, Optional[NDArray]]:
+    """Decimate a triangle mesh to up to n_faces by vertex clustering with QEM.
+
+    The vertices are clustered in a uniform grid, whose cell size is bisected
+    to get the most faces up to n_faces, and each cell is replaced by the
+    point minimizing the sum of the quadric errors of its faces, i.e., their
+    squared distances to the planes of the faces weighted by their areas,
+    clamped to the bounds of the cell's vertices (P. Lindstrom, "Out-of-Core
+    Simplification of Large Polygonal Models"). The point is regularized
+    toward the mean of the cell where the quadric is singular, e.g., on a
+    plane. Texture coordinates split a cell into vertices at the same point
+    so that seams are kept without cracks, and are averaged per vertex.
+    """
+
+    if len(faces) <= n_faces:
+        return vertices, faces, uvs
+
+    # Bisect the cell size in log scale ===========================================
+    extent = np.ptp(vertices, axis=0).max()
+    lower, upper = np.log(extent * 1e-6), np.log(extent)
+    cell_size = extent
+    for _ in range(n_iterations):
+        size = np.exp(0.5 * (lower + upper))
+        if _get_valid(faces, _get_cells(vertices, None, size)[0]).sum() <= n_faces:
+            cell_size, upper = size, np.log(size)
+        else:
+            lower = np.log(size)
+    cells, wedges = _get_cells(vertices, uvs, cell_size)
+    n_cells = cells.max() + 1
+
+    # Quadrics of the cells =======================================================
+    triangles = vertices[faces]
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    areas = 0.5 * np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(2 * areas, np.finfo(float).tiny)[:, np.newaxis]
+    planes = np.hstack([normals, -np.einsum("fi,fi->f", normals, triangles[:, 0])[:, np.newaxis]])
+    face_quadrics = areas[:, np.newaxis, np.newaxis] * np.einsum("fi,fj->fij", planes, planes)
+
+    quadrics = np.zeros((n_cells, 4, 4))
+    for corner in range(3):
+        np.add.at(quadrics, cells[faces[:, corner]], face_quadrics)
+
+    counts = np.bincount(cells, minlength=n_cells)[:, np.newaxis]
+    means = np.zeros((n_cells, 3))
+    np.add.at(means, cells, vertices)
+    means /= counts
+    lowers = np.full((n_cells, 3), np.inf)
+    uppers = np.full((n_cells, 3), -np.inf)
+    np.minimum.at(lowers, cells, vertices)
+    np.maximum.at(uppers, cells, vertices)
+
+    # argmin x^T A x + 2 b^T x + c + w |x - mean|^2
+    A, b = quadrics[:, :3, :3], quadrics[:, :3, 3]
+    weights = 1e-3 * np.trace(A, axis1=1, axis2=2) / 3 + np.finfo(float).tiny
+    points = np.linalg.solve(A + weights[:, np.newaxis, np.newaxis] * np.eye(3),
+                             (weights[:, np.newaxis] * means - b)[..., np.newaxis])[..., 0]
+    points = np.clip(points, lowers, uppers)
+
+    # Vertices of the wedges, i.e., of the cells split at the seams ===============
+    n_wedges = wedges.max() + 1
+    cell_of_wedge = np.zeros(n_wedges, dtype=np.int64)
+    cell_of_wedge[wedges] = cells
+    if uvs is not None:
+        wedge_uvs = np.zeros((n_wedges, 2))
+        np.add.at(wedge_uvs, wedges, uvs)
+        uvs = wedge_uvs / np.bincount(wedges, minlength=n_wedges)[:, np.newaxis]
+
+    # Drop the wedges of no face
+    faces = wedges[faces[_get_valid(faces, cells)]]
+    used, faces = np.unique(faces, return_inverse=True)
+    return points[cell_of_wedge[used]], faces.reshape(-1, 3), None if uvs is None else uvs[used]
+
+
+def split_texcoords(vertices: NDArray,
+                    faces: NDArray,
+                    uvs: NDArray,
+                    uv_faces: NDArray,
+                    ) -> tuple[NDArray, NDArray, NDArray]:
+    """Vertices with a single texture coordinate each by splitting the shared ones"""
+
+    corners = np.stack([faces.ravel(), uv_faces.ravel()], axis=1)
+    unique, inverse = np.unique(corners, axis=0, return_inverse=True)
+    return vertices[unique[:, 0]], inverse.reshape(-1, 3), uvs[unique[:, 1]]
+
+
+def write_obj(vertices: NDArray, faces: NDArray, uvs: Optional[NDArray] = None) -> bytes:
+    lines = [f"v {x:.8g} {y:.8g} {z:.8g}" for x, y, z in vertices]
+    if uvs is None:
+        lines += [f"f {a} {b} {c}" for a, b, c in faces + 1]
+    else:
+        lines += [f"vt {u:.6g} {v:.6g}" for u, v in uvs]
+        lines += [f"f {a}/{a} {b}/{b} {c}/{c}" for a, b, c in faces + 1]
+
+    return ("\n".join(lines) + "\n").encode()
+
+
+def build_lods(obj_path: Union[str, Path], face_counts: list[int]) -> list[Path]:
+    """Write the decimated variants of an OBJ next to it and get their paths.
+
+    Only the variants with fewer faces than the original are written.
+    """
+
+    obj_path = Path(obj_path)
+    vertices, faces, uvs, uv_faces = load_obj(obj_path.read_bytes(), texcoords=True)
+    if len(uvs) and (0 <= uv_faces).all():
+        vertices, faces, uvs = split_texcoords(vertices, faces, uvs, uv_faces)
+    else:
+        uvs = None
+
+    paths = []
+    for n_faces in sorted(face_counts, reverse=True):
+        if len(faces) <= n_faces:
+            continue
+        lod_path = get_lod_path(obj_path, n_faces)
+        lod_path.write_bytes(write_obj(*decimate(vertices, faces, n_faces, uvs)))
+        paths.append(lod_path)
+
+    return paths
+
+
+def apply_lods(target_object: mjcf.RootElement,
+               assets: dict[str, bytes],  # updated with the variants
+               target_dir: Union[str, Path],
+               cfg: LevelOfDetailConfig,
+               ) -> None:
+    """Point the collision and visual geoms of a target to the variants of its meshes.
+
+    Each class of geoms gets its own mesh assets and the originals no longer
+    referred to are removed so that they are not compiled. Call it after the
+    ground truth is taken so that the inertia comes from the full meshes.
+    """
+
+    if cfg.render not in ["dataset", "preview"]:
+        raise ValueError(f"'render' has to be either 'dataset' or 'preview'. "
+                         f"'{cfg.render}' is invalid.")
+    visual = cfg.dataset if "dataset" == cfg.render else cfg.preview
+
+    mesh_dir = Path(target_dir) / (target_object.compiler.meshdir or "")
+    geoms = target_object.find_all("geom")
+    for mesh in list(target_object.asset.mesh):
+        obj_path = mesh_dir / (mesh.file.prefix + mesh.file.extension)
+        for geom_class, max_faces in [("collision", cfg.collision), ("visual", visual)]:
+            lod_path = find_lod(obj_path, max_faces)
+            if lod_path is None:
+                continue
+
+            contents = lod_path.read_bytes()
+            assets[lod_path.name] = contents
+            lod_mesh = target_object.asset.add("mesh",
+                                               name=f"{mesh.name}_{geom_class}",
+                                               file=mjcf.Asset(contents, lod_path.suffix,
+                                                               lod_path.stem),
+                                               scale=mesh.scale,
+                                               )
+            for geom in geoms:
+                if geom.mesh is mesh and geom.dclass is not None \
+                        and geom_class == geom.dclass.dclass:
+                    geom.mesh = lod_mesh
+
+        if not any(geom.mesh is mesh for geom in geoms):
+            mesh.remove()
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional, Union
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+from liegroups.numpy import SE3, SO3
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+from scipy.optimize import linear_sum_assignment
+from transforms3d.euler import euler2mat
+from transforms3d.quaternions import mat2quat
+
+from caches import hash_files
+from dynamics import coordinate_transfer_imat, get_obj_inertia, join_inertias
+
+
+@dataclass
+class TargetCatalogConfig:
+    target_class: str = "TargetCatalog"
+    targets_dir: str = "./xml_models/targets"
+    path: str = "./datasets/target_catalog.json"  # index file
+
+
+# Keys of the ground truth stored as lists and returned as arrays
+ARRAY_KEYS = ["com", "iquat"]
+
+# Mass densities below this are taken as exported by CAD in [t/mm^3]
+MIN_DENSITY_KG_M3 = 1e-3
+
+
+def get_target_object_ground_truth(target_object_cad_gt_path):
+    # Recover the object's diaginertia and its orientation manually =======
+    target_object_aux = pd.read_csv(target_object_cad_gt_path,
+                          nrows=1,  # num data rows after the header
+                          ).loc[0]
+
+    aabb_scale = target_object_aux["aabb_scale"]
+
+    # Orientaion of the object's body frame w.r.t its inertia frame
+    s_rx, s_ry, s_rz = target_object_aux["rx":"rz"].to_numpy()
+    rot_obji_obj= euler2mat(s_rx, s_ry, s_rz, "sxyz")  # "S"tatic "XYZ" euler
+    iquat = mat2quat(rot_obji_obj.T)
+
+    # Get the mass and the center of mass of the target object w.r.t its body frame
+    mass = target_object_aux["total_mass"]
+    pos_aabb_obji = target_object_aux["cx":"cz"].to_numpy()  # CoM
+
+    # Get the object's moments of inertia w.r.t the frame whose origin is the
+    # object's com and its orientation is aligned with the object's aabb frame
+    ixx, iyy, izz, ixy, iyz, izx = target_object_aux["ixx":"izx"].to_numpy()
+    fullinertia = [ixx, iyy, izz, ixy, iyz, izx]  # list[float]
+    _fullinertia = np.array([[ixx, ixy, izx],
+                             [ixy, iyy, iyz],
+                             [izx, iyz, izz]])
+
+    # Get the principal inertia tensor of the object
+    _diaginertia = rot_obji_obj @ _fullinertia @ rot_obji_obj.T
+    diaginertia = np.diag(_diaginertia).tolist()
+
+    # Get the inertia tensor w.r.t the object's aabb frame
+    pose_aabb_obji = SE3(SO3.identity(), pos_aabb_obji)
+    _globalinertia = coordinate_transfer_imat(pose_aabb_obji,
+                                              _fullinertia,
+                                              mass,
+                                              )
+
+    globalinertia = [_globalinertia[0, 0], _globalinertia[1, 1], _globalinertia[2, 2],
+                     _globalinertia[0, 1], _globalinertia[1, 2], _globalinertia[2, 0]]
+
+    return dict(aabb_scale=aabb_scale, mass=mass, com=pos_aabb_obji, iquat=iquat,
+                diaginertia=diaginertia, fullinertia=fullinertia,
+                globalinertia=globalinertia)
+
+
+def get_component_densities(target_object_cad_gt_path,
+                            volumes: NDArray,  # [m^3], of the meshes
+                            ) -> list[float]:
+    """Mass densities [kg/m^3] of the meshes from the components of the CSV.
+
+    If the components are as many as the meshes, each mesh takes the density
+    of the component whose volume, i.e., mass over density, is the closest to
+    its own since their orders differ. Otherwise all of the components must
+    share a density.
+    """
+
+    components = pd.read_csv(target_object_cad_gt_path,
+                             skiprows=2,  # after the header and data
+                             usecols=["component_name", "mass", "mass_density"],
+                             ).dropna()  # w/o assemblies
+    densities = components["mass_density"].to_numpy()
+    densities = np.where(densities < MIN_DENSITY_KG_M3, 1e12 * densities, densities)
+
+    if len(densities) == len(volumes):
+        costs = np.abs(np.log(np.abs(volumes))[:, np.newaxis]
+                       - np.log(components["mass"].to_numpy() / densities))
+        _, matches = linear_sum_assignment(costs)
+        return densities[matches].tolist()
+    if 0 < len(densities) and np.allclose(densities, densities[0]):
+        return [float(densities[0])] * len(volumes)
+
+    raise ValueError(f"{len(densities)} components of various densities in "
+                     f"'{target_object_cad_gt_path}' do not match {len(volumes)} meshes.")
+
+
+def get_target_object_mesh_ground_truth(meshes: list[bytes],  # contents of the OBJ files
+                                        target_object_cad_gt_path,
+                                        aabb_scale: float,
+                                        scales: Optional[list] = None,  # of the meshes
+                                        ):
+    """Ground truth of get_target_object_ground_truth() integrated over the meshes
+    given the densities of the components of the CSV"""
+
+    scales = [(1.0, 1.0, 1.0)] * len(meshes) if scales is None else scales
+    parts = [get_obj_inertia(mesh, 1.0, scale) for mesh, scale in zip(meshes, scales)]
+    densities = get_component_densities(target_object_cad_gt_path,
+                                        np.array([part["volume"] for part in parts]))
+    joined = join_inertias([dict(part, mass=density * part["mass"],
+                                 inertia=density * part["inertia"])
+                            for part, density in zip(parts, densities)])
+    mass, com, _fullinertia = joined["mass"], joined["com"], joined["inertia"]
+
+    # Principal moments and the orientation of the inertia frame w.r.t the
+    # body frame, right-handed
+    diaginertia, rot_obj_obji = np.linalg.eigh(_fullinertia)
+    rot_obj_obji[:, 2] *= np.sign(np.linalg.det(rot_obj_obji))
+    iquat = mat2quat(rot_obj_obji)
+
+    ixx, iyy, izz = np.diag(_fullinertia)
+    ixy, iyz, izx = _fullinertia[0, 1], _fullinertia[1, 2], _fullinertia[2, 0]
+    fullinertia = [ixx, iyy, izz, ixy, iyz, izx]
+
+    _globalinertia = coordinate_transfer_imat(SE3(SO3.identity(), com), _fullinertia, mass)
+    globalinertia = [_globalinertia[0, 0], _globalinertia[1, 1], _globalinertia[2, 2],
+                     _globalinertia[0, 1], _globalinertia[1, 2], _globalinertia[2, 0]]
+
+    return dict(aabb_scale=aabb_scale, mass=mass, com=com, iquat=iquat,
+                diaginertia=diaginertia.tolist(), fullinertia=fullinertia,
+                globalinertia=globalinertia)
+
+
+def _to_builtin(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (list, tuple)):
+        return [_to_builtin(o) for o in obj]
+
+    return obj
+
+
+class TargetCatalog:
+    """Index of the targets under targets_dir with their precomputed metadata.
+
+    Each entry holds the ground truth parsed from object_cad_gt.csv, the
+    counts of the compiled meshes, the size of the files and the hash of their
+    contents, so that a target is selected, sorted or scheduled without being
+    loaded. refresh() rebuilds the entries whose files changed only: a target
+    whose file sizes and mtimes are unchanged is skipped without reading its
+    files, and one whose contents hash is unchanged is not compiled again.
+    Targets which fail to load are indexed with their error.
+    """
+
+    def __init__(self,
+                 cfg: TargetCatalogConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.targets_dir = Path(cfg.targets_dir)
+        self.path = Path(cfg.path)
+        self.entries: dict[str, dict[str, Any]] = {}
+
+        if self.path.is_file():
+            with open(self.path) as f:
+                self.entries = json.load(f)["targets"]
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(dict(targets_dir=str(self.targets_dir), targets=self.entries), f, indent=1)
+        tmp_path.replace(self.path)  # atomic so that concurrent readers see a whole index
+
+    def names(self) -> list[str]:
+        """Names of the target directories, i.e., of those holding object.xml"""
+        return sorted(p.name for p in self.targets_dir.iterdir() if (p / "object.xml").is_file())
+
+    def _fingerprint(self, target_dir: Path) -> str:
+        digest = hashlib.sha256()
+        for file in sorted(target_dir.rglob("*")):
+            if file.is_file():
+                stat = file.stat()
+                digest.update(f"{file.relative_to(target_dir)}:{stat.st_size}:{stat.st_mtime_ns}"
+                              .encode())
+
+        return digest.hexdigest()
+
+    def _build_entry(self, target_dir: Path) -> dict[str, Any]:
+        files = [p for p in target_dir.rglob("*") if p.is_file()]
+        entry = dict(n_files=len(files),
+                     asset_bytes=sum(p.stat().st_size for p in files),
+                     error=None,
+                     )
+
+        try:
+            ground_truth = get_target_object_ground_truth(target_dir / "object_cad_gt.csv")
+            entry["ground_truth"] = {k: _to_builtin(v) for k, v in ground_truth.items()}
+
+            m = MjModel.from_xml_path(str(target_dir / "object.xml"))
+            entry.update(n_meshes=m.nmesh,
+                         n_vertices=m.nmeshvert,
+                         n_faces=m.nmeshface,
+                         n_geoms=m.ngeom,
+                         n_textures=m.ntex,
+                         )
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}".strip()
+
+        return entry
+
+    def refresh(self, names: Optional[list[str]] = None) -> list[str]:
+        """Update the entries of the targets whose files changed and get their names.
+
+        All the targets are scanned if names is None, dropping the entries of
+        the removed ones.
+        """
+
+        changed = False
+        if names is None:
+            names = self.names()
+            for name in set(self.entries) - set(names):
+                self.entries.pop(name)
+                changed = True
+
+        updated = []
+        for name in names:
+            target_dir = self.targets_dir / name
+            if not (target_dir / "object.xml").is_file():
+                raise FileNotFoundError(f"'{target_dir / 'object.xml'}' is not found.")
+
+            fingerprint = self._fingerprint(target_dir)
+            entry = self.entries.get(name, {})
+            if fingerprint == entry.get("fingerprint"):
+                continue
+
+            content_hash = hash_files([target_dir])
+            if content_hash != entry.get("content_hash"):
+                entry = self._build_entry(target_dir)
+                entry["content_hash"] = content_hash
+                updated.append(name)
+            entry["fingerprint"] = fingerprint
+            entry["updated_at"] = datetime.now().isoformat(timespec="seconds")
+            self.entries[name] = entry
+            changed = True
+
+        if changed or not self.path.is_file():
+            self._save()
+
+        return updated
+
+    def get(self, name: str) -> dict[str, Any]:
+        """Entry of a target, refreshed if its files changed"""
+
+        self.refresh([name])
+        return self.entries[name]
+
+    def get_mesh_paths(self, name: str) -> list[Path]:
+        """Paths of the meshes referred to by object.xml of a target"""
+
+        root = ElementTree.parse(self.targets_dir / name / "object.xml").getroot()
+        compiler = root.find("compiler")
+        mesh_dir = self.targets_dir / name
+        if compiler is not None:
+            mesh_dir = mesh_dir / compiler.get("meshdir", "")
+        return [mesh_dir / mesh.get("file") for mesh in root.iter("mesh")]
+
+    def get_ground_truth(self, name: str) -> dict[str, Union[float, list[float], np.ndarray]]:
+        """Ground truth of a target as returned by get_target_object_ground_truth()"""
+
+        entry = self.get(name)
+        if entry["error"] is not None:
+            raise RuntimeError(f"Target '{name}' failed to load: {entry['error']}")
+
+        return {k: np.array(v) if k in ARRAY_KEYS else v
+                for k, v in entry["ground_truth"].items()}
+
+    def table(self) -> pd.DataFrame:
+        """One row per target with its counts, sizes and scalar ground truth"""
+
+        rows = []
+        for name, entry in self.entries.items():
+            ground_truth = entry.get("ground_truth", {})
+            rows.append(dict(target=name,
+                             n_meshes=entry.get("n_meshes"),
+                             n_vertices=entry.get("n_vertices"),
+                             n_faces=entry.get("n_faces"),
+                             n_geoms=entry.get("n_geoms"),
+                             n_files=entry["n_files"],
+                             asset_bytes=entry["asset_bytes"],
+                             mass=ground_truth.get("mass"),
+                             aabb_scale=ground_truth.get("aabb_scale"),
+                             error=entry["error"],
+                             content_hash=entry["content_hash"][:12],
+                             ))
+
+        columns = ["target", "n_meshes", "n_vertices", "n_faces", "n_geoms", "n_files", "asset_bytes",
+                   "mass", "aabb_scale", "error", "content_hash"]
+        counts = ["n_meshes", "n_vertices", "n_faces", "n_geoms"]
+        # The columns are given so that an empty index makes an empty table
+        return (pd.DataFrame(rows, columns=columns)
+                .astype({c: "Int64" for c in counts}).set_index("target"))
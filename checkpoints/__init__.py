@@ -0,0 +1 @@
+from .checkpointer import *
@@ -0,0 +1,100 @@
+import os
+import pickle
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from mujoco._structs import MjData, MjModel
+
+
+@dataclass
+class CheckpointerConfig:
+    target_class: str = "Checkpointer"
+    interval: int = 0  # [steps], save a checkpoint every interval steps. Disabled if non-positive
+    checkpoint_dir: str = "./datasets/.checkpoints"
+    keep: int = 2  # number of the latest checkpoints kept per episode
+    resume: bool = True  # resume from the latest checkpoint of the same episode if any
+    # Keep the checkpoints of a finished episode, e.g., to fork it later, instead
+    # of removing them. They are never resumed
+    keep_finished: bool = False
+
+
+class Checkpointer:
+    """Save and load snapshots of a simulation episode taken by simulate().
+
+    A checkpoint of step k holds the MjData state right before mj_step of the
+    step, the controller gain and the buffers recorded up to the step. Stepping
+    from the state reproduces the rest of the episode exactly, so the episode can
+    be resumed after a crash or forked into variants sharing the same prefix.
+    Checkpoints are grouped by episode, e.g., the key of the simulate stage, so
+    that one of another configuration is never resumed by mistake, and they are
+    removed, or marked as finished if kept, once the episode finishes.
+    """
+
+    FINISHED = "finished"
+
+    def __init__(self,
+                 cfg: CheckpointerConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 episode: str = "default",
+                 ) -> None:
+        self.interval = cfg.interval
+        self.keep = cfg.keep
+        self.resume = cfg.resume
+        self.keep_finished = cfg.keep_finished
+        self.episode_dir = Path(cfg.checkpoint_dir) / episode
+
+    @property
+    def enabled(self) -> bool:
+        return 0 < self.interval
+
+    def due(self, step: int) -> bool:
+        return self.enabled and 0 == (step + 1) % self.interval
+
+    def paths(self) -> list[Path]:
+        return sorted(self.episode_dir.glob("step_*.pkl"))
+
+    def latest(self) -> Optional[Path]:
+        paths = self.paths()
+        return paths[-1] if paths else None
+
+    def save(self, step: int, checkpoint: dict[str, Any]) -> Path:
+        """Write a checkpoint atomically and remove the ones older than the kept ones"""
+
+        self.episode_dir.mkdir(parents=True, exist_ok=True)
+        path = self.episode_dir / f"step_{step:07}.pkl"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(dict(checkpoint, step=step), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        (self.episode_dir / self.FINISHED).unlink(missing_ok=True)  # run again
+
+        for old_path in self.paths()[:-self.keep] if 0 < self.keep else []:
+            old_path.unlink()
+
+        return path
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> dict[str, Any]:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def load_latest(self) -> Optional[dict[str, Any]]:
+        """Get the checkpoint to resume from, or None to start over"""
+
+        path = self.latest()
+        if not self.resume or path is None or (self.episode_dir / self.FINISHED).is_file():
+            return None
+
+        print(f"Resume the episode from '{path}'.")
+        return self.load(path)
+
+    def finish(self) -> None:
+        """Remove the checkpoints of the finished episode, or mark them not to resume them"""
+
+        if not self.keep_finished:
+            shutil.rmtree(self.episode_dir, ignore_errors=True)
+        elif self.episode_dir.is_dir():
+            (self.episode_dir / self.FINISHED).touch()
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+from mujoco import FatalError, Renderer
+from mujoco._structs import MjModel
+from omegaconf import OmegaConf
+
+from core import SimulationConfig
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """Make the config of base.yaml for a target and an episode of a duration [s]"""
+
+    def make_config(target_name: str = "hammer", duration: float = 0.2):
+        cfg = OmegaConf.merge(OmegaConf.structured(SimulationConfig),
+                              OmegaConf.load("./configurations/base.yaml"))
+        cfg.target_name = target_name
+        cfg.catalog.path = str(tmp_path / "target_catalog.json")  # not to touch ./datasets
+        cfg.planner.duration = duration
+        return cfg
+
+    return make_config
+
+
+@pytest.fixture
+def frame_logger():
+    """All simulate() reads of a logger, a frame every 10 steps"""
+
+    return SimpleNamespace(fps=50)
+
+
+@pytest.fixture(scope="session")
+def rendering():
+    """Skip the test if no OpenGL platform renders, e.g., headless without MUJOCO_GL=egl.
+
+    Probed once since MuJoCo aborts on a second attempt without a platform.
+    """
+
+    try:
+        Renderer(MjModel.from_xml_string("<mujoco/>"), 8, 8).close()
+    except FatalError as e:
+        pytest.skip(f"Not able to render, e.g., set MUJOCO_GL=egl: {e}")
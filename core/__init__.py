@@ -1,2 +1,4 @@
 from .core import *
 from .simulate import *
+from .scene import *
+from .kinematic import *
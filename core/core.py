@@ -5,25 +5,33 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Union
 
+import numpy as np
 import pandas as pd
 import tyro
 from dm_control import mjcf
 from numpy.typing import NDArray
-from mujoco._functions import mj_resetDataKeyframe
+from mujoco._functions import mj_forward, mj_resetDataKeyframe
 from mujoco._structs import MjData, MjModel
 from omegaconf import OmegaConf
 from omegaconf.dictconfig import DictConfig
 from omegaconf.listconfig import ListConfig
 from omegaconf.errors import ConfigAttributeError, MissingMandatoryValue
-from transforms3d.euler import euler2mat
-from transforms3d.quaternions import mat2quat, quat2mat
+from transforms3d.quaternions import quat2mat
 
 # all the modules of the packages below are imported to enable autoinstantiate()
-import dynamics as dyn
+from caches import *
+from catalog import *
+from checkpoints import *
 from controllers import *
 from dynamics import *
+from keyframes import *
 from loggers import *
+from pacers import *
 from planners import *
+from results import *
+from sensors import *
+from .kinematic import KinematicConfig
+from .scene import N_COLLISION_BITS, Replica, SceneConfig
 
 
 @dataclass
@@ -31,10 +39,23 @@ class SimulationConfig:
     manipulator_name: str = "sequential"
     target_name: str = MISSING
     reset_keyframe: str = "initial_state"
+    inertia_setting: str = "diaginertia"  # of the target, or "fullinertia" or "density"
     state_space: StateSpaceConfig = MISSING  # StateSpaceConfig()  # from dynamics
     logger: LoggerConfig = LoggerConfig()
     planner: JointPositionPlannerConfig = MISSING  # JointPositionPlannerConfig()
     controller: LinearQuadraticRegulatorConfig = MISSING # LinearQuadraticRegulatorConfig()
+    pacer: RealtimePacerConfig = RealtimePacerConfig()
+    noise: WrenchNoiseConfig = WrenchNoiseConfig()
+    stream: FTStreamConfig = FTStreamConfig()
+    inverse_dynamics: InverseDynamicsConfig = InverseDynamicsConfig()
+    telemetry: TelemetryConfig = TelemetryConfig()
+    results: ResultsStoreConfig = ResultsStoreConfig()
+    cache: StageCacheConfig = StageCacheConfig()
+    checkpoint: CheckpointerConfig = CheckpointerConfig()
+    keyframes: KeyframeSelectorConfig = KeyframeSelectorConfig()
+    catalog: TargetCatalogConfig = TargetCatalogConfig()
+    lod: LevelOfDetailConfig = LevelOfDetailConfig()
+    kinematic: KinematicConfig = KinematicConfig()
     read_config: str = "./configurations/base.yaml"
     write_config: str = MISSING
 
@@ -115,57 +136,15 @@ def show_comparison(
           )
 
 
-def get_target_object_ground_truth(target_object_cad_gt_path):
-    # Recover the object's diaginertia and its orientation manually =======
-    target_object_aux = pd.read_csv(target_object_cad_gt_path,
-                          nrows=1,  # num data rows after the header
-                          ).loc[0]
-
-    aabb_scale = target_object_aux["aabb_scale"]
-
-    # Orientaion of the object's body frame w.r.t its inertia frame
-    s_rx, s_ry, s_rz = target_object_aux["rx":"rz"].to_numpy()
-    rot_obji_obj= euler2mat(s_rx, s_ry, s_rz, "sxyz")  # "S"tatic "XYZ" euler
-    iquat = mat2quat(rot_obji_obj.T)
-
-    # Get the mass and the center of mass of the target object w.r.t its body frame
-    mass = target_object_aux["total_mass"]
-    pos_aabb_obji = target_object_aux["cx":"cz"].to_numpy()  # CoM
-
-    # Get the object's moments of inertia w.r.t the frame whose origin is the 
-    # object's com and its orientation is aligned with the object's aabb frame
-    ixx, iyy, izz, ixy, iyz, izx = target_object_aux["ixx":"izx"].to_numpy()
-    fullinertia = [ixx, iyy, izz, ixy, iyz, izx]  # list[float]
-    _fullinertia = np.array([[ixx, ixy, izx],
-                             [ixy, iyy, iyz],
-                             [izx, iyz, izz]])
-
-    # Get the principal inertia tensor of the object
-    _diaginertia = rot_obji_obj @ _fullinertia @ rot_obji_obj.T
-    diaginertia = np.diag(_diaginertia).tolist()
-
-    # Get the inertia tensor w.r.t the object's aabb frame
-    pose_aabb_obji = SE3(SO3.identity(), pos_aabb_obji)
-    _globalinertia = dyn.coordinate_transfer_imat(pose_aabb_obji,
-                                                  _fullinertia,
-                                                  mass,
-                                                  )
-
-    globalinertia = [_globalinertia[0, 0], _globalinertia[1, 1], _globalinertia[2, 2],
-                     _globalinertia[0, 1], _globalinertia[1, 2], _globalinertia[2, 0]]
-
-    return dict(aabb_scale=aabb_scale, mass=mass, com=pos_aabb_obji, iquat=iquat,
-                diaginertia=diaginertia, fullinertia=fullinertia,
-                globalinertia=globalinertia)
-
-
 def spawn_target_object(target_object_path,
                         target_object_cad_gt_path,
                         inertia_setting="diaginertia",
                         compare_cad_mujoco=True,
+                        ground_truth=None,  # e.g., of TargetCatalog, parsed if None
                         ):
     # Recover the object's diaginertia and its orientation manually =======
-    ground_truth = get_target_object_ground_truth(target_object_cad_gt_path)
+    if ground_truth is None:
+        ground_truth = get_target_object_ground_truth(target_object_cad_gt_path)
     # Get mass and diaginertia computed by mujoco =========================
     target_object = mjcf.from_path(target_object_path)
     target_object.custom.add("numeric", 
@@ -181,10 +160,12 @@ def spawn_target_object(target_object_path,
     # Get asset files
     assets = {}
     meshes = []
+    mesh_files = []
     for each_mesh in iter(target_object.asset.mesh):
         file = each_mesh.get_attributes()['file']
         assets[file.prefix+file.extension] = file.contents
         meshes.append(file.prefix)
+        mesh_files.append(file.prefix+file.extension)
 
     for elem_texture in iter(target_object.asset.texture):
         try:
@@ -207,11 +188,24 @@ def spawn_target_object(target_object_path,
         target_object.worldbody.add("site", name="ft_sensor", euler="0 0 180", rgba="0 0 0 0")
     target_object_body = target_object.find("body", "object")
 
+    if "density" == inertia_setting:
+        logging.info("======== Set the inertia of the meshes to the target object. ========")
+        # Integrate the meshes of the collision geoms given the densities of
+        # the components instead of taking the CAD ground truth
+        scales = [each_mesh.scale if each_mesh.scale is not None else (1.0, 1.0, 1.0)
+                  for each_mesh in iter(target_object.asset.mesh)]
+        ground_truth = get_target_object_mesh_ground_truth(
+            [assets[mesh_file] for mesh_file in mesh_files],
+            target_object_cad_gt_path,
+            ground_truth["aabb_scale"],
+            scales,
+            )
+
     inertial = dict(pos=ground_truth["com"],
                     mass=ground_truth["mass"],
                     )
 
-    if "diaginertia" == inertia_setting:
+    if inertia_setting in ["diaginertia", "density"]:
         logging.info("======== Set 'diaginertia' to the target object. ========")
         inertial["quat"] = ground_truth["iquat"]
         inertial["diaginertia"] = ground_truth["diaginertia"]
@@ -219,30 +213,9 @@ def spawn_target_object(target_object_path,
         logging.info("======== Set 'fullinertia' to the target object. ========")
         ixx, iyy, izz, ixy, iyz, izx = ground_truth["fullinertia"]
         inertial["fullinertia"] = [ixx, iyy, izz, ixy, iyz, izx]
-    elif False and "density" == inertia_setting:  # NOTE: disabled for now
-        print("==== Set 'density' to the target object's each geom. ====")
-        component_mass_densities = pd.read_csv(
-            target_object_cad_gt_path,
-            skiprows=2,  # after the header and data
-            )
-
-        assert len(component_mass_densities) == len(meshes), \
-               RuntimeError("Number of components does not match with the " \
-                            "number of aux data. Review the XML and CSV file")
-
-        for idx, mesh in zip(reversed(component_mass_densities.index),
-                             reversed(meshes),
-                             ):
-            density = component_mass_densities.loc[idx, "mass_density"]
-            target_object_body.insert("geom", 0,
-                                      type="mesh",
-                                      mesh=mesh,
-                                      density=density,
-                                      )
-
-        # Use only the inserted geom for inertia computation
-        inertiagrouprange = " ".join(str(i) for i in [0, len(component_mass_densities)-1])
-        target_object.compiler.inertiagrouprange = inertiagrouprange
+    else:
+        raise ValueError(f"'inertia_setting' has to be either 'diaginertia', 'fullinertia' "
+                         f"or 'density'. '{inertia_setting}' is invalid.")
 
     target_object_body.add("inertial", **inertial)
 
@@ -253,16 +226,23 @@ def spawn_target_object(target_object_path,
     return target_object, assets, ground_truth
 
 
-def generate_model_data(
+def generate_manipulator(
         cfg: Union[DictConfig, ListConfig],
-    ) -> tuple[MjModel, MjData, dict[str, Union[float, list[float]]]]:
+        target_name: str,
+        catalog: TargetCatalog,
+    ) -> tuple[mjcf.RootElement, dict[str, bytes], dict[str, Union[float, list[float]]]]:
+    """Load the manipulator's .xml with the target object attached to it"""
+
     # Get the ground truth data output by a CAD application ========================
     xml_dir = Path.cwd() / "xml_models"
-    target_dir = xml_dir / "targets" / cfg.target_name
+    target_dir = xml_dir / "targets" / target_name
     target_object_path = target_dir / "object.xml"
     target_object_cad_gt_path = target_dir / "object_cad_gt.csv"
     target_object, assets, ground_truth = spawn_target_object(
-        target_object_path, target_object_cad_gt_path, compare_cad_mujoco=False)
+        target_object_path, target_object_cad_gt_path, inertia_setting=cfg.inertia_setting,
+        compare_cad_mujoco=False, ground_truth=catalog.get_ground_truth(target_name))
+    # Decimated meshes of the geoms, the ground truth being of the full ones
+    apply_lods(target_object, assets, target_dir, cfg.lod)
 
     # Load the .xml of a manipulator and attach the target object to it
     manipulator_path = xml_dir / "manipulators" / f"{cfg.manipulator_name}.xml"
@@ -278,6 +258,16 @@ def generate_model_data(
     track_cam = manipulator.find("camera", cfg.logger.track_cam_name)
     track_cam.pos = track_cam_pos
 
+    return manipulator, assets, ground_truth
+
+
+def generate_model_data(
+        cfg: Union[DictConfig, ListConfig],
+        catalog: TargetCatalog = None,  # of cfg.catalog if None
+    ) -> tuple[MjModel, MjData, dict[str, Union[float, list[float]]]]:
+    catalog = TargetCatalog(cfg.catalog) if catalog is None else catalog
+    manipulator, assets, ground_truth = generate_manipulator(cfg, cfg.target_name, catalog)
+
     # Spawn a mujoco model and a mujoco data
     m = MjModel.from_xml_string(manipulator.to_xml_string(filename_with_hash=False), assets=assets)
     d = MjData(m)
@@ -301,6 +291,87 @@ def generate_model_data(
     #     f"    sensor outputs (nsensordata):       {m.nsensordata:>2}")
 
 
+def generate_scene_model_data(
+        cfg: Union[DictConfig, ListConfig],
+        scene_cfg: SceneConfig,
+    ) -> tuple[MjModel, MjData, list[Replica]]:
+    """Compile scene_cfg.n_replicas copies of the manipulator into one model.
+
+    Each replica is the model of generate_model_data() for its target, attached
+    under the prefix "r{k}/" at a node of a grid. The collision geoms of a
+    replica get a bit of contype and conaffinity of their own, so that replicas
+    never collide with each other, sharing a bit every N_COLLISION_BITS
+    replicas only, which the spacing keeps apart.
+    """
+
+    target_names = list(scene_cfg.target_names) or [cfg.target_name]
+    n_replicas = scene_cfg.n_replicas
+    n_cols = int(np.ceil(np.sqrt(n_replicas)))
+
+    catalog = TargetCatalog(cfg.catalog)
+    scene = mjcf.RootElement(model="scene")
+    standalones = {}  # compiled once per target
+    for k in range(n_replicas):
+        target_name = target_names[k % len(target_names)]
+        manipulator, assets, ground_truth = generate_manipulator(cfg, target_name, catalog)
+        if target_name not in standalones:
+            m_replica = MjModel.from_xml_string(manipulator.to_xml_string(filename_with_hash=False),
+                                                assets=assets)
+            standalones[target_name] = (m_replica, ground_truth)
+
+        manipulator.model = f"r{k}"
+        node = scene.worldbody.add("site", name=f"node{k}",
+                                   pos=[scene_cfg.spacing * (k % n_cols),
+                                        scene_cfg.spacing * (k // n_cols), 0])
+        node.attach(manipulator)
+
+    m = MjModel.from_xml_string(scene.to_xml_string(), assets=scene.get_assets())
+    d = MjData(m)
+
+    replicas = []
+    for k in range(n_replicas):
+        prefix = f"r{k}/"
+        target_name = target_names[k % len(target_names)]
+        m_replica, ground_truth = standalones[target_name]
+        d_replica = MjData(m_replica)
+        mj_resetDataKeyframe(m_replica, d_replica,
+                             get_element_id(m_replica, "keyframe", cfg.reset_keyframe))
+
+        # The elements of an attached model are contiguous in the scene
+        first_joint = get_element_id(m, "joint", prefix + m_replica.joint(0).name)
+        first_actuator = get_element_id(m, "actuator", prefix + m_replica.actuator(0).name)
+        qposadr, dofadr = m.jnt_qposadr[first_joint], m.jnt_dofadr[first_joint]
+        replica = Replica(
+            prefix=prefix,
+            target_name=target_name,
+            m=m_replica,
+            d=d_replica,
+            ground_truth=ground_truth,
+            qpos=slice(int(qposadr), int(qposadr) + m_replica.nq),
+            qvel=slice(int(dofadr), int(dofadr) + m_replica.nv),
+            ctrl=slice(int(first_actuator), int(first_actuator) + m_replica.nu),
+            force=get_sensor_measurement_idx(m, prefix + "force"),
+            torque=get_sensor_measurement_idx(m, prefix + "torque"),
+            bodies=np.array([get_element_id(m, "body", prefix + m_replica.body(i).name)
+                             for i in range(1, m_replica.nbody)]),
+        )
+        replicas.append(replica)
+
+        # Collide within the replica only
+        geoms = np.isin(m.geom_bodyid, replica.bodies)
+        bit = 1 << (k % N_COLLISION_BITS)
+        m.geom_contype[geoms & (0 != m.geom_contype)] = bit
+        m.geom_conaffinity[geoms & (0 != m.geom_conaffinity)] = bit
+
+        # Start from the keyframe of the replica
+        d.qpos[replica.qpos] = d_replica.qpos
+        d.qvel[replica.qvel] = d_replica.qvel
+
+    mj_forward(m, d)
+
+    return m, d, replicas
+
+
 def autoinstantiate(cfg: DictConfig,
                     m: MjModel,
                     d: MjData,
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+
+import numpy as np
+from liegroups import SE3
+from mujoco._functions import mj_forward, mj_getState, mj_stateSize
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+
+import dynamics as dyn
+from dynamics import InverseDynamicsConfig, RneaInverseDynamics
+from sensors import FTStream
+from transformations import Poses, homogenize, se3_wedge
+from .simulate import STATE_SPEC
+
+
+@dataclass
+class KinematicConfig:
+    # Replace simulate() by simulate_kinematic() in main.py, i.e., record the
+    # ideal wrench of the payload along the planned motion without mj_step
+    enabled: bool = False
+
+
+def get_ground_truth_params(
+        ground_truth: dict,
+        pose_sen_obj: SE3,
+        ) -> NDArray:
+    """Inertial params of the payload (10, ) rel. to the FT sensor, in the order of
+    get_regressor_matrix()
+    """
+
+    mass = ground_truth["mass"]
+    com_obj = np.asarray(ground_truth["com"])
+    ixx, iyy, izz, ixy, iyz, izx = ground_truth["globalinertia"]  # about the object's origin
+    imat_obj = np.array([[ixx, ixy, izx], [ixy, iyy, iyz], [izx, iyz, izz]])
+    imat_obji = imat_obj - mass * (com_obj @ com_obj * np.eye(3) - np.outer(com_obj, com_obj))
+
+    com_sen = pose_sen_obj.rot.dot(com_obj) + pose_sen_obj.trans
+    imat_sen = dyn.coordinate_transfer_imat(SE3(pose_sen_obj.rot, com_sen), imat_obji, mass)
+
+    return np.array([mass, *(mass * com_sen), *np.diag(imat_sen),
+                     imat_sen[0, 1], imat_sen[1, 2], imat_sen[2, 0]])
+
+
+def get_frame_steps(
+        time: float,  # at the first step
+        timestep: float,
+        n_steps: int,
+        fps: float,
+        ) -> tuple[NDArray, NDArray]:
+    """Steps at which simulate() records the frames and the time of every step"""
+
+    # Accumulated as mj_step does so that the frames fall on the same steps
+    times = np.cumsum(np.concatenate(([time], np.full(n_steps - 1, timestep))))
+    frame_times = times * fps
+    n_frames = int(np.floor(frame_times[-1])) + 1
+    # The first step of each frame k such that k <= time * fps
+    steps = np.searchsorted(frame_times, np.arange(n_frames), side="left")
+
+    return steps, times
+
+
+def simulate_kinematic(
+        m: MjModel,
+        d: MjData,
+        logger, planner,
+        ground_truth: dict,
+        stream: FTStream = None,
+        record_states: bool = True,  # of the frames for render(), e.g., not if only identifying
+        ) -> dict:
+    """Record the frames of the planned motion as if it were tracked perfectly.
+
+    Neither mj_step nor the controller runs. The (d)twists of the FT sensor
+    along the planned trajectory of the frames, or of every step if the
+    stream is enabled, come from one batched RNEA, and the clean wrench is the
+    regressor times the ground truth params, i.e., the ideal reading of the
+    sensor. The states of the frames hold the planned qpos and qvel so that
+    render() replays them, and d is left at the last frame. The outputs are
+    those of simulate() but the timing.
+    """
+
+    mj_forward(m, d)  # populate the global poses read by Poses
+    poses = Poses(m, d)
+    inverse_dynamics = RneaInverseDynamics(InverseDynamicsConfig(), m, d)
+
+    pose_x_obj = poses.get_x_("body", "target/object")
+    pose_x_obji = pose_x_obj.dot(poses.get_b_biof("target/object"))
+    pose_x_sen = poses.get_x_("site", "target/ft_sensor")
+    pose_sen_obj = pose_x_sen.inv().dot(pose_x_obj)  # static
+    pose_sen_obji = pose_x_sen.inv().dot(pose_x_obji)  # static
+    params = get_ground_truth_params(ground_truth, pose_sen_obj)
+
+    steps, times = get_frame_steps(d.time, m.opt.timestep, planner.n_steps, logger.fps)
+    if stream is not None and not stream.enabled:
+        stream = None
+
+    # Everything at once ==========================================================
+    sample_steps = np.arange(planner.n_steps) if stream is not None else steps
+    trajs = planner.plan(sample_steps)
+    twists_sen, dtwists_sen = inverse_dynamics.get_twists_sen_batch(trajs)
+    regressors = dyn.get_regressor_matrices(twists_sen, dtwists_sen)
+    fts_sen = regressors @ params
+
+    if stream is not None:
+        stream.start(planner.n_steps)
+        stream.recorder.extend(dict(time=times, fts_sen=fts_sen, twists_sen=twists_sen,
+                                    dtwists_sen=dtwists_sen))
+        trajs, twists_sen, dtwists_sen, regressors, fts_sen = \
+            trajs[steps], twists_sen[steps], dtwists_sen[steps], regressors[steps], fts_sen[steps]
+
+    # Linear acceleration of the object's CoM, see dyn.extract_linacc_frame_transferred()
+    pos_sen_obji = homogenize(pose_sen_obji.trans)
+    twist_mats = se3_wedge(twists_sen)
+    linvels_sen_obji = twist_mats @ pos_sen_obji
+    linaccs_sen_obji = (se3_wedge(dtwists_sen) @ pos_sen_obji
+                        + np.einsum("bkl,bl->bk", twist_mats, linvels_sen_obji))[:, :3]
+
+    # States of the frames ========================================================
+    states = np.empty((len(steps) if record_states else 0, mj_stateSize(m, STATE_SPEC)))
+    for state, time, traj in zip(states, times[steps], trajs):
+        d.time = time
+        d.qpos[:] = traj[0]
+        d.qvel[:] = traj[1]
+        mj_getState(m, d, state, STATE_SPEC)
+
+    return dict(states=states,
+                time=times[steps],
+                tgt_trajectory=trajs,
+                trajectory=trajs.copy(),
+                regressors=regressors,
+                fts_sen_clean=fts_sen,
+                poses_sen_obj=np.tile(pose_sen_obj.as_matrix(), (len(steps), 1, 1)),
+                twists_sen=twists_sen,
+                dtwists_sen=dtwists_sen,
+                linaccs_sen_obji=linaccs_sen_obji,
+                stream=None if stream is None else stream.recorder.views(),
+                timing=None,  # nothing is stepped
+                )
@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+from mujoco._functions import (mj_differentiatePos, mj_forward, mj_getState, mj_setState,
+                               mj_stateSize, mj_step)
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+from tqdm import tqdm
+
+from dynamics import get_inverse_dynamics, get_twists_sen, stack_inverse_dynamics
+from pacers import RealtimePacer, RealtimePacerConfig
+from transformations import Poses
+from utilities import get_element_id
+from .simulate import STATE_SPEC, get_frame_recorder, record_frame
+
+
+N_COLLISION_BITS = 31  # of contype and conaffinity, int32 without the sign bit
+
+
+@dataclass
+class SceneConfig:
+    # Replicas of the manipulator with a target each, compiled into one model
+    # and advanced together by simulate_scene(). Passed to
+    # generate_scene_model_data() by a script since main.py runs one episode
+    n_replicas: int = 1
+    target_names: list[str] = field(default_factory=list)  # of the replicas in turn, target_name if empty
+    spacing: float = 10.0  # [m] between the bases of the replicas laid out on a grid
+
+
+@dataclass
+class Replica:
+    """A manipulator and its target in the scene, and its own model compiled alone.
+
+    The standalone model binds the components of the replica, e.g., the planner,
+    the controller and the inverse dynamics, and replays its recorded states,
+    e.g., by render(). The slices and indices address the scene's MjData.
+    """
+
+    prefix: str
+    target_name: str
+    m: MjModel  # standalone
+    d: MjData  # standalone
+    ground_truth: dict
+    qpos: slice
+    qvel: slice
+    ctrl: slice
+    force: list[int]  # of the scene's sensordata
+    torque: list[int]
+    bodies: NDArray  # of the scene, in the order of the standalone ones but the world
+
+
+def get_replica_state(
+        d: MjData,  # of the scene
+        replica: Replica,
+        state: NDArray,  # of the standalone model, written in place
+        ) -> NDArray:
+    """State of the replica's standalone model reproducing the replica in the scene"""
+
+    d_replica = replica.d
+    d_replica.time = d.time
+    d_replica.qpos[:] = d.qpos[replica.qpos]
+    d_replica.qvel[:] = d.qvel[replica.qvel]
+    d_replica.qacc_warmstart[:] = d.qacc_warmstart[replica.qvel]
+    d_replica.ctrl[:] = d.ctrl[replica.ctrl]  # the motors have no activation
+    d_replica.qfrc_applied[:] = d.qfrc_applied[replica.qvel]
+    d_replica.xfrc_applied[1:] = d.xfrc_applied[replica.bodies]
+    mj_getState(replica.m, d_replica, state, STATE_SPEC)
+
+    return state
+
+
+def simulate_scene(
+        m: MjModel,
+        d: MjData,
+        replicas: list[Replica],
+        fps: float,
+        planners: list, controllers: list,  # of the replicas, bound to their standalone models
+        pacer: RealtimePacer = None,
+        ) -> list[dict]:
+    """Run the episodes of the replicas, advancing all of them by one mj_step.
+
+    The planning, the control and the records of each replica are those of
+    simulate(), indexed into the scene's data, the inverse dynamics of the
+    replicas being batched by inverse_batch(), and the physics of each replica
+    is returned as simulate() returns it, its states being of the standalone
+    model so that render() replays them. The stream, the telemetry and
+    checkpoints are not supported.
+    """
+
+    n_steps = planners[0].n_steps
+    if any(n_steps != planner.n_steps for planner in planners):
+        raise ValueError("The planners of the replicas have to be of the same number of "
+                         "steps since each step advances all of them at once.")
+
+    # Bind the replicas' inverse dynamics stacked and their static poses ===========
+    inverses, ids_ll, poses_sen, recorders, states = [], [], [], [], []
+    for replica in replicas:
+        m_replica, d_replica = replica.m, replica.d
+        mj_forward(m_replica, d_replica)  # populate the global poses read by Poses
+        poses = Poses(m_replica, d_replica)
+        inverses.append(get_inverse_dynamics(m_replica, poses))
+
+        id_ll = get_element_id(m_replica, "body", "link6")  # l(ast) l(ink)
+        pose_x_obj = poses.get_x_("body", "target/object")
+        pose_x_obji = pose_x_obj.dot(poses.get_b_biof("target/object"))
+        pose_x_sen = poses.get_x_("site", "target/ft_sensor")
+        # All static as the FT sensor and the object are fixed to the last link
+        poses_sen.append((pose_x_sen.inv().dot(poses.x_b[id_ll].dot(poses.l_lj[id_ll])),
+                          pose_x_sen.inv().dot(pose_x_obj),
+                          pose_x_sen.inv().dot(pose_x_obji)))
+        ids_ll.append(id_ll)
+
+        states.append(np.empty(mj_stateSize(m_replica, STATE_SPEC)))
+        recorders.append(get_frame_recorder(n_steps * m.opt.timestep * fps + 1, m_replica.nu,
+                                            len(states[-1])))
+
+    # One RNEA of all the replicas at once, which dominates a step otherwise
+    inverse = stack_inverse_dynamics(inverses)
+    qpos_ids = np.array([np.arange(r.qpos.start, r.qpos.stop) for r in replicas])
+    qvel_ids = np.array([np.arange(r.qvel.start, r.qvel.stop) for r in replicas])
+    ctrl_ids = np.array([np.arange(r.ctrl.start, r.ctrl.stop) for r in replicas])
+    gain_matrices = np.array([controller.gain_matrix for controller in controllers])
+    res_qposes = np.empty(ctrl_ids.shape)
+
+    # The state before the last mj_step is the one a frame observes as in simulate()
+    state = np.empty(mj_stateSize(m, STATE_SPEC))
+    mj_getState(m, d, state, STATE_SPEC)
+    d_frame = MjData(m)  # holding it to be split into the replicas' states
+    frame_count = 0
+
+    if pacer is None:
+        pacer = RealtimePacer(RealtimePacerConfig(), m, d)  # measure only
+    pacer.start(n_steps, ["plan", "inverse", "log", "control", "step"])
+
+    # =========================================================================
+    # Main loop
+    # =========================================================================
+    for step in tqdm(range(n_steps), desc="Progress"):
+        pacer.tick()
+        tgt_trajs = np.array([planner.plan(step) for planner in planners])
+        tgt_ctrls, _, _ = inverse(tgt_trajs)
+        pacer.lap("plan")
+
+        act_trajs = np.stack((d.qpos[qpos_ids], d.qvel[qvel_ids], d.qacc[qvel_ids]), axis=1)
+        _, twists_lj_l, dtwists_lj_l = inverse(act_trajs)
+        pacer.lap("inverse")
+
+        if frame_count <= d.time * fps:
+            mj_setState(m, d_frame, state, STATE_SPEC)
+            for k, replica in enumerate(replicas):
+                pose_sen_llj, pose_sen_obj, pose_sen_obji = poses_sen[k]
+                twist_sen, dtwist_sen = get_twists_sen(pose_sen_llj, twists_lj_l[k, ids_ll[k]],
+                                                       dtwists_lj_l[k, ids_ll[k]])
+                record_frame(recorders[k], d.time, tgt_trajs[k], act_trajs[k],
+                             d.sensordata[replica.force], d.sensordata[replica.torque],
+                             twist_sen, dtwist_sen, pose_sen_obj, pose_sen_obji,
+                             get_replica_state(d_frame, replica, states[k]))
+            frame_count += 1
+        pacer.lap("log")
+
+        for k, replica in enumerate(replicas):
+            mj_differentiatePos(replica.m, res_qposes[k], replica.m.nu, act_trajs[k, 0],
+                                tgt_trajs[k, 0])
+        res_states = np.concatenate((res_qposes, tgt_trajs[:, 1] - act_trajs[:, 1]), axis=1)
+        d.ctrl[ctrl_ids] = tgt_ctrls - np.einsum("bij,bj->bi", gain_matrices, res_states)
+        pacer.lap("control")
+
+        mj_getState(m, d, state, STATE_SPEC)
+        mj_step(m, d)  # <<<<<<<<<<<<<<<<<<<<<<<<<<<<<< Evolve all the replicas at once
+        pacer.lap("step")
+        pacer.wait()
+
+    # Post process data =======================================================
+    timing = pacer.summary()
+    physics = []
+    for recorder in recorders:
+        records = recorder.views()
+        physics.append(dict(states=records["states"],
+                            time=records["time"],
+                            tgt_trajectory=records["tgt_trajectory"],
+                            trajectory=records["trajectory"],
+                            regressors=records["regressors"],
+                            fts_sen_clean=records["fts_sen"],
+                            poses_sen_obj=records["poses_sen_obj"],
+                            twists_sen=records["twists_sen"],
+                            dtwists_sen=records["dtwists_sen"],
+                            linaccs_sen_obji=records["linaccs_sen_obji"],
+                            stream=None,
+                            timing=timing,  # of the scene
+                            ))
+
+    return physics
@@ -1,20 +1,27 @@
-from functools import partial
+import copy
+from collections.abc import Callable
 
 import matplotlib as mpl
 import numpy as np
 from liegroups import SE3
 from matplotlib import pyplot as plt
-from mujoco._functions import mj_differentiatePos, mj_step
-from mujoco._structs import MjModel, MjData, MjOption
-from numpy import linalg as nla
+from numpy.typing import NDArray
+from mujoco._enums import mjtState
+from mujoco._functions import (mj_differentiatePos, mj_forward, mj_getState, mj_setState,
+                               mj_stateSize, mj_step)
+from mujoco._structs import MjModel, MjData
 from tqdm import tqdm
 
 
 import dynamics as dyn
 import visualization as vis
+from checkpoints import Checkpointer
+from dynamics import InverseDynamicsConfig, RneaInverseDynamics
+from keyframes import KeyframeSelector
+from pacers import RealtimePacer, RealtimePacerConfig
 from transformations import Poses
-from sensors import Sensors
-from utilities import get_element_id
+from loggers import Telemetry, TrajectoryRecorder
+from sensors import FTStream, Sensors
 
 
 # Naming convention of spatial and dynamics variables:
@@ -58,29 +65,108 @@ from utilities import get_element_id
 #
 
 
+# Components of MjData recorded at each frame to replay it, e.g., for rendering
+STATE_SPEC = mjtState.mjSTATE_INTEGRATION
+
 # Remove redundant space at the head and tail of the horizontal axis's scale
 mpl.rcParams['axes.xmargin'] = 0
 # Reduce the number of digits of values with numpy
 np.set_printoptions(precision=5, suppress=True)
 
 
+def get_frame_recorder(
+        n_frames: float,  # expected over the episode
+        nu: int,
+        state_size: int,
+        ) -> TrajectoryRecorder:
+    """Columns of the records of each frame preallocated for the episode"""
+
+    recorder = TrajectoryRecorder(n_frames)
+    recorder.add("time")
+    recorder.add("tgt_trajectory", (3, nu))
+    recorder.add("trajectory", (3, nu))
+    recorder.add("fts_sen", (6, ))
+    recorder.add("regressors", (6, 10))
+    recorder.add("states", (state_size, ))
+    recorder.add("poses_sen_obj", (4, 4))
+    recorder.add("twists_sen", (6, ))
+    recorder.add("dtwists_sen", (6, ))
+    recorder.add("linaccs_sen_obji", (3, ))
+
+    return recorder
+
+
+def record_frame(
+        recorder: TrajectoryRecorder,
+        time: float,
+        tgt_traj: NDArray,
+        act_traj: NDArray,
+        force: NDArray,
+        torque: NDArray,
+        twist_sen: NDArray,
+        dtwist_sen: NDArray,
+        pose_sen_obj: SE3,
+        pose_sen_obji: SE3,
+        state: NDArray,  # rendered later by render()
+        ) -> int:
+    """Write the records of a frame into the next row and return the row"""
+
+    row = recorder.next_row()
+    recorder["time"][row] = time
+    recorder["tgt_trajectory"][row] = tgt_traj
+    recorder["trajectory"][row] = act_traj
+
+    # Get linacc_sen_obj for later verification
+    recorder["linaccs_sen_obji"][row] = dyn.extract_linacc_frame_transferred(twist_sen,
+                                                                             dtwist_sen,
+                                                                             pose_sen_obji)
+
+    # Get force-torque measurements
+    recorder["fts_sen"][row, :3] = force
+    recorder["fts_sen"][row, 3:] = torque
+
+    recorder["regressors"][row] = dyn.get_regressor_matrix(twist_sen, dtwist_sen)
+
+    # Log NeMD ingredients ====================================================
+    # Items which need to be computed at every frame recoding
+    recorder["states"][row] = state
+    recorder["poses_sen_obj"][row] = pose_sen_obj.as_matrix()
+    recorder["twists_sen"][row] = twist_sen
+    recorder["dtwists_sen"][row] = dtwist_sen
+
+    return row
+
+
 def simulate(
         m: MjModel,
         d: MjData,
         logger, planner, controller,  # TODO: annotate late... make a BaseModule or something and use Protocol or Generic, maybe...
+        pacer: RealtimePacer = None,
+        checkpointer: Checkpointer = None,
+        checkpoint: dict = None,
+        stream: FTStream = None,
+        telemetry: Telemetry = None,
+        inverse_dynamics: RneaInverseDynamics = None,
         ):
+    """Run the physics and record the clean measurements and states of the frames.
+
+    The wrench and the twists of the FT sensor are also recorded at every step
+    if the stream is enabled, the twists being computed by the inverse dynamics
+    only when they are recorded. Nothing is rendered here. The states of the
+    frames are replayed by render() so that the physics and the rendering are
+    cached and rerun independently.
+    The episode continues after the step of a checkpoint if given, otherwise
+    after the latest one saved by the checkpointer if resuming is enabled.
+    """
 
     # Instantiate register classes ================================================
+    # Of the kinematics of the state of d, as those left in d may be of another
+    # state, e.g., perturbed by the finite differences of the controller
+    mj_forward(m, d)
     poses = Poses(m, d)
     sensors = Sensors(m, d)
 
-    # Get ids and indices for the sake of convenience =============================
-    id_ll = get_element_id(m, "body", "link6")  # l(ast) l(ink)
-    id_x2ll = slice(0, id_ll + 1)
-
-    # Join the spatial inertia matrices of bodies later than the last link into the
-    # spatial inertia matrix of the link so that dyn.inverse() can consider the
-    # bodies' inertia =============================================================
+    # Get poses of the object and the FT sensor ==================================
     pose_x_obj = poses.get_x_("body", "target/object")
     pose_obj_obji = poses.get_b_biof("target/object")
     pose_x_obji = pose_x_obj.dot(pose_obj_obji)
@@ -88,155 +174,110 @@ def simulate(
     pose_x_sen = poses.get_x_("site", "target/ft_sensor")
     pose_sen_obj = pose_x_sen.inv().dot(pose_x_obj)
     pose_sen_obji = pose_x_sen.inv().dot(pose_x_obji)
-    pose_x_ll = poses.x_b[id_ll]  # dynamic
-    pose_ll_llj = poses.l_lj[id_ll]  # static
-    # NOTE: Variables below should be declared not here but whenever neccessary.
-    # pose_x_llj = pose_x_ll.dot(pose_ll_llj)  # static, should be dynamic tho
-    # pose_sen_llj = pose_x_sen.inv().dot(pose_x_llj)  # dynamic, should be static tho
-
-    # Get unit screws wr2 link joints =============================================
-    uscrews_lj = []
-    for t, ax in zip(m.jnt_type, m.jnt_axis):
-        us_lj = np.zeros(6)
-        if 2 == t:  # slider joint
-            us_lj[:3] += ax
-        elif 3 == t:  # hinge joint
-            us_lj[3:] += ax
-        else:
-            raise TypeError("Only slide or hinge joints, represented as 2 or 3 "
-                            "for an element of m.jnt_type, are supported.")
-
-        uscrews_lj.append(us_lj)
-    uscrews_lj = np.array(uscrews_lj)
-
-    # Transfer the reference frame where each link's spatial inertia matrix is de-
-    # fined from the body principal frame to the joint frame ======================
-    # 下のメソッドが出力するのはボディの慣性座標系で記述された空間慣性テンソル 
-    simats_bi_b = dyn.get_spatial_inertia_matrix(m.body_mass,
-                                                 m.body_inertia,
-                                                 )
-
-    simats_lj_l = []
-    for pose_lj_li, simat_li_l in zip(poses.lj_li, simats_bi_b[id_x2ll]):  # x~last
-        simats_lj_l.append(dyn.transfer_simat(pose_lj_li, simat_li_l))
-
-    simats_lj_l = np.array(simats_lj_l)
-
-    # Join the spatial inertia matrices of the bodies later than the last link to
-    # its spatial inertia matrix so that dyn.inverse() can consider the bodies'
-    # inertia =====================================================================
-
-    simat_sen_obj = np.zeros((6, 6))
-
-    for pose_x_bi, simat_bi_b in zip(poses.x_bi[id_ll+1:], simats_bi_b[id_ll+1:]):
-        # "b" here is ∈ {attachment, object}
-        pose_x_llj = pose_x_ll.dot(pose_ll_llj)
-        pose_bi_llj = pose_x_bi.inv().dot(pose_x_llj)
-        simat_llj_b = dyn.transfer_simat(pose_bi_llj.inv(), simat_bi_b)
-        simat_sen_obj += simat_llj_b
-        simats_lj_l[id_ll] += simat_llj_b
-
-    # Get link joints' home poses wr2 their parents' joint frame ==================
-    hposes_lj_kj = [SE3.identity()]  # for worldbody
-    for k in range(m.njnt):
-        hpose_kj_k = poses.l_lj[k].inv()
-        hpose_l_lj = poses.l_lj[k+1]
-        hpose_k_l = poses.a_b[k+1]
-        hpose_kj_lj = hpose_kj_k.dot(hpose_k_l.dot(hpose_l_lj))
-        hposes_lj_kj.append(hpose_kj_lj.inv())
-
-    # Set some arguments of dyn.inverse() which dose not evolve along time ========
-    gacc_x = -1 * np.array([*MjOption().gravity, 0, 0, 0])
-    inverse = partial(dyn.inverse,
-                      hposes_body_parent=hposes_lj_kj,
-                      simats_body=simats_lj_l,
-                      uscrews_body=np.array(uscrews_lj),
-                      twist_0=np.zeros(6),
-                      dtwist_0=gacc_x,
-                      )
 
+    # Feedforward controls and (d)twist_sen, the RNEA of dynamics by default ======
+    if inverse_dynamics is None:
+        inverse_dynamics = RneaInverseDynamics(InverseDynamicsConfig(), m, d)
 
     # Set a random number generator ===========================================
     rng = np.random.default_rng()
     rng.standard_normal(10)
 
     # Prepare data containers =================================================
-    res_qpos = np.empty(m.nu)
-    tgt_trajectory = []
-    trajectory = []
-    fts_sen = []
-    time = []
-    linacc_sen_obji = []
+    # Buffers written in place at each step, and views of d and its sensors got
+    # once, so that a step allocates nothing but in inverse_dynamics and MuJoCo
+    qpos, qvel, qacc, ctrl = d.qpos, d.qvel, d.qacc, d.ctrl
+    force, torque = sensors.get("force"), sensors.get("torque")
+    tgt_traj = np.empty((3, m.nv))
+    tgt_qpos, tgt_qvel, _ = tgt_traj
+    act_traj = np.empty((3, m.nv))
+    act_qpos, act_qvel, act_qacc = act_traj
+    res_state = np.empty(2 * m.nu)
+    res_qpos, res_qvel = res_state[:m.nu], res_state[m.nu:]
+    feedback = np.empty(m.nu)
     frame_count = 0
-    regressors = []
-    frames = []
 
-    file_paths = []
-    transform_matrices = []
-    poses_sen_obj = []
-    poses_sen_obji = []
-    twists_sen = []
-    dtwists_sen = []
-    linaccs_sen_obji = []
+    # The kinematics in d lag one step behind d.qpos after mj_step, so the state
+    # before the last mj_step is the one reproducing what a frame observes
+    state = np.empty(mj_stateSize(m, STATE_SPEC))
+    mj_getState(m, d, state, STATE_SPEC)
+    initial_state = state.copy()
+
+    # Rows of the frames written in place into columns preallocated for the
+    # frames expected over the episode, also saved with checkpoints
+    recorder = get_frame_recorder(planner.n_steps * m.opt.timestep * logger.fps + 1, m.nu,
+                                  len(state))
+    if stream is not None and not stream.enabled:
+        stream = None
+    if stream is not None:
+        stream.start(planner.n_steps)
+    if telemetry is not None and not telemetry.enabled:
+        telemetry = None
+
+    # Resume from a checkpoint ================================================
+    start_step = 0
+    if checkpoint is None and checkpointer is not None:
+        checkpoint = checkpointer.load_latest()
+
+    if checkpoint is not None:
+        if len(state) != len(checkpoint["state"]):
+            raise ValueError("The state of the checkpoint does not match the size of the "
+                             "model's state. The checkpoint is of another model.")
+
+        initial_state = checkpoint["initial_state"]
+        start_step = checkpoint["step"] + 1
+        frame_count = checkpoint["frame_count"]
+        recorder.extend(checkpoint["records"])
+        if stream is not None:
+            stream.recorder.extend(checkpoint["stream"])
+        controller.gain_matrix = checkpoint["gain_matrix"]
+
+        state[:] = checkpoint["state"]
+        mj_setState(m, d, state, STATE_SPEC)
+        mj_step(m, d)  # the step at which the checkpoint was taken
+
+    # Plot the episode live from another process
+    if telemetry is not None:
+        telemetry.start(m.nu)
+        for regressor, wrench in zip(recorder.view("regressors"), recorder.view("fts_sen")):
+            telemetry.accumulate(regressor, wrench)  # of the frames of a checkpoint
+
+    # Measure the latency of each stage of a step and pace the step to the wall
+    # clock if enabled ========================================================
+    if pacer is None:
+        pacer = RealtimePacer(RealtimePacerConfig(), m, d)  # measure only
+    pacer.start(planner.n_steps - start_step,
+                ["plan", "inverse", "log", "control", "checkpoint", "step"])
 
     # =========================================================================
     # Main loop
     # =========================================================================
-    for step in tqdm(range(planner.n_steps), desc="Progress"):
-        # Compute actuator controls and evolute the simulatoin
-        tgt_traj = planner.plan(step)
-        tgt_ctrl, _, _, _= inverse(tgt_traj)
-
-        # Get current sensor measurements of joint variables by calling d.q***
-        qpos, qvel, qacc = d.qpos, d.qvel, d.qacc
-
-        act_traj = np.stack((qpos, qvel, qacc))
-        _, _, twists_lj_l, dtwists_lj_l = inverse(act_traj)
-
-        if frame_count <= d.time * logger.fps:
-            time.append(d.time)
-            tgt_trajectory.append(tgt_traj)
-            trajectory.append(act_traj)
-
-            # Get (d)twist_sen, and linacc_sen_obj for later verification
-            pose_sen_llj = pose_x_sen.inv().dot(pose_x_ll.dot(pose_ll_llj))
-            twist_llj = twists_lj_l[id_ll]
-            twist_sen = pose_sen_llj.adjoint() @ twist_llj
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            dtwist_llj = dtwists_lj_l[id_ll]
-            pose_sen_llj_dadjoint = SE3.curlywedge(twist_sen) @ pose_sen_llj.adjoint()
-            dtwist_sen = pose_sen_llj_dadjoint @ twist_llj \
-                       + pose_sen_llj.adjoint() @ dtwist_llj
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-
-            linacc_sen_obji = dyn.extract_linacc_frame_transferred(twist_sen,
-                                                                   dtwist_sen,
-                                                                   pose_sen_obji)
-            linaccs_sen_obji.append(linacc_sen_obji)
-
-            # Get force-torque measurements
-            force = sensors.get("force")
-            torque = sensors.get("torque")
-            wrench = np.concatenate([force, torque], axis=None)
-            fts_sen.append(wrench)
-
-            regressor = dyn.get_regressor_matrix(twist_sen, dtwist_sen)
-            regressors.append(regressor)
-
-            # Writing a single frame of a dataset =============================
-            file_name = f"{frame_count:04}.png"
-            logger.render(d, file_name)  # logger.cam_id is selected internally
-
-            # Log NeMD ingredients ============================================
-            # Items which need to be computed at every frame recoding
-            pose_obj_cam = pose_x_obj.inv().dot(poses.x_cam[logger.cam_id])
-
-            file_paths.append(str(logger.complete_image_dir / file_name))
-            transform_matrices.append(pose_obj_cam.as_matrix().tolist())
-            poses_sen_obj.append(pose_sen_obj.as_matrix().tolist())
-            poses_sen_obji.append(pose_sen_obji.as_matrix().tolist())
-            twists_sen.append(twist_sen.tolist())
-            dtwists_sen.append(dtwist_sen.tolist())
+    # The monitor is closed also if the episode is interrupted, e.g., by Ctrl+C
+    try:
+        for step in tqdm(range(start_step, planner.n_steps), desc="Progress"):
+            pacer.tick()
+            # Compute actuator controls and evolute the simulatoin
+            planner.plan(step, out=tgt_traj)
+            tgt_ctrl = inverse_dynamics.get_ctrl(tgt_traj)
+            pacer.lap("plan")
+
+            # Get current sensor measurements of joint variables
+            np.copyto(act_qpos, qpos)
+            np.copyto(act_qvel, qvel)
+            np.copyto(act_qacc, qacc)
+            frame_due = frame_count <= d.time * logger.fps
+            if frame_due or stream is not None:
+                twist_sen, dtwist_sen = inverse_dynamics.get_twists_sen(act_traj)
+            pacer.lap("inverse")
+
+            if stream is not None:
+                stream.record(d.time, force, torque, twist_sen, dtwist_sen)
+
+            if frame_due:
+                row = record_frame(recorder, d.time, tgt_traj, act_traj, force, torque, twist_sen,
+                                   dtwist_sen, pose_sen_obj, pose_sen_obji, state)
+                if telemetry is not None:
+                    telemetry.accumulate(recorder["regressors"][row], recorder["fts_sen"][row])
 
 #            frame = dict(
 #                file_path=str(logger.complete_image_dir / file_name),
@@ -251,60 +292,243 @@ def simulate(
 #
 #            #logger.transform["frames"].append(frame)
 #            frames.append(frame)
-            frame_count += 1
-
-        # Get residual of state
-        mj_differentiatePos(# Use this func to differenciate quat properly
-            m,  # MjModel
-            res_qpos,  # data container for the residual of qpos
-            m.nu,  # idx of a joint up to which res_qpos are calculated
-            qpos,  # current qpos
-            tgt_traj[0],                 # target qpos or next qpos to calkculate dqvel
-        )
+                frame_count += 1
+
+            pacer.lap("log")
+
+            # Get residual of state
+            mj_differentiatePos(# Use this func to differenciate quat properly
+                m,  # MjModel
+                res_qpos,  # data container for the residual of qpos
+                m.nu,  # idx of a joint up to which res_qpos are calculated
+                qpos,  # current qpos
+                tgt_qpos,                    # target qpos or next qpos to calkculate dqvel
+            )
+
+            np.subtract(tgt_qvel, qvel, out=res_qvel)
+            # Compute and set control, or actuator inputs
+            np.dot(controller.gain_matrix, res_state, out=feedback)
+            np.subtract(tgt_ctrl, feedback, out=ctrl)
+            if telemetry is not None and telemetry.due(step):
+                telemetry.publish(d.time, res_qpos, force, torque)
+            pacer.lap("control")
+
+            mj_getState(m, d, state, STATE_SPEC)
+            if checkpointer is not None and checkpointer.due(step):
+                checkpointer.save(step, dict(initial_state=initial_state,
+                                             state=state.copy(),
+                                             frame_count=frame_count,
+                                             gain_matrix=controller.gain_matrix,
+                                             records=recorder.views(),
+                                             stream=None if stream is None else stream.recorder.views(),
+                                             ))
+            pacer.lap("checkpoint")
+
+            mj_step(m, d) # <<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<< Evolve the simulation
+            pacer.lap("step")
+            pacer.wait()
+
+        if checkpointer is not None:
+            checkpointer.finish()  # not to resume the finished episode by a rerun
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+
+    # Post process data =======================================================
+    # Views of the recorded rows, nothing is copied
+    records = recorder.views()
+    return dict(states=records["states"],
+                time=records["time"],
+                tgt_trajectory=records["tgt_trajectory"],
+                trajectory=records["trajectory"],
+                regressors=records["regressors"],
+                fts_sen_clean=records["fts_sen"],
+                poses_sen_obj=records["poses_sen_obj"],
+                twists_sen=records["twists_sen"],
+                dtwists_sen=records["dtwists_sen"],
+                linaccs_sen_obji=records["linaccs_sen_obji"],
+                stream=None if stream is None else stream.recorder.views(),  # at the physics rate
+                timing=pacer.summary(),
+                )
+
+
+def fork(
+        m: MjModel,
+        logger, planner, controller,
+        checkpoint: dict,
+        perturbations: list[Callable[[MjModel], None]],
+        ) -> list[dict]:
+    """Continue an episode from a checkpoint once per perturbation of the model.
 
-        #res_state = np.concatenate((res_qpos, tgt_traj[1] - d.qvel))
-        res_state = np.concatenate((res_qpos, tgt_traj[1] - qvel))
-        # Compute and set control, or actuator inputs
-        d.ctrl = tgt_ctrl - controller.gain_matrix @ res_state
+    Each perturbation modifies a copy of the model in place, e.g., the mass of
+    the payload, and the variant is simulated from the step of the checkpoint
+    only, sharing the prefix recorded in the checkpoint.
+    """
 
-        mj_step(m, d) # <<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<< Evolve the simulation
+    results = []
+    for perturb in perturbations:
+        m_variant = copy.deepcopy(m)
+        perturb(m_variant)
+        # Start from the initial state of the episode as simulate() reads the
+        # static poses from d before restoring the checkpoint
+        d_variant = MjData(m_variant)
+        mj_setState(m_variant, d_variant, checkpoint["initial_state"], STATE_SPEC)
+
+        results.append(simulate(m_variant, d_variant, logger, planner, controller,
+                                checkpoint=checkpoint))
+
+    return results
+
+
+def select_keyframes(
+        m: MjModel,
+        d: MjData,
+        logger,
+        selector: KeyframeSelector,
+        physics: dict,
+        ) -> NDArray:
+    """Get the indices of the frames to render out of those recorded by simulate().
+
+    The viewpoint of each frame is the pose of the tracking camera relative to
+    the object, which is got from the kinematics of its state without rendering.
+    """
+
+    states = physics["states"]
+    if not selector.enabled(len(states)):
+        return np.arange(len(states))
+
+    mj_forward(m, d)  # populate the global poses read by Poses
+    poses = Poses(m, d)
+    pose_x_obj = poses.get_x_("body", "target/object")  # dynamic
+
+    final_state = np.empty(mj_stateSize(m, STATE_SPEC))
+    mj_getState(m, d, final_state, STATE_SPEC)
+
+    poses_obj_cam = np.empty((len(states), 4, 4))
+    for i, state in enumerate(states):
+        mj_setState(m, d, state, STATE_SPEC)
+        mj_forward(m, d)
+        poses_obj_cam[i] = pose_x_obj.inv().dot(logger.get_pose_x_cam(d, 0)).as_matrix()
+
+    mj_setState(m, d, final_state, STATE_SPEC)
+    mj_forward(m, d)
+
+    return selector.select(poses_obj_cam, physics["regressors"], physics["fts_sen_clean"])
+
+
+def render(
+        m: MjModel,
+        d: MjData,
+        logger,
+        states: NDArray,
+        indices: NDArray = None,
+        ):
+    """Render the frames by replaying their states recorded by simulate().
+
+    Only the frames of the indices are rendered if given, e.g., the keyframes,
+    keeping their indices in the file names. Every camera of the logger is
+    rendered per frame, so the file names, the transform matrices and the
+    annotations (mask, depth image) are listed per camera, the tracking camera
+    first.
+    """
+
+    if indices is None:
+        indices = np.arange(len(states))
+
+    mj_forward(m, d)  # populate the global poses read by Poses
+    poses = Poses(m, d)
+    pose_x_obj = poses.get_x_("body", "target/object")  # dynamic
+
+    final_state = np.empty(mj_stateSize(m, STATE_SPEC))
+    mj_getState(m, d, final_state, STATE_SPEC)
+
+    file_names = []
+    transform_matrices = []
+    annotations = []
+    for i in tqdm(indices, desc="Rendering"):
+        mj_setState(m, d, states[i], STATE_SPEC)
+        mj_forward(m, d)
+
+        # Writing a single frame of a dataset =================================
+        file_name = f"{i:04}.png"
+        poses_x_cam, frame_annotations = logger.render(d, file_name)
+        poses_obj_cam = [pose_x_obj.inv().dot(pose_x_cam) for pose_x_cam in poses_x_cam]
+
+        file_names.append([logger.get_file_name(file_name, k) for k in range(len(poses_x_cam))])
+        transform_matrices.append([pose.as_matrix().tolist() for pose in poses_obj_cam])
+        annotations.append(frame_annotations)
+
+    mj_setState(m, d, final_state, STATE_SPEC)
+    logger.release()
+
+    return dict(file_names=file_names, transform_matrices=transform_matrices,
+                annotations=annotations, indices=np.asarray(indices))
+
+
+def compose_frames(
+        logger,
+        physics: dict,
+        rendered: dict,
+        fts_sen: NDArray,
+        ) -> list[dict]:
+    """Join the outputs of simulate() and render() with a wrench realization.
+
+    Only the rendered frames are composed, picking their records by index. A
+    frame refers to the image of the tracking camera as a single-camera one
+    does and lists every camera under "cameras" if there are several of them.
+    """
 
-    # Post process data =======================================================
-    # Cast data into ndarrays for concise conslicing
-    tgt_trajectory = np.array(tgt_trajectory)
-    trajectory = np.array(trajectory)
-    frame_iter = np.arange(frame_count)
-    fts_sen = np.array(fts_sen)
-    regressors = np.array(regressors)
-
-    # Perturb wrench ==========================================================
-    error_rate = 0.05
-    seed = 0
-    rng = np.random.default_rng(seed)
-
-    perturb_wrench = True  # False
-    if perturb_wrench:
-        fs_std = error_rate * nla.norm(fts_sen[..., :3], axis=1).max()
-        ts_std = error_rate * nla.norm(fts_sen[..., 3:], axis=1).max()
-        fts_sen[..., :3] += fs_std * rng.standard_normal((frame_count, 3))
-        fts_sen[..., 3:] += ts_std * rng.standard_normal((frame_count, 3))
-
-    # Compose frames =========================================================
     frames = []
-    data_containers = [file_paths, transform_matrices, poses_sen_obj,
-                       twists_sen, dtwists_sen, fts_sen]
-    for fpath, tf, pose, t, dt, ft in zip(*data_containers):
+    def get_annotation(annotation):
+        annotation = dict(annotation)
+        if "depth_file_name" in annotation:
+            annotation["depth_file_path"] = str(logger.complete_image_dir
+                                                / annotation.pop("depth_file_name"))
+        return annotation
+
+    indices = rendered["indices"]
+    data_containers = [rendered["file_names"], rendered["transform_matrices"],
+                       rendered["annotations"],
+                       *[[records[i] for i in indices] for records in
+                         [physics["poses_sen_obj"], physics["twists_sen"],
+                          physics["dtwists_sen"], fts_sen]]]
+    for fnames, tfs, annotations, pose, t, dt, ft in zip(*data_containers):
         frame = dict(
-            file_path=fpath,
-            transform_matrix=tf,
-            pose_sen_obj=pose,
-            twist_sen=t,
-            dtwist_sen=dt,
+            file_path=str(logger.complete_image_dir / fnames[0]),
+            transform_matrix=tfs[0],
+            **get_annotation(annotations[0]),
+            pose_sen_obj=pose.tolist(),
+            twist_sen=t.tolist(),
+            dtwist_sen=dt.tolist(),
             ft_sen=ft.tolist(),
         )
 
+        if 1 < len(fnames):
+            frame["cameras"] = [dict(name=name,
+                                     file_path=str(logger.complete_image_dir / fname),
+                                     transform_matrix=tf,
+                                     camera_angle_x=angle_x,
+                                     **get_annotation(annotation),
+                                     )
+                                for name, fname, tf, angle_x, annotation
+                                in zip(logger.camera_names, fnames, tfs, logger.camera_angles_x,
+                                       annotations)]
+
         frames.append(frame)
 
+    return frames
+
+
+def plot_simulation(
+        physics: dict,
+        fts_sen: NDArray,
+        ):
+    time = physics["time"]
+    trajectory = physics["trajectory"]
+    tgt_trajectory = physics["tgt_trajectory"]
+    linaccs_sen_obji = physics["linaccs_sen_obji"]
+    frame_iter = np.arange(len(fts_sen))
+
     # Visualize data ==========================================================
     # Object linear acceleration and ft sensor measurements rel. to {sensor}
     # Actual and target joint positions
@@ -326,5 +550,3 @@ def simulate(
         ax.hlines(0.0, frame_iter[0], frame_iter[-1], ls="dashed", alpha=0.5)
 
     plt.show()
-
-    return dict(frames=frames, regressors=regressors)
@@ -1 +1,4 @@
 from .dynamics import *
+from .identification import *
+from .mesh_inertia import *
+from .backends import *
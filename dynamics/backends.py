@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+
+import numpy as np
+from mujoco._enums import mjtBias, mjtGain, mjtObj, mjtTrn
+from mujoco._functions import (mj_comPos, mj_comVel, mj_inverse, mj_kinematics,
+                               mj_objectAcceleration, mj_objectVelocity, mj_rnePostConstraint)
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+
+from transformations import Poses, se3_curlywedge
+from utilities import get_element_id
+from .dynamics import (get_inverse_dynamics, get_twists_sen, inverse_batch,
+                       stack_inverse_dynamics)
+
+
+@dataclass
+class InverseDynamicsConfig:
+    # Backend of the feedforward controls and the (d)twist of the FT sensor in
+    # simulate(): the RNEA of this package ("RneaInverseDynamics"), kept as the
+    # reference, or MuJoCo's ("NativeInverseDynamics")
+    target_class: str = "RneaInverseDynamics"
+
+
+class RneaInverseDynamics:
+    """inverse() of the manipulator carrying the payload, in Python.
+
+    The (d)twist of the last link's joint frame is transferred to the FT
+    sensor fixed to the link. Poses are read from d, which has to be forwarded.
+    """
+
+    def __init__(self,
+                 cfg: InverseDynamicsConfig,
+                 m: MjModel,
+                 d: MjData,
+                 ) -> None:
+        poses = Poses(m, d)
+        self.inverse = get_inverse_dynamics(m, poses)
+
+        self.id_ll = get_element_id(m, "body", "link6")  # l(ast) l(ink)
+        pose_x_sen = poses.get_x_("site", "target/ft_sensor")
+        pose_x_llj = poses.x_b[self.id_ll].dot(poses.l_lj[self.id_ll])
+        self.pose_sen_llj = pose_x_sen.inv().dot(pose_x_llj)  # static
+        self.batch_keywords = stack_inverse_dynamics([self.inverse]).keywords  # of a batch of 1
+
+    def get_ctrl(self, traj: NDArray) -> NDArray:
+        """Controls realizing the trajectory (qpos, qvel, qacc) of (3, nv)"""
+
+        return self.inverse(traj)[0]
+
+    def get_twists_sen(self, traj: NDArray) -> tuple[NDArray, NDArray]:
+        """Twist and its time derivative of the FT sensor along the trajectory"""
+
+        _, _, twists_lj_l, dtwists_lj_l = self.inverse(traj)
+        return get_twists_sen(self.pose_sen_llj, twists_lj_l[self.id_ll],
+                              dtwists_lj_l[self.id_ll])
+
+    def get_twists_sen_batch(self, trajs: NDArray) -> tuple[NDArray, NDArray]:
+        """get_twists_sen() of the trajectories (B, 3, nv) at once by inverse_batch()"""
+
+        n_batch = len(trajs)
+        keywords = dict(self.batch_keywords)
+        for key in ["hposes_body_parent", "simats_body", "uscrews_body"]:
+            keywords[key] = np.broadcast_to(keywords[key], (n_batch, *keywords[key].shape[1:]))
+        _, twists_lj_l, dtwists_lj_l = inverse_batch(trajs, **keywords)
+        twists_llj, dtwists_llj = twists_lj_l[:, self.id_ll], dtwists_lj_l[:, self.id_ll]
+
+        adjoint = self.pose_sen_llj.adjoint()
+        twists_sen = twists_llj @ adjoint.T
+        dadjoints = se3_curlywedge(twists_sen) @ adjoint
+        dtwists_sen = np.einsum("bkl,bl->bk", dadjoints, twists_llj) + dtwists_llj @ adjoint.T
+
+        return twists_sen, dtwists_sen
+
+
+class NativeInverseDynamics:
+    """The same as RneaInverseDynamics by MuJoCo's compiled functions.
+
+    The controls are mj_inverse()'s generalized forces divided by the gains of
+    the motors, and the (d)twist of the FT sensor's site is read by
+    mj_objectVelocity() and mj_objectAcceleration() in the local frame. Both
+    run on a scratch MjData so that the simulated one is left untouched.
+    The controls are written into a buffer overwritten by the next call, and
+    get_ctrl() allocates nothing if traj is a buffer reused by the caller.
+    """
+
+    def __init__(self,
+                 cfg: InverseDynamicsConfig,
+                 m: MjModel,
+                 d: MjData = None,
+                 ) -> None:
+        self.m = m
+        self.d = MjData(m)
+        # Views of the scratch MjData, got once not to allocate them at each call
+        self.qpos, self.qvel, self.qacc = self.d.qpos, self.d.qvel, self.d.qacc
+        self.qfrc_inverse = self.d.qfrc_inverse
+        self.id_sen = get_element_id(m, "site", "target/ft_sensor")
+
+        # Controls per generalized force of the motors ===========================
+        self.gains_inv = np.zeros((m.nu, m.nv))
+        for i in range(m.nu):
+            if int(mjtTrn.mjTRN_JOINT) != m.actuator_trntype[i] \
+                    or int(mjtGain.mjGAIN_FIXED) != m.actuator_gaintype[i] \
+                    or int(mjtBias.mjBIAS_NONE) != m.actuator_biastype[i]:
+                raise TypeError("Only motors driving a joint are supported by the native "
+                                "inverse dynamics. Use 'RneaInverseDynamics' instead.")
+            dof = m.jnt_dofadr[m.actuator_trnid[i, 0]]
+            self.gains_inv[i, dof] = 1 / (m.actuator_gear[i, 0] * m.actuator_gainprm[i, 0])
+
+        self.ctrl = np.empty(m.nu)
+        self._traj, self._rows = None, None
+        self.vel = np.empty(6)  # [angvel, linvel]
+        self.acc = np.empty(6)  # [angacc, linacc]
+
+    def _set(self, traj: NDArray) -> None:
+        if traj is not self._traj:  # split once if the caller reuses its buffer
+            self._traj, self._rows = traj, tuple(traj)
+        qpos, qvel, qacc = self._rows
+        np.copyto(self.qpos, qpos)
+        np.copyto(self.qvel, qvel)
+        np.copyto(self.qacc, qacc)
+
+    def get_ctrl(self, traj: NDArray) -> NDArray:
+        """Controls realizing the trajectory (qpos, qvel, qacc) of (3, nv)"""
+
+        self._set(traj)
+        mj_inverse(self.m, self.d)
+        np.dot(self.gains_inv, self.qfrc_inverse, out=self.ctrl)
+
+        return self.ctrl
+
+    def get_twists_sen(self, traj: NDArray) -> tuple[NDArray, NDArray]:
+        """Twist and its time derivative of the FT sensor along the trajectory"""
+
+        m, d = self.m, self.d
+        self._set(traj)
+        mj_kinematics(m, d)
+        mj_comPos(m, d)
+        mj_comVel(m, d)
+        mj_rnePostConstraint(m, d)  # cacc, including the gravity as inverse() does
+        mj_objectVelocity(m, d, mjtObj.mjOBJ_SITE, self.id_sen, self.vel, 1)
+        mj_objectAcceleration(m, d, mjtObj.mjOBJ_SITE, self.id_sen, self.acc, 1)
+
+        angvel, linvel = self.vel[:3], self.vel[3:]
+        twist_sen = np.concatenate((linvel, angvel))
+        # The linear acceleration of the site's origin is of the classical one,
+        # whereas the time derivative of a body twist excludes angvel x linvel
+        dtwist_sen = np.concatenate((self.acc[3:] - np.cross(angvel, linvel), self.acc[:3]))
+
+        return twist_sen, dtwist_sen
@@ -1,30 +1,55 @@
 from collections.abc import Sequence
 from dataclasses import dataclass
+from functools import partial
 from typing import Union
 
 import numpy as np
 from liegroups.numpy import SE3, SO3
-from mujoco._functions import mjd_transitionFD
-from mujoco._structs import MjModel, MjData
+from mujoco._enums import mjtBias, mjtGain, mjtIntegrator, mjtTrn
+from mujoco._functions import mj_forward, mjd_transitionFD
+from mujoco._structs import MjModel, MjData, MjOption
 from numpy.typing import NDArray
 
-from transformations import homogenize
+from transformations import (Poses, homogenize, se3_adjoint, se3_compose, se3_curlywedge,
+                             screw_exp, so3_wedge)
+from utilities import get_element_id
 
 
 @dataclass
 class StateSpaceConfig:
-    epsilon: float = 1e-8
-    centered: bool = True
+    # Linearize by finite differences of mj_step ("finite_difference") or by the
+    # analytic derivatives of the RNEA ("analytic"), exact but about 9x slower
+    method: str = "finite_difference"
+    epsilon: float = 1e-8  # finite differences only
+    centered: bool = True  # finite differences only
 
 
 class StateSpace:
+    """Discrete-time linearization x' = A x + B u of the state x = (dq, qvel, act).
+
+    The analytic method differentiates the RNEA of the manipulator carrying the
+    payload, i.e., the model of inverse(), and discretizes the resulting
+    forward dynamics as the semi-implicit Euler integrator of MuJoCo does. It
+    fills A and B only, whereas finite differences also fill C and D.
+    """
+
     def __init__(self,
                  cfg: StateSpaceConfig,
                  m: MjModel,
                  d: MjData,
                  ) -> None:
+        if cfg.method not in ["analytic", "finite_difference"]:
+            raise ValueError(f"'method' has to be either 'analytic' or 'finite_difference'. "
+                             f"'{cfg.method}' is invalid.")
+        if "analytic" == cfg.method \
+                and (0 < m.na or int(mjtIntegrator.mjINT_EULER) != m.opt.integrator):
+            raise ValueError("The analytic linearization supports the Euler integrator and "
+                             "stateless actuators only. Use 'finite_difference' instead.")
+
+        self.method = cfg.method
         self.epsilon = cfg.epsilon
         self.centered = cfg.centered
+        self.inverse_derivatives = None
 
         self.ns = 2 * m.nv + m.na  # Number of dimensions of state space
         self.nsensordata = m.nsensordata  # Number of sensor ourputs
@@ -41,7 +66,43 @@ class StateSpace:
                         m: MjModel,
                         d: MjData,
                         ) -> None:
-        mjd_transitionFD(m, d, self.epsilon, self.centered, self.A, self.B, self.C, self.D)
+        if "finite_difference" == self.method:
+            mjd_transitionFD(m, d, self.epsilon, self.centered, self.A, self.B, self.C, self.D)
+            return
+
+        mj_forward(m, d)  # qacc and the global poses read by Poses
+        if self.inverse_derivatives is None:
+            self.inverse_derivatives = get_inverse_dynamics(m, Poses(m, d), derivatives=True)
+
+        traj = np.stack((d.qpos, d.qvel, d.qacc))
+        _, dtau_dq, dtau_dqvel, mass_matrix = self.inverse_derivatives(traj)
+
+        # Actuator forces, motors only ========================================
+        gain = np.zeros((m.nv, m.nu))  # generalized force per control
+        for i in range(m.nu):
+            if int(mjtTrn.mjTRN_JOINT) != m.actuator_trntype[i] \
+                    or int(mjtGain.mjGAIN_FIXED) != m.actuator_gaintype[i] \
+                    or int(mjtBias.mjBIAS_NONE) != m.actuator_biastype[i]:
+                raise TypeError("Only motors driving a joint are supported by the analytic "
+                                "linearization. Use 'finite_difference' instead.")
+            dof = m.jnt_dofadr[m.actuator_trnid[i, 0]]
+            gain[dof, i] = m.actuator_gear[i, 0] * m.actuator_gainprm[i, 0]
+
+        # Forward dynamics qacc = M^-1 (gain u - tau_bias - damping qvel), where
+        # the Euler integrator adds h * damping to M to integrate damping
+        # implicitly, and its discretization qvel' = qvel + h qacc and
+        # dq' = dq + h qvel' ==================================================
+        h = m.opt.timestep
+        damping = np.diag(m.dof_damping)
+        mass_matrix = mass_matrix + np.diag(m.dof_armature) + h * damping
+        dqacc = np.linalg.solve(mass_matrix, np.hstack([-dtau_dq, -dtau_dqvel - damping, gain]))
+        dqacc_dq, dqacc_dqvel, dqacc_du = np.split(dqacc, [m.nv, 2 * m.nv], axis=1)
+
+        dqvel = np.hstack([h * dqacc_dq, np.eye(m.nv) + h * dqacc_dqvel])
+        self.A[:m.nv] = np.hstack([np.eye(m.nv), np.zeros((m.nv, m.nv))]) + h * dqvel
+        self.A[m.nv:2*m.nv] = dqvel
+        self.B[:m.nv] = h * h * dqacc_du
+        self.B[m.nv:2*m.nv] = h * dqacc_du
 
 
 def _get_simat(mass: float,
@@ -147,6 +208,242 @@ def inverse(traj: np.ndarray,
     return ctrl_mat.sum(axis=1), poses, twists, dtwists
 
 
+def inverse_batch(trajs: NDArray,
+                  hposes_body_parent: NDArray,
+                  simats_body: NDArray,
+                  uscrews_body: NDArray,
+                  twist_0: NDArray,
+                  dtwist_0: NDArray,
+                  ) -> tuple[NDArray, NDArray, NDArray]:
+    """RNEA of inverse() over a batch of manipulators of the same number of joints.
+
+    Each pass iterates over the joints only, every manipulator of the batch at
+    once, e.g., the replicas of a scene with their own payloads. The home poses
+    (B, n, 4, 4) are the matrices of those of inverse() but the world's, and
+    the tip is free of any wrench.
+
+    Returns the controls (B, n) and the twists and their time derivatives of
+    the bodies (B, n + 1, 6), the world's first.
+    """
+
+    n_batch, _, n = trajs.shape
+    q, dq, ddq = trajs[:, 0], trajs[:, 1], trajs[:, 2]
+
+    # Forward iterations ======================================================
+    adjoints = se3_adjoint(se3_compose(screw_exp(-1 * uscrews_body, q), hposes_body_parent))
+    twists = np.zeros((n_batch, n + 1, 6))
+    dtwists = np.zeros((n_batch, n + 1, 6))
+    twists[:, 0], dtwists[:, 0] = twist_0, dtwist_0
+    for j in range(n):
+        i = j + 1  # body of the j-th joint
+        us = uscrews_body[:, j]
+        twists[:, i] = np.einsum("bkl,bl->bk", adjoints[:, j], twists[:, i - 1]) \
+                     + us * dq[:, j, np.newaxis]  # Eq. 8.51
+        dtwists[:, i] = np.einsum("bkl,bl->bk", adjoints[:, j], dtwists[:, i - 1]) \
+                      + np.einsum("bkl,bl->bk", se3_curlywedge(twists[:, i]), us) \
+                      * dq[:, j, np.newaxis] \
+                      + us * ddq[:, j, np.newaxis]  # Eq. 8.52
+
+    # Backward iterations =====================================================
+    ctrls = np.zeros((n_batch, n))
+    wrench = np.zeros((n_batch, 6))  # of the tip
+    for j in range(n - 1, -1, -1):
+        i = j + 1
+        if j + 1 < n:
+            wrench = np.einsum("blk,bl->bk", adjoints[:, j + 1], wrench)
+        momentum = np.einsum("bkl,bl->bk", simats_body[:, i], twists[:, i])
+        wrench = wrench + np.einsum("bkl,bl->bk", simats_body[:, i], dtwists[:, i]) \
+               - np.einsum("blk,bl->bk", se3_curlywedge(twists[:, i]), momentum)  # Eq. 8.53
+        ctrls[:, j] = np.einsum("bk,bk->b", uscrews_body[:, j], wrench)  # Eq. 8.54
+
+    return ctrls, twists, dtwists
+
+
+def stack_inverse_dynamics(inverses: Sequence[partial]) -> partial:
+    """Bind inverse_batch() to the arguments stacked from those of get_inverse_dynamics()"""
+
+    keywords = [inverse.keywords for inverse in inverses]
+    return partial(inverse_batch,
+                   hposes_body_parent=np.array([[h_p.as_matrix() for h_p
+                                                 in k["hposes_body_parent"][1:]]
+                                                for k in keywords]),
+                   simats_body=np.array([k["simats_body"] for k in keywords]),
+                   uscrews_body=np.array([k["uscrews_body"] for k in keywords]),
+                   twist_0=keywords[0]["twist_0"],
+                   dtwist_0=keywords[0]["dtwist_0"],
+                   )
+
+
+def _get_coadjoint_bar(wrench: NDArray) -> NDArray:
+    """Matrix [[0, f^], [f^, n^]] of a wrench (f, n) such that ad(x)^T wrench = bar x"""
+    bar = np.zeros((6, 6))
+    bar[:3, 3:] = bar[3:, :3] = so3_wedge(wrench[:3])
+    bar[3:, 3:] = so3_wedge(wrench[3:])
+    return bar
+
+
+def inverse_derivatives(traj: np.ndarray,
+                        hposes_body_parent,
+                        simats_body: np.ndarray,
+                        uscrews_body: np.ndarray,
+                        twist_0: np.ndarray,
+                        dtwist_0: np.ndarray,
+                        wrench_tip: np.ndarray = None,  # zeros if None
+                        pose_tip_ee: SE3 = None,  # identity if None
+                        ):
+    """RNEA of inverse() with the partial derivatives of its controls.
+
+    The derivatives of the twists, their time derivatives and the wrenches
+    w.r.t. the joint positions, velocities and accelerations are propagated
+    along the forward and backward passes, using d Ad(T_i) / d q_i =
+    -ad(A_i) Ad(T_i) and ad(V)^T F = bar(F) V. The one w.r.t. the
+    accelerations is the joint-space mass matrix.
+
+    Returns the controls (n, ) and their derivatives w.r.t. q, dq and ddq (n, n).
+    """
+
+    n = len(uscrews_body)
+    q, dq, ddq = traj
+
+    # Forward iterations ======================================================
+    hposes = np.array([h_p.as_matrix() for h_p in hposes_body_parent[1:]])
+    adjoints = se3_adjoint(se3_compose(screw_exp(-1 * uscrews_body, q), hposes))  # Eq. 8.50
+    ads_screw = se3_curlywedge(uscrews_body)
+
+    twists = np.zeros((n + 1, 6))
+    dtwists = np.zeros((n + 1, 6))
+    twists[0], dtwists[0] = twist_0, dtwist_0
+    # Derivatives of the twists w.r.t. (q, dq) and of their time derivatives
+    # w.r.t. (q, dq, ddq), stacked along the last axis
+    dtwists_dx = np.zeros((n + 1, 6, 2 * n))
+    ddtwists_dx = np.zeros((n + 1, 6, 3 * n))
+    for j in range(n):
+        i = j + 1  # body of the j-th joint
+        Ad, us, ad_us = adjoints[j], uscrews_body[j], ads_screw[j]
+        twist_parent, dtwist_parent = Ad @ twists[i - 1], Ad @ dtwists[i - 1]
+
+        twists[i] = twist_parent + us * dq[j]  # Eq. 8.51
+        ad_twist = se3_curlywedge(twists[i])
+        dtwists[i] = dtwist_parent + ad_twist @ us * dq[j] + us * ddq[j]  # Eq. 8.52
+
+        dtwists_dx[i] = Ad @ dtwists_dx[i - 1]
+        dtwists_dx[i, :, j] -= ad_us @ twist_parent
+        dtwists_dx[i, :, n + j] += us
+
+        # ad(V) A dq = -ad(A) V dq
+        ddtwists_dx[i] = Ad @ ddtwists_dx[i - 1]
+        ddtwists_dx[i, :, :2 * n] -= dq[j] * ad_us @ dtwists_dx[i]
+        ddtwists_dx[i, :, j] -= ad_us @ dtwist_parent
+        ddtwists_dx[i, :, n + j] += ad_twist @ us
+        ddtwists_dx[i, :, 2 * n + j] += us
+
+    # Backward iterations =====================================================
+    ctrl = np.zeros(n)
+    dctrl_dx = np.zeros((n, 3 * n))
+    wrench = np.zeros(6) if wrench_tip is None else np.asarray(wrench_tip, dtype=float)
+    dwrench_dx = np.zeros((6, 3 * n))  # of the tip, constant
+    Ad_next = np.eye(6) if pose_tip_ee is None else se3_adjoint(pose_tip_ee.as_matrix())
+    for j in range(n - 1, -1, -1):
+        i = j + 1
+        simat = simats_body[i]
+        ad_twist = se3_curlywedge(twists[i])
+        momentum = simat @ twists[i]
+
+        # Eq. 8.53
+        wrench_next = wrench
+        wrench = Ad_next.T @ wrench_next + simat @ dtwists[i] - ad_twist.T @ momentum
+        dwrench_dx = Ad_next.T @ dwrench_dx + simat @ ddtwists_dx[i]
+        dwrench_dx[:, :2 * n] -= (_get_coadjoint_bar(momentum) + ad_twist.T @ simat) \
+                               @ dtwists_dx[i]
+        if j + 1 < n:
+            dwrench_dx[:, j + 1] -= Ad_next.T @ ads_screw[j + 1].T @ wrench_next
+
+        ctrl[j] = uscrews_body[j] @ wrench  # Eq. 8.54
+        dctrl_dx[j] = uscrews_body[j] @ dwrench_dx
+        Ad_next = adjoints[j]
+
+    return ctrl, *np.split(dctrl_dx, 3, axis=1)
+
+
+def get_inverse_dynamics(
+        m: MjModel,
+        poses: Poses,
+        derivatives: bool = False,  # bind inverse_derivatives() instead
+        ):
+    """Bind the arguments of inverse() which do not evolve along time.
+
+    The spatial inertia matrices of the bodies later than the last link are
+    joined into that of the link so that the returned callable considers the
+    payload attached to the manipulator.
+    """
+
+    id_ll = get_element_id(m, "body", "link6")  # l(ast) l(ink)
+    id_x2ll = slice(0, id_ll + 1)
+    pose_x_ll = poses.x_b[id_ll]  # dynamic
+    pose_ll_llj = poses.l_lj[id_ll]  # static
+
+    # Get unit screws wr2 link joints =============================================
+    uscrews_lj = []
+    for t, ax in zip(m.jnt_type, m.jnt_axis):
+        us_lj = np.zeros(6)
+        if 2 == t:  # slider joint
+            us_lj[:3] += ax
+        elif 3 == t:  # hinge joint
+            us_lj[3:] += ax
+        else:
+            raise TypeError("Only slide or hinge joints, represented as 2 or 3 "
+                            "for an element of m.jnt_type, are supported.")
+
+        uscrews_lj.append(us_lj)
+    uscrews_lj = np.array(uscrews_lj)
+
+    # Transfer the reference frame where each link's spatial inertia matrix is de-
+    # fined from the body principal frame to the joint frame ======================
+    # 下のメソッドが出力するのはボディの慣性座標系で記述された空間慣性テンソル 
+    simats_bi_b = get_spatial_inertia_matrix(m.body_mass,
+                                             m.body_inertia,
+                                             )
+
+    simats_lj_l = []
+    for pose_lj_li, simat_li_l in zip(poses.lj_li, simats_bi_b[id_x2ll]):  # x~last
+        simats_lj_l.append(transfer_simat(pose_lj_li, simat_li_l))
+
+    simats_lj_l = np.array(simats_lj_l)
+
+    # Join the spatial inertia matrices of the bodies later than the last link to
+    # its spatial inertia matrix so that inverse() can consider the bodies'
+    # inertia =====================================================================
+
+    simat_sen_obj = np.zeros((6, 6))
+
+    for pose_x_bi, simat_bi_b in zip(poses.x_bi[id_ll+1:], simats_bi_b[id_ll+1:]):
+        # "b" here is ∈ {attachment, object}
+        pose_x_llj = pose_x_ll.dot(pose_ll_llj)
+        pose_bi_llj = pose_x_bi.inv().dot(pose_x_llj)
+        simat_llj_b = transfer_simat(pose_bi_llj.inv(), simat_bi_b)
+        simat_sen_obj += simat_llj_b
+        simats_lj_l[id_ll] += simat_llj_b
+
+    # Get link joints' home poses wr2 their parents' joint frame ==================
+    hposes_lj_kj = [SE3.identity()]  # for worldbody
+    for k in range(m.njnt):
+        hpose_kj_k = poses.l_lj[k].inv()
+        hpose_l_lj = poses.l_lj[k+1]
+        hpose_k_l = poses.a_b[k+1]
+        hpose_kj_lj = hpose_kj_k.dot(hpose_k_l.dot(hpose_l_lj))
+        hposes_lj_kj.append(hpose_kj_lj.inv())
+
+    # Set some arguments of inverse() which dose not evolve along time ============
+    gacc_x = -1 * np.array([*MjOption().gravity, 0, 0, 0])
+    return partial(inverse_derivatives if derivatives else inverse,
+                   hposes_body_parent=hposes_lj_kj,
+                   simats_body=simats_lj_l,
+                   uscrews_body=np.array(uscrews_lj),
+                   twist_0=np.zeros(6),
+                   dtwist_0=gacc_x,
+                   )
+
+
 def extract_linvel_frame_transferred(
         twist: NDArray,
         pose: SE3,
@@ -203,6 +500,22 @@ def extract_linacc_frame_transferred(
     return _linacc if homogeneous else _linacc[:3]
 
 
+def get_twists_sen(
+        pose_sen_llj: SE3,
+        twist_llj: NDArray,
+        dtwist_llj: NDArray,
+        ) -> tuple[NDArray, NDArray]:
+    """Transfer the (d)twist of the last link's joint frame to the FT sensor"""
+
+    twist_sen = pose_sen_llj.adjoint() @ twist_llj
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    pose_sen_llj_dadjoint = SE3.curlywedge(twist_sen) @ pose_sen_llj.adjoint()
+    dtwist_sen = pose_sen_llj_dadjoint @ twist_llj \
+               + pose_sen_llj.adjoint() @ dtwist_llj
+
+    return twist_sen, dtwist_sen
+
+
 def get_regressor_matrix(
     twist: NDArray,
     dtwist: NDArray,
@@ -239,6 +552,36 @@ def get_regressor_matrix(
     return regressor
 
 
+def _bullet(vec3: NDArray) -> NDArray:
+    """(..., 3) -> (..., 3, 6), I @ vec3 = bullet(vec3) @ (ixx, iyy, izz, ixy, iyz, izx)"""
+
+    x, y, z = vec3[..., 0], vec3[..., 1], vec3[..., 2]
+    zero = np.zeros_like(x)
+    return np.stack([np.stack([x, zero, zero, y, zero, z], axis=-1),
+                     np.stack([zero, y, zero, x, z, zero], axis=-1),
+                     np.stack([zero, zero, z, zero, y, x], axis=-1)], axis=-2)
+
+
+def get_regressor_matrices(
+    twists: NDArray,  # (..., 6)
+    dtwists: NDArray,  # (..., 6)
+) -> NDArray:
+    """get_regressor_matrix() of a batch of twists at once, (..., 6, 10)"""
+
+    v, w = twists[..., :3], twists[..., 3:]
+    dv, dw = dtwists[..., :3], dtwists[..., 3:]
+
+    wedge_w = so3_wedge(w)
+    x = dv + np.einsum("...ij,...j->...i", wedge_w, v)
+    regressors = np.zeros((*x.shape[:-1], 6, 10))
+    regressors[..., :3, 0] = x
+    regressors[..., :3, 1:4] = so3_wedge(dw) + wedge_w @ wedge_w
+    regressors[..., 3:, 1:4] = -so3_wedge(x)
+    regressors[..., 3:, 4:] = _bullet(dw) + wedge_w @ _bullet(w)
+
+    return regressors
+
+
 def coordinate_transfer_imat(pose_target_current, imat_current, mass):
     rot = pose_target_current.rot.as_matrix()
     trans = np.expand_dims(pose_target_current.trans, axis=1)
@@ -0,0 +1,149 @@
+from typing import Optional
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+
+class GramAccumulator:
+    """Sufficient statistics of the least squares identification of inertial params.
+
+    The regressor R_i (6 x 10) and the wrench f_i (6,) of each frame are reduced
+    to R_i^T R_i (10 x 10), R_i^T f_i (10,) and f_i^T f_i once. The estimate for
+    any subset or resampling of the frames is then given by summing the small
+    matrices and solving a 10 x 10 system, which makes splits, cross-validation
+    and bootstrapping cheap. Every statistic is kept for the K noise realizations
+    of the wrench at once. With groups, the samples of a denser stream are
+    summed into the frame each belongs to, so the frames are resampled as blocks.
+    """
+
+    def __init__(self,
+                 regressors: ArrayLike,
+                 wrenches: ArrayLike,
+                 groups: Optional[ArrayLike] = None,  # (n_samples,), frame of each sample
+                 n_frames: Optional[int] = None,  # with groups, those without samples included
+                 ) -> None:
+        regressors = np.asarray(regressors)  # (n_samples, 6, 10)
+        wrenches = np.asarray(wrenches)  # (K, n_samples, 6) or (n_samples, 6)
+        if 2 == wrenches.ndim:
+            wrenches = wrenches[np.newaxis]
+
+        n_samples, self.n_rows, self.n_params = regressors.shape
+        grams = np.einsum("nri,nrj->nij", regressors, regressors)  # R_i^T R_i
+        moments = np.einsum("nri,knr->nki", regressors, wrenches)  # R_i^T f_i
+        energies = np.einsum("knr,knr->nk", wrenches, wrenches)  # f_i^T f_i
+        if groups is None:
+            self.n_frames = n_samples
+            self.grams, self.moments, self.energies = grams, moments, energies
+            self.row_counts = np.full(n_samples, float(self.n_rows))
+            return
+
+        groups = np.asarray(groups, dtype=int)
+        self.n_frames = groups.max() + 1 if n_frames is None else n_frames
+        self.grams = np.zeros((self.n_frames, *grams.shape[1:]))
+        self.moments = np.zeros((self.n_frames, *moments.shape[1:]))
+        self.energies = np.zeros((self.n_frames, *energies.shape[1:]))
+        np.add.at(self.grams, groups, grams)
+        np.add.at(self.moments, groups, moments)
+        np.add.at(self.energies, groups, energies)
+        self.row_counts = self.n_rows * np.bincount(groups, minlength=self.n_frames).astype(float)
+
+    def _nans(self, *shape: int) -> NDArray:
+        """Statistics of no frames, e.g., of a split of a short run"""
+
+        return np.full((*shape, self.moments.shape[1]), np.nan)  # (..., K)
+
+    def _weights(self, indices: Optional[ArrayLike] = None) -> NDArray:
+        if indices is None:
+            return np.ones(self.n_frames)
+        return np.bincount(np.asarray(indices, dtype=int), minlength=self.n_frames).astype(float)
+
+    def _sum(self, weights: NDArray) -> tuple[NDArray, NDArray, NDArray]:
+        """Sum the statistics over frames with weights (..., n_frames)"""
+
+        gram = np.einsum("...n,nij->...ij", weights, self.grams)  # (..., 10, 10)
+        moment = np.einsum("...n,nki->...ki", weights, self.moments)  # (..., K, 10)
+        energy = np.einsum("...n,nk->...k", weights, self.energies)  # (..., K)
+
+        return gram, moment, energy
+
+    @staticmethod
+    def _solve(gram: NDArray, moment: NDArray) -> NDArray:
+        rhs = np.swapaxes(moment, -1, -2)  # (..., 10, K)
+        try:
+            return np.linalg.solve(gram, rhs)
+        except np.linalg.LinAlgError:  # too few or degenerate frames
+            return np.linalg.pinv(gram) @ rhs
+
+    @staticmethod
+    def _rss(estimate: NDArray, gram: NDArray, moment: NDArray, energy: NDArray) -> NDArray:
+        """Residual sum of squares f^T f - 2 θ^T R^T f + θ^T R^T R θ per realization"""
+
+        cross = np.einsum("...ik,...ki->...k", estimate, moment)
+        quad = np.einsum("...ik,...ij,...jk->...k", estimate, gram, estimate)
+        return energy - 2 * cross + quad
+
+    def estimate(self, indices: Optional[ArrayLike] = None) -> NDArray:
+        """Least squares estimate (10, K) from the frames of the indices, NaN if none"""
+
+        if indices is not None and 0 == len(indices):
+            return self._nans(self.n_params)
+
+        gram, moment, _ = self._sum(self._weights(indices))
+        return self._solve(gram, moment)
+
+    def covariance(self, indices: Optional[ArrayLike] = None) -> NDArray:
+        """Covariance (K, 10, 10) of the estimate, σ^2 (R^T R)^-1 with the residual σ^2"""
+
+        weights = self._weights(indices)
+        gram, moment, energy = self._sum(weights)
+        estimate = self._solve(gram, moment)
+        dof = weights @ self.row_counts - self.n_params
+        variance = self._rss(estimate, gram, moment, energy) / dof if 0 < dof else self._nans()
+
+        return np.reshape(variance, (-1, 1, 1)) * np.linalg.pinv(gram)
+
+    def kfold(self,
+              indices: Optional[ArrayLike] = None,
+              k: int = 5,
+              seed: int = 0,
+              ) -> dict[str, NDArray]:
+        """K-fold cross-validation of the frames of the indices.
+
+        Each fold is held out by subtracting its statistics from the total ones.
+        Returns the estimates of the folds (k, 10, K) and the RMSE of the wrench
+        predicted for the held-out frames (K,), NaN if there are no frames.
+        """
+
+        indices = np.arange(self.n_frames) if indices is None else np.asarray(indices, dtype=int)
+        if 0 == len(indices):
+            return dict(estimates=self._nans(k, self.n_params), rmse=self._nans())
+        rng = np.random.default_rng(seed)
+        folds = np.array_split(rng.permutation(indices), min(k, len(indices)))
+        held_out = np.stack([self._weights(fold) for fold in folds])  # (k, n_frames)
+
+        gram, moment, energy = self._sum(self._weights(indices))
+        fold_gram, fold_moment, fold_energy = self._sum(held_out)
+        estimates = self._solve(gram - fold_gram, moment - fold_moment)
+        rss = self._rss(estimates, fold_gram, fold_moment, fold_energy).sum(axis=0)
+
+        return dict(estimates=estimates,
+                    rmse=np.sqrt(rss / self.row_counts[indices].sum()),
+                    )
+
+    def bootstrap(self,
+                  indices: Optional[ArrayLike] = None,
+                  n_resamples: int = 1000,
+                  seed: int = 0,
+                  ) -> NDArray:
+        """Estimates (n_resamples, 10, K) from frames resampled with replacement, NaN if none"""
+
+        indices = np.arange(self.n_frames) if indices is None else np.asarray(indices, dtype=int)
+        if 0 == len(indices):
+            return self._nans(n_resamples, self.n_params)
+        rng = np.random.default_rng(seed)
+        counts = rng.multinomial(len(indices), np.full(len(indices), 1 / len(indices)), size=n_resamples)
+        weights = np.zeros((n_resamples, self.n_frames))
+        np.add.at(weights, (slice(None), indices), counts)  # tolerate repeated indices
+
+        gram, moment, _ = self._sum(weights)
+        return self._solve(gram, moment)
@@ -0,0 +1,150 @@
+import hashlib
+from collections.abc import Sequence
+from typing import Union
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+# Factors of the integrals of 1, x, y, z, x^2, y^2, z^2, xy, yz and zx
+_INTEGRAL_FACTORS = np.array([1/6, 1/24, 1/24, 1/24, 1/60, 1/60, 1/60, 1/120, 1/120, 1/120])
+
+# Mass properties of the meshes of unit density keyed by the hash of the file
+# and the scale, e.g., of the visual and collision geoms sharing a mesh
+_unit_inertias: dict[str, dict[str, Union[float, NDArray]]] = {}
+
+
+def _fan(polygons: list[list[str]], n_vertices: int) -> NDArray:
+    """Triangles (F, 3) of 0-based indices fanned out of 1-based polygons"""
+
+    faces = []
+    for n_corners in sorted(set(map(len, polygons))):
+        corners = np.array([p for p in polygons if len(p) == n_corners], dtype=np.int64)
+        corners = np.where(corners < 0, corners + n_vertices, corners - 1)
+        for k in range(1, n_corners - 1):
+            faces.append(corners[:, [0, k, k + 1]])
+
+    return np.concatenate(faces) if faces else np.zeros((0, 3), dtype=np.int64)
+
+
+def load_obj(contents: Union[str, bytes],
+             texcoords: bool = False,  # also get the texture coordinates
+             ) -> tuple[NDArray, ...]:
+    """Vertices (V, 3) and triangles (F, 3) of a Wavefront OBJ, polygons fanned.
+
+    With texcoords, the texture coordinates (T, 2) and the triangles of their
+    indices (F, 3) follow, the indices being -1 where a corner has none.
+    """
+
+    if isinstance(contents, bytes):
+        contents = contents.decode()
+
+    vertices, uvs, polygons, uv_polygons = [], [], [], []
+    for line in contents.splitlines():
+        if line.startswith("v "):
+            vertices.append(line.split()[1:4])
+        elif line.startswith("vt ") and texcoords:
+            uvs.append(line.split()[1:3])
+        elif line.startswith("f "):
+            corners = [token.split("/") for token in line.split()[1:]]
+            polygons.append([c[0] for c in corners])
+            if texcoords:
+                uv_polygons.append([c[1] if 1 < len(c) and c[1] else "0" for c in corners])
+    vertices = np.array(vertices, dtype=float).reshape(-1, 3)
+    faces = _fan(polygons, len(vertices))
+    if not texcoords:
+        return vertices, faces
+
+    # Index 0, i.e., none, becomes -1 as a 1-based one
+    uvs = np.array(uvs, dtype=float).reshape(-1, 2)
+    return vertices, faces, uvs, _fan(uv_polygons, len(uvs))
+
+
+def get_mesh_inertia(vertices: NDArray,  # (V, 3)
+                     faces: NDArray,  # (F, 3), counter-clockwise seen from outside
+                     density: float = 1.0,
+                     ) -> dict[str, Union[float, NDArray]]:
+    """Mass, CoM and inertia tensor about the CoM of a closed triangle mesh.
+
+    The volume integrals are turned into surface integrals by the divergence
+    theorem and evaluated over all the triangles at once (D. Eberly,
+    "Polyhedral Mass Properties (Revisited)"). The vertices are centered
+    first to avoid the cancellation of the second moments far from the origin.
+    """
+
+    origin = vertices.mean(axis=0)
+    triangles = (vertices - origin)[faces]  # (F, 3 corners, 3 coords)
+    v0, v1, v2 = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    normals = np.cross(v1 - v0, v2 - v0)  # (F, 3)
+
+    temp0 = v0 + v1
+    f1 = temp0 + v2
+    temp1 = v0 * v0
+    temp2 = temp1 + v1 * temp0
+    f2 = temp2 + v2 * f1
+    f3 = v0 * temp1 + v1 * temp2 + v2 * f2
+    g0, g1, g2 = f2 + v0 * (f1 + v0), f2 + v1 * (f1 + v1), f2 + v2 * (f1 + v2)
+
+    # y g_x, z g_y and x g_z, i.e., the products xy, yz and zx
+    products = v0[:, [1, 2, 0]] * g0 + v1[:, [1, 2, 0]] * g1 + v2[:, [1, 2, 0]] * g2
+    integrals = np.concatenate([[normals[:, 0] @ f1[:, 0]],
+                                np.einsum("fi,fi->i", normals, f2),
+                                np.einsum("fi,fi->i", normals, f3),
+                                np.einsum("fi,fi->i", normals, products),
+                                ]) * _INTEGRAL_FACTORS
+
+    volume = integrals[0]
+    com = integrals[1:4] / volume
+    second = integrals[4:7] - volume * com**2  # of x^2, y^2 and z^2 about the CoM
+    xy, yz, zx = integrals[7:10] - volume * com * com[[1, 2, 0]]
+    inertia = np.array([[second[1] + second[2], -xy, -zx],
+                        [-xy, second[2] + second[0], -yz],
+                        [-zx, -yz, second[0] + second[1]]])
+
+    return dict(volume=volume,
+                mass=density * volume,
+                com=com + origin,
+                inertia=density * inertia,
+                )
+
+
+def get_obj_inertia(contents: Union[str, bytes],
+                    density: float = 1.0,
+                    scale: Sequence[float] = (1.0, 1.0, 1.0),
+                    ) -> dict[str, Union[float, NDArray]]:
+    """get_mesh_inertia() of an OBJ file, cached by the hash of its contents"""
+
+    if isinstance(contents, str):
+        contents = contents.encode()
+    scale = np.asarray(scale, dtype=float)
+    key = hashlib.sha256(contents + scale.tobytes()).hexdigest()
+
+    if key not in _unit_inertias:
+        vertices, faces = load_obj(contents)
+        _unit_inertias[key] = get_mesh_inertia(scale * vertices, faces)
+
+    unit = _unit_inertias[key]
+    return dict(volume=unit["volume"],
+                mass=density * unit["mass"],
+                com=unit["com"].copy(),
+                inertia=density * unit["inertia"],
+                )
+
+
+def join_inertias(parts: Sequence[dict[str, Union[float, NDArray]]],
+                  ) -> dict[str, Union[float, NDArray]]:
+    """Mass, CoM and inertia tensor about the CoM of rigidly joined parts"""
+
+    masses = np.array([p["mass"] for p in parts])
+    coms = np.array([p["com"] for p in parts])
+    mass = masses.sum()
+    com = masses @ coms / mass
+
+    # Parallel axis theorem
+    offsets = coms - com
+    inertia = sum(p["inertia"] for p in parts) \
+            + np.einsum("n,nij->ij", masses,
+                        np.einsum("ni,ni->n", offsets, offsets)[:, np.newaxis, np.newaxis]
+                        * np.eye(3) - np.einsum("ni,nj->nij", offsets, offsets))
+
+    return dict(volume=sum(p["volume"] for p in parts), mass=mass, com=com, inertia=inertia)
@@ -0,0 +1,70 @@
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+import tyro
+
+from catalog import TargetCatalog, TargetCatalogConfig
+from .job_queue import JobQueue, JobQueueConfig, make_jobs
+
+
+@dataclass
+class EnqueueConfig:
+    queue: JobQueueConfig = field(default_factory=JobQueueConfig)
+    catalog: TargetCatalogConfig = field(default_factory=TargetCatalogConfig)
+    targets: Optional[list[str]] = None  # every target loaded without error if None
+    sweep: list[str] = field(default_factory=list)  # grid of "key=value,value" of main.py
+    overrides: list[str] = field(default_factory=list)  # "key=value" of main.py shared by the jobs
+
+
+@dataclass
+class WorkConfig:
+    queue: JobQueueConfig = field(default_factory=JobQueueConfig)
+    n_workers: int = 1  # concurrent jobs of this process
+    max_jobs: Optional[int] = None  # per worker, until the queue is empty if None
+
+
+@dataclass
+class StatusConfig:
+    queue: JobQueueConfig = field(default_factory=JobQueueConfig)
+    retry_failed: bool = False  # queue the failed jobs again
+
+
+# Usage (from the repository root, on any number of processes and nodes):
+#     python -m jobs enqueue --targets hammer wooden-tray-2 --sweep planner.duration=5,10
+#     python -m jobs work --n-workers 4
+#     python -m jobs status --retry-failed
+if __name__ == "__main__":
+    cfg = tyro.extras.subcommand_cli_from_dict({"enqueue": EnqueueConfig,
+                                                "work": WorkConfig,
+                                                "status": StatusConfig})
+    queue = JobQueue(cfg.queue)
+
+    if isinstance(cfg, EnqueueConfig):
+        targets = cfg.targets
+        if targets is None:
+            catalog = TargetCatalog(cfg.catalog)
+            catalog.refresh()
+            targets = [name for name, entry in catalog.entries.items() if entry["error"] is None]
+        jobs = make_jobs(targets, cfg.sweep, cfg.overrides)
+        added = queue.enqueue(jobs)
+        print(f"Queued {len(added)} of {len(jobs)} jobs into '{queue.path}' "
+              f"({len(jobs) - len(added)} queued before)")
+    elif isinstance(cfg, WorkConfig):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        with ThreadPoolExecutor(cfg.n_workers) as executor:  # the jobs run in subprocesses
+            results = list(executor.map(lambda i: queue.work(f"{prefix}:{i}", cfg.max_jobs),
+                                        range(cfg.n_workers)))
+        for key in ["done", "failed", "lost"]:
+            print(f"{key}: {sum(len(r[key]) for r in results)}")
+    else:
+        if cfg.retry_failed:
+            print(f"Queued {queue.retry_failed()} failed jobs again")
+        table = queue.table()
+        with pd.option_context("display.max_rows", None, "display.width", None,
+                               "display.max_colwidth", 80):
+            print(table.groupby("status").size().to_string(), end="\n\n")
+            print(table)
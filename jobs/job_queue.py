@@ -0,0 +1,305 @@
+import hashlib
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+from mujoco._structs import MjData, MjModel
+
+
+@dataclass
+class JobQueueConfig:
+    target_class: str = "JobQueue"
+    path: str = "./datasets/jobs.sqlite"
+    log_dir: str = "./datasets/.jobs"  # stdout and stderr of each attempt of a job
+    command: list[str] = field(default_factory=lambda: ["main.py"])  # run by the python of the worker
+    lease_seconds: float = 300.0  # a job is taken over by another worker if not renewed in time
+    heartbeat_seconds: float = 30.0  # renewal period of the lease while a job runs
+    max_attempts: int = 3
+    retry_delay: float = 60.0  # [s], doubled at each failed attempt
+    poll_seconds: float = 5.0  # wait of an idle worker for the jobs retried later
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,      -- hash of the args
+    args TEXT NOT NULL,           -- json list of the cli overrides of the command
+    status TEXT NOT NULL,         -- pending, running, done or failed
+    attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,   -- unix time from which it can be claimed
+    worker TEXT,                  -- host:pid:index of the worker of the last attempt
+    lease_token TEXT,             -- of the last claim, fencing the workers whose lease expired
+    lease_expires_at REAL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,             -- completion marker of a job done
+    returncode INTEGER,
+    log_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+"""
+
+
+@dataclass
+class Job:
+    job_id: str
+    args: list[str]
+    attempts: int
+    lease_token: str
+    log_path: Path
+
+
+def get_job_id(args: list[str]) -> str:
+    return hashlib.sha256(json.dumps(args).encode()).hexdigest()
+
+
+def make_jobs(targets: list[str],
+              sweep: list[str] = (),  # e.g., ["planner.duration=5,10", "noise.seed=0,1"]
+              overrides: list[str] = (),  # shared by every job
+              ) -> list[list[str]]:
+    """Overrides of main.py of each target and point of the grid of the sweep.
+
+    The points of a sweep get their own dataset dirs `{target}_{hash}` unless
+    logger.dataset_dir is overridden, and a single point keeps `{target}`.
+    """
+
+    axes = []
+    for item in sweep:
+        key, values = item.split("=", 1)
+        axes.append([f"{key}={value}" for value in values.split(",")])
+
+    jobs = []
+    for target in targets:
+        for point in itertools.product(*axes):
+            args = [f"target_name={target}", *overrides, *point]
+            if point and not any(a.startswith("logger.dataset_dir=") for a in args):
+                args.append(f"logger.dataset_dir={target}_{get_job_id(args)[:8]}")
+            jobs.append(args)
+
+    return jobs
+
+
+class JobQueue:
+    """Durable queue of the runs of a campaign shared by workers through SQLite.
+
+    A worker claims a job by taking a lease on it, renews the lease while the
+    job runs and marks it done or failed when it exits. A job whose lease
+    expired, e.g., of a crashed worker or a rebooted node, is claimed again by
+    any worker, and the token of the lease keeps the late worker from marking
+    it. Workers on several nodes share the queue through a filesystem whose
+    locks SQLite supports (e.g., NFSv4) and clocks synchronized well within
+    lease_seconds.
+    """
+
+    def __init__(self,
+                 cfg: JobQueueConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.cfg = cfg
+        self.path = Path(cfg.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.log_dir = Path(cfg.log_dir)
+
+        with closing(self._connect()) as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are opened explicitly to take the write lock before reading
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _transaction(self, statements: list[tuple[str, tuple]]) -> list[int]:
+        """Run statements under the write lock and get their row counts"""
+
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            counts = [connection.execute(query, params).rowcount for query, params in statements]
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+        return counts
+
+    def enqueue(self, jobs: list[list[str]]) -> list[str]:
+        """Add jobs given their args and get the ids of those not queued before"""
+
+        now = time.time()
+        created_at = datetime.now().isoformat(timespec="seconds")
+        ids = [get_job_id(args) for args in jobs]
+        counts = self._transaction([
+            ("INSERT OR IGNORE INTO jobs (job_id, args, status, attempts, available_at, created_at) "
+             "VALUES (?, ?, 'pending', 0, ?, ?)", (job_id, json.dumps(args), now, created_at))
+            for job_id, args in zip(ids, jobs)])
+
+        return [job_id for job_id, count in zip(ids, counts) if count]
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Lease the oldest job available, pending or of an expired lease, if any"""
+
+        now = time.time()
+        token = uuid.uuid4().hex
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # Expired leases of the jobs out of attempts are not taken over
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', lease_token = NULL "
+                "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+                (now, self.cfg.max_attempts))
+            row = connection.execute(
+                "SELECT job_id, args, attempts FROM jobs "
+                "WHERE (status = 'pending' AND available_at <= ?) "
+                "OR (status = 'running' AND lease_expires_at < ?) "
+                "ORDER BY created_at, job_id LIMIT 1", (now, now)).fetchone()
+            job = None
+            if row is not None:
+                job = Job(job_id=row["job_id"],
+                          args=json.loads(row["args"]),
+                          attempts=row["attempts"] + 1,
+                          lease_token=token,
+                          log_path=self.log_dir / f"{row['job_id'][:16]}.{row['attempts'] + 1}.log")
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', attempts = ?, worker = ?, lease_token = ?, "
+                    "lease_expires_at = ?, started_at = ?, log_path = ? WHERE job_id = ?",
+                    (job.attempts, worker, token, now + self.cfg.lease_seconds,
+                     datetime.now().isoformat(timespec="seconds"), str(job.log_path), job.job_id))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+        return job
+
+    def heartbeat(self, job: Job) -> bool:
+        """Renew the lease of a job, False if it was taken over"""
+
+        count, = self._transaction([
+            ("UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND lease_token = ?",
+             (time.time() + self.cfg.lease_seconds, job.job_id, job.lease_token))])
+        return 1 == count
+
+    def complete(self, job: Job, returncode: int, error: Optional[str] = None) -> bool:
+        """Mark a job done, or pending again with a backoff or failed if out of attempts"""
+
+        finished_at = datetime.now().isoformat(timespec="seconds")
+        if 0 == returncode:
+            status, available_at = "done", time.time()
+        elif job.attempts < self.cfg.max_attempts:
+            status = "pending"
+            available_at = time.time() + self.cfg.retry_delay * 2 ** (job.attempts - 1)
+        else:
+            status, available_at = "failed", time.time()
+
+        count, = self._transaction([
+            ("UPDATE jobs SET status = ?, available_at = ?, finished_at = ?, returncode = ?, "
+             "error = ?, lease_token = NULL WHERE job_id = ? AND lease_token = ?",
+             (status, available_at, finished_at, returncode, error, job.job_id, job.lease_token))])
+        return 1 == count
+
+    def release(self, job: Job) -> None:
+        """Give a job back without counting its attempt, e.g., on an interrupted worker"""
+
+        self._transaction([
+            ("UPDATE jobs SET status = 'pending', attempts = attempts - 1, lease_token = NULL "
+             "WHERE job_id = ? AND lease_token = ?", (job.job_id, job.lease_token))])
+
+    def retry_failed(self) -> int:
+        """Queue the failed jobs again with their attempts reset"""
+
+        count, = self._transaction([
+            ("UPDATE jobs SET status = 'pending', attempts = 0, available_at = ? "
+             "WHERE status = 'failed'", (time.time(),))])
+        return count
+
+    def n_unfinished(self) -> int:
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+
+    def table(self) -> pd.DataFrame:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT job_id, status, attempts, worker, started_at, finished_at, returncode, "
+                "args, log_path, error FROM jobs ORDER BY created_at, job_id").fetchall()
+
+        columns = ["job_id", "status", "attempts", "worker", "started_at", "finished_at",
+                   "returncode", "args", "log_path", "error"]
+        table = pd.DataFrame.from_records([dict(r) for r in rows], columns=columns)
+        table["job_id"] = table["job_id"].str[:8]
+        table["args"] = table["args"].map(lambda a: " ".join(json.loads(a)))
+        return table
+
+    def run(self, job: Job) -> Optional[int]:
+        """Run the command of a job renewing its lease, None if the lease was lost"""
+
+        job.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(job.log_path, "wb") as log:
+            process = subprocess.Popen([sys.executable, *self.cfg.command, *job.args],
+                                       stdout=log, stderr=subprocess.STDOUT)
+            try:
+                while True:
+                    try:
+                        return process.wait(timeout=self.cfg.heartbeat_seconds)
+                    except subprocess.TimeoutExpired:
+                        if not self.heartbeat(job):  # another worker runs it now
+                            process.kill()
+                            process.wait()
+                            return None
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+
+    def work(self, worker: Optional[str] = None, max_jobs: Optional[int] = None) -> dict[str, Any]:
+        """Claim and run jobs until none is left unfinished or max_jobs were run.
+
+        Waits for the jobs retried later and those of the other workers, which
+        are taken over if their leases expire.
+        """
+
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}:0"
+        done, failed, lost = [], [], []
+        while max_jobs is None or len(done) + len(failed) + len(lost) < max_jobs:
+            job = self.claim(worker)
+            if job is None:
+                if 0 == self.n_unfinished():
+                    break
+                time.sleep(self.cfg.poll_seconds)
+                continue
+
+            try:
+                returncode = self.run(job)
+            except BaseException:
+                self.release(job)
+                raise
+
+            if returncode is None or not self.complete(job, returncode,
+                                                       None if 0 == returncode else
+                                                       f"exited with {returncode}"):
+                lost.append(job.job_id)
+            elif 0 == returncode:
+                done.append(job.job_id)
+            else:
+                failed.append(job.job_id)
+
+        return dict(done=done, failed=failed, lost=lost)
@@ -0,0 +1 @@
+from .keyframe_selector import *
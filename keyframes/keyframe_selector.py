@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+
+import numpy as np
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+
+from utilities import get_element_id
+
+
+@dataclass
+class KeyframeSelectorConfig:
+    target_class: str = "KeyframeSelector"
+    budget: int = 0  # number of the logged frames rendered. All of them if non-positive
+    novelty_weight: float = 1.0  # of the distance to the viewpoints already selected
+    information_weight: float = 1.0  # of the information gain of the regressor
+    regularization: float = 1e-6  # of the information matrix, relative to its mean eigenvalue
+
+
+class KeyframeSelector:
+    """Spend a render budget on the most useful frames logged by simulate().
+
+    Frames are picked greedily. Each candidate is scored by the novelty of its
+    viewpoint, i.e., the distance of the object-to-camera pose to the nearest
+    selected one, and by the information its regressor adds to those of the
+    selected frames, i.e., the decrease of the total variance of the params
+    (A-optimality). The regressors are whitened by the peak norms of the force
+    and the torque, the scales of the wrench noise, and the params are scaled
+    as in the score. Both terms are normalized by their maximum over the
+    candidates so that the weights are unitless. The physics and the wrench
+    are still logged at the full rate.
+    """
+
+    def __init__(self,
+                 cfg: KeyframeSelectorConfig,
+                 m: MjModel,
+                 d: MjData = None,
+                 ) -> None:
+        self.budget = cfg.budget
+        self.novelty_weight = cfg.novelty_weight
+        self.information_weight = cfg.information_weight
+        self.regularization = cfg.regularization
+        # Length scale making a translation comparable to a rotation in radians
+        self.aabb_scale = m.numeric_data[get_element_id(m, "numeric", "target/aabb_scale")]
+
+    def enabled(self, n_frames: int) -> bool:
+        return 0 < self.budget < n_frames
+
+    def get_distances(self, poses_obj_cam: NDArray, pose_obj_cam: NDArray) -> NDArray:
+        """Distances of viewpoints to one, the rotation angle plus the scaled translation"""
+
+        translations = np.linalg.norm(poses_obj_cam[:, :3, 3] - pose_obj_cam[:3, 3], axis=-1)
+        traces = np.einsum("nij,ij->n", poses_obj_cam[:, :3, :3], pose_obj_cam[:3, :3])
+        angles = np.arccos(np.clip(0.5 * (traces - 1), -1, 1))
+        return angles + translations / self.aabb_scale
+
+    def select(self,
+               poses_obj_cam: NDArray,  # (N, 4, 4), of the tracking camera
+               regressors: NDArray,  # (N, 6, 10)
+               wrenches: NDArray,  # (N, 6), clean
+               ) -> NDArray:
+        """Get the sorted indices of the frames to render"""
+
+        n_frames = len(poses_obj_cam)
+        if not self.enabled(n_frames):
+            return np.arange(n_frames)
+
+        peak_norms = np.linalg.norm(wrenches.reshape(n_frames, 2, 3), axis=-1).max(axis=0)
+        regressors = regressors / np.repeat(np.maximum(peak_norms, np.finfo(float).tiny),
+                                            3)[:, np.newaxis]
+        # Express the params in the units of the score, i.e., mass, first and
+        # second moments over aabb_scale^0, 1 and 2
+        regressors = regressors * np.power(self.aabb_scale, [0, 1, 1, 1, 2, 2, 2, 2, 2, 2])
+
+        n_rows = regressors.shape[1]
+        # The selection starts from the prior only, a regularizer scaled to the
+        # Gram matrix of all the frames
+        gram_all = np.einsum("nki,nkj->ij", regressors, regressors)
+        information = self.regularization * np.trace(gram_all) / len(gram_all) * np.eye(len(gram_all))
+        novelties = np.full(n_frames, np.inf)
+        selected = np.zeros(n_frames, dtype=bool)
+
+        for _ in range(self.budget):
+            # Decrease of trace C by adding A^T A to C^-1, i.e., of the variance:
+            # tr(C A^T (I + A C A^T)^-1 A C) by the Woodbury identity
+            covariance = np.linalg.inv(information)
+            projected = regressors @ covariance  # (N, 6, 10)
+            innovations = np.eye(n_rows) + projected @ regressors.transpose(0, 2, 1)
+            gains = np.einsum("nki,nki->n", np.linalg.solve(innovations, projected), projected)
+            gains = np.where(selected, 0, gains)
+            scores = self.information_weight * gains / max(gains.max(), np.finfo(float).tiny)
+
+            if np.isfinite(novelties).any():
+                candidates = np.where(selected, 0, novelties)
+                scores += self.novelty_weight * candidates / max(candidates.max(),
+                                                                 np.finfo(float).tiny)
+
+            scores[selected] = -np.inf
+            i = np.argmax(scores)
+            selected[i] = True
+            information += regressors[i].T @ regressors[i]
+            novelties = np.minimum(novelties, self.get_distances(poses_obj_cam, poses_obj_cam[i]))
+
+        return np.flatnonzero(selected)
@@ -1 +1,4 @@
 from .loggers import *
+from .masks import *
+from .recorder import *
+from .telemetry import *
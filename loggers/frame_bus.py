@@ -0,0 +1,242 @@
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from time import perf_counter, sleep
+from typing import Any, Optional, Union
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+
+NAME_SIZE = 64  # [bytes], max length of a frame's file name
+# Layout of the control block, int64 words followed by the cursor and the number
+# of the processed frames of each consumer
+PUBLISHED, CLOSED, N_WORDS = 0, 1, 2
+
+
+class VideoConsumer:
+    def __init__(self,
+                 path: str,
+                 codec: str,
+                 fps: int,
+                 size: tuple[int, int],
+                 channel: int = 0,  # encode the frames of this camera only
+                 ) -> None:
+        self.videowriter = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        self.channel = channel
+
+    def __call__(self, bgra: NDArray, name: str, channel: int) -> None:
+        if self.channel == channel:
+            self.videowriter.write(np.ascontiguousarray(bgra[..., :3]))
+
+    def close(self) -> None:
+        self.videowriter.release()
+
+
+class PngConsumer:
+    def __init__(self, image_dir: str) -> None:
+        self.image_dir = Path(image_dir)
+
+    def __call__(self, bgra: NDArray, name: str, channel: int) -> None:
+        cv2.imwrite(str(self.image_dir / name), bgra)  # image (bgr + alpha)
+
+    def close(self) -> None:
+        pass
+
+
+class PreviewConsumer:
+    def __init__(self, window: str = "preview", channel: int = 0) -> None:
+        self.window = window
+        self.channel = channel
+
+    def __call__(self, bgra: NDArray, name: str, channel: int) -> None:
+        if self.channel != channel:
+            return
+        cv2.imshow(self.window, bgra[..., :3])
+        cv2.waitKey(1)
+
+    def close(self) -> None:
+        cv2.destroyWindow(self.window)
+
+
+CONSUMERS = {"VideoConsumer": VideoConsumer, "PngConsumer": PngConsumer, "PreviewConsumer": PreviewConsumer}
+
+
+def _consume(consumer_class: type,
+             kwargs: dict[str, Any],
+             shm_names: tuple[str, str, str, str],
+             shape: tuple[int, ...],
+             cursor_id: int,
+             lossless: bool,
+             poll: float,
+             ) -> None:
+    """Main function of a consumer process reading the frames in publication order.
+
+    A lossless consumer reads every frame in place and its cursor holds the
+    producer back. A lossy one never blocks the producer. It jumps to the latest
+    frame, copies it out of the slot and skips it if the producer has reused the
+    slot meanwhile.
+    """
+
+    n_slots = shape[0]
+    segments = [SharedMemory(name=name) for name in shm_names]  # owned by the producer
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=segments[0].buf)
+    names = np.ndarray((n_slots, NAME_SIZE), dtype=np.uint8, buffer=segments[1].buf)
+    channels = np.ndarray((n_slots, ), dtype=np.int64, buffer=segments[3].buf)
+    control = np.ndarray((N_WORDS + 2 * (cursor_id + 1), ), dtype=np.int64,
+                         buffer=segments[2].buf)
+    cursor_word, processed_word = N_WORDS + 2 * cursor_id, N_WORDS + 2 * cursor_id + 1
+    consumer = consumer_class(**kwargs)
+    local = None if lossless else np.empty(shape[1:], dtype=np.uint8)
+
+    cursor = 0
+    while True:
+        published = control[PUBLISHED]
+        if cursor < published:
+            slot = cursor % n_slots
+            if lossless:
+                frame, name, channel = frames[slot], names[slot].tobytes(), channels[slot]
+            else:
+                cursor = published - 1
+                slot = cursor % n_slots
+                local[:], name, channel = frames[slot], names[slot].tobytes(), channels[slot]
+                frame = local if control[PUBLISHED] - cursor < n_slots else None
+
+            if frame is not None:
+                consumer(frame, name.rstrip(b"\0").decode(), channel)
+                control[processed_word] += 1
+            cursor += 1
+            control[cursor_word] = cursor
+        elif control[CLOSED]:
+            break
+        else:
+            sleep(poll)
+
+    consumer.close()
+    del frames, names, channels, control
+    for segment in segments:
+        segment.close()
+
+
+class FrameBus:
+    """Ring buffer of rendered frames in shared memory read by consumer processes.
+
+    The producer fills a slot in place and publishes it once. Every consumer
+    reads the same slot from the shared memory, so a frame is neither pickled
+    nor copied per consumer. A slot is reused only after all the lossless
+    consumers have read it. When none is free, the producer waits for them
+    ("block" policy, backpressure) or drops the new frame ("drop" policy).
+    A consumer is given by its name in CONSUMERS or by a class importable by
+    the spawned process.
+    """
+
+    def __init__(self,
+                 shape: tuple[int, int, int],  # (height, width, channels) of a frame
+                 consumers: list[tuple[Union[str, type], dict[str, Any], bool]],  # (class, kwargs, lossless)
+                 n_slots: int = 8,
+                 policy: str = "block",
+                 timeout: float = 60.0,  # [s], max wait for a free slot while blocking
+                 poll: float = 1e-4,  # [s], sleep while waiting
+                 ) -> None:
+        if policy not in ["block", "drop"]:
+            raise ValueError(f"'policy' has to be either 'block' or 'drop'. '{policy}' is invalid.")
+        for consumer_class, _, _ in consumers:
+            if isinstance(consumer_class, str) and consumer_class not in CONSUMERS:
+                raise ValueError(f"A consumer has to be either of {list(CONSUMERS)} or a class. "
+                                 f"'{consumer_class}' is invalid.")
+
+        self.shape = (n_slots, *shape)
+        self.n_slots = n_slots
+        self.policy = policy
+        self.timeout = timeout
+        self.poll = poll
+
+        self._segments = [
+            SharedMemory(create=True, size=int(np.prod(self.shape))),
+            SharedMemory(create=True, size=n_slots * NAME_SIZE),
+            SharedMemory(create=True, size=8 * (N_WORDS + 2 * len(consumers))),
+            SharedMemory(create=True, size=8 * n_slots),
+        ]
+        self.frames = np.ndarray(self.shape, dtype=np.uint8, buffer=self._segments[0].buf)
+        self.names = np.ndarray((n_slots, NAME_SIZE), dtype=np.uint8, buffer=self._segments[1].buf)
+        self.control = np.ndarray((N_WORDS + 2 * len(consumers), ), dtype=np.int64,
+                                  buffer=self._segments[2].buf)
+        self.control[:] = 0
+        self.channels = np.ndarray((n_slots, ), dtype=np.int64, buffer=self._segments[3].buf)
+
+        self.lossless_ids = N_WORDS + 2 * np.flatnonzero([c[2] for c in consumers])  # cursors
+        self.published = 0
+        self.dropped = 0
+        self.blocked_time = 0.0  # [s]
+
+        # Spawn rather than fork not to inherit the rendering context
+        context = get_context("spawn")
+        shm_names = tuple(s.name for s in self._segments)
+        self.processes = [
+            context.Process(target=_consume,
+                            args=(CONSUMERS.get(consumer_class, consumer_class), kwargs, shm_names,
+                                  self.shape, i, lossless, poll),
+                            daemon=True)
+            for i, (consumer_class, kwargs, lossless) in enumerate(consumers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def _check_consumers(self) -> None:
+        for process in self.processes:
+            if process.exitcode not in [None, 0]:
+                raise RuntimeError(f"A consumer process of the frame bus exited with "
+                                   f"{process.exitcode}.")
+
+    def acquire(self) -> Optional[NDArray]:
+        """Get the slot of the next frame to fill in place, or None if dropped"""
+
+        start = perf_counter()
+        while len(self.lossless_ids) and \
+                self.n_slots <= self.published - self.control[self.lossless_ids].min():
+            if "drop" == self.policy:
+                self.dropped += 1
+                return None
+            if self.timeout < perf_counter() - start:
+                raise TimeoutError(f"No slot of the frame bus got free in {self.timeout} [s].")
+            self._check_consumers()
+            sleep(self.poll)
+
+        self.blocked_time += perf_counter() - start
+        return self.frames[self.published % self.n_slots]
+
+    def commit(self, name: str, channel: int = 0) -> None:
+        """Publish the frame filled in the slot given by acquire(), e.g., of a camera channel"""
+
+        encoded = name.encode()
+        if NAME_SIZE < len(encoded):
+            raise ValueError(f"'{name}' is longer than {NAME_SIZE} bytes.")
+
+        slot = self.published % self.n_slots
+        self.names[slot] = 0
+        self.names[slot, :len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self.channels[slot] = channel
+        self.published += 1
+        self.control[PUBLISHED] = self.published
+
+    def close(self) -> dict[str, Any]:
+        """Let the consumers drain the published frames, stop them and free the memory"""
+
+        self.control[CLOSED] = 1
+        for process in self.processes:
+            process.join()
+        self._check_consumers()
+
+        stats = dict(published=self.published,
+                     dropped=self.dropped,
+                     blocked_time=self.blocked_time,
+                     consumed=self.control[N_WORDS + 1::2].tolist(),  # per consumer
+                     )
+
+        del self.frames, self.names, self.channels, self.control
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+
+        return stats
@@ -1,20 +1,27 @@
 import os
 import shutil
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from math import atan2, radians, tan
-from operator import itemgetter
 from pathlib import Path
 
 import cv2
 import json
 import numpy as np
 import pandas as pd
-from mujoco._structs import MjData, MjModel
+from mujoco._enums import mjtCamera, mjtObj, mjtRndFlag
+from mujoco._functions import mjv_updateCamera
+from mujoco._render import mjr_readPixels, mjr_render
+from mujoco._structs import MjData, MjModel, MjvCamera, mjv_averageCamera
 from mujoco.renderer import Renderer
+from numpy.typing import NDArray
 from omegaconf import MISSING
 
 #from main import Scorer
+from dynamics import GramAccumulator
+from transformations import tr2se3
+from .frame_bus import FrameBus
+from .masks import encode_mask
 from utilities import get_element_id
 
 
@@ -22,16 +29,93 @@ from utilities import get_element_id
 class LoggerConfig:
     target_class: str = "Logger"
     track_cam_name: str = "tracking"
+    # Cameras rendered from the same state as the tracking camera for each frame
+    extra_cam_names: list[str] = field(default_factory=list)  # defined in the MJCF
+    n_orbit_cams: int = 0  # free cameras evenly spaced in azimuth around orbit_site
+    orbit_site: str = "attachment"
+    orbit_distance: float = -1  # [m], 4 * aabb_scale as the tracking camera if non-positive
+    orbit_elevation: float = -30.0  # [deg]
     fig_height: int = 800
     fig_width: int = 800
+    # Mask of the target from the segmentation rendering of the geoms of mask_body
+    # and its descendants ("segmentation") or from the non-black pixels ("color").
+    # The former takes a second render pass, which the depth shares if enabled
+    mask: str = "segmentation"
+    mask_body: str = "target/"
+    # Mask kept as the alpha channel of the png images ("alpha") or run-length
+    # encoded with its bounding box in transform*.json next to rgb images ("rle")
+    mask_storage: str = "alpha"
+    depth: bool = False  # write 16-bit depth png images besides the color ones
+    depth_unit: float = 1e-4  # [m], depth of one count of the depth images
     fps: int = 60
     videoname: str = "output.mp4"
     videcodec: str = "mp4v"
     dataset_dir: str = MISSING
     aabb_scale: float = MISSING
+    n_folds: int = 5  # k of the k-fold cross-validation of identification
+    n_bootstraps: int = 1000  # number of bootstrap resamples of identification
+    confidence: float = 0.95  # level of the bootstrap confidence intervals
+    # Hand the rendered frames to video encoder and png writer processes through
+    # a shared-memory ring buffer instead of encoding them on the render loop
+    frame_bus: bool = False
+    bus_slots: int = 8  # number of frames the ring buffer holds
+    # The png writer always holds the render loop back when it lags behind. The
+    # video encoder does too ("block") or skips the frames it missed ("drop")
+    bus_video_policy: str = "block"
+    preview: bool = False  # show the frames live, only with the frame bus
     #gt_mass_distr_file_path: str = MISSING
 
 
+class LayeredRenderer(Renderer):
+    """Renderer reading the segmentation and the depth of one render pass.
+
+    Renderer.render() takes a pass for each of them. Both are read here by one
+    mjr_readPixels() of the pass with the segmentation flags, from which
+    Renderer also reads the depth as that of the color pass is off at the edges
+    of the geoms.
+    """
+
+    def render_segmentation_depth(self) -> tuple[NDArray, NDArray]:
+        """Get the (object id, object type) (H, W, 2), (-1, -1) for the background, and the depth [m] (H, W)"""
+
+        flags = self._scene.flags.copy()
+        self._scene.flags[mjtRndFlag.mjRND_SEGMENT] = True
+        self._scene.flags[mjtRndFlag.mjRND_IDCOLOR] = True
+        if self._gl_context:
+            self._gl_context.make_current()
+
+        colors = np.empty((self._height, self._width, 3), dtype=np.uint8)
+        depth = np.empty((self._height, self._width), dtype=np.float32)
+        mjr_render(self._rect, self._scene, self._mjr_context)
+        mjr_readPixels(colors, depth, self._rect, self._mjr_context)
+        np.copyto(self._scene.flags, flags)
+        if self._gl_context:  # flipped vertically
+            colors, depth = colors[::-1], depth[::-1]
+
+        # Colors of the segmentation ids to the objects, as Renderer.render() does
+        colors = colors.astype(np.uint32)
+        segids = colors[..., 0] + (colors[..., 1] << 8) + (colors[..., 2] << 16)  # 0 for the background
+        segid_objects = np.full((self._scene.ngeom + 1, 2), -1, dtype=np.int32)
+        for geom in self._scene.geoms[:self._scene.ngeom]:
+            if -1 != geom.segid:
+                segid_objects[geom.segid + 1] = geom.objid, geom.objtype
+        segmentation = segid_objects[segids]
+
+        # Depth buffer to the distance, as Renderer.render() does in float32
+        # precision for the clipping planes and float64 for the conversion
+        extent = self._model.stat.extent
+        znear = np.float32(self._model.vis.map.znear * extent)
+        zfar = np.float32(self._model.vis.map.zfar * extent)
+        if self._scene.camera[0].orthographic:
+            depth = zfar - depth.astype(np.float64) * (zfar - znear)
+        else:  # perspective in reversed z
+            c_coef = np.float32(-0.5) * (-(zfar + znear) / (zfar - znear)) - np.float32(0.5)
+            d_coef = np.float32(-0.5) * (-(np.float32(2) * zfar * znear) / (zfar - znear))
+            depth = d_coef / (depth.astype(np.float64) + c_coef)
+
+        return segmentation, depth.astype(np.float32)
+
+
 class Logger:
     def __init__(self,
                  cfg: LoggerConfig,
@@ -42,125 +126,382 @@ class Logger:
         self.cam_id = get_element_id(m, "camera", self.cam_name)
         self.fig_height = cfg.fig_height
         self.fig_width = cfg.fig_width
-        self.cam_fovy = radians(m.cam_fovy[self.cam_id])
-        self.cam_focus = self.fig_height / tan(.5 * self.cam_fovy)
-        self.cam_fovx = 2 * atan2(self.fig_width, self.cam_focus)
+        self.cam_fovx = self._get_fovx(m.cam_fovy[self.cam_id])
         self.fps = cfg.fps
         self.dataset_dir = Path(cfg.dataset_dir)
         self.complete_image_dir = self.dataset_dir / "complete"
-        self.renderer = Renderer(m, self.fig_height, self.fig_width)
+        self.renderer = LayeredRenderer(m, self.fig_height, self.fig_width)
         self.aabb_scale = cfg.aabb_scale
+        self.n_folds = cfg.n_folds
+        self.n_bootstraps = cfg.n_bootstraps
+        self.confidence = cfg.confidence
+        self.video_path = self.dataset_dir / cfg.videoname
+        self.videcodec = cfg.videcodec
+        self.use_frame_bus = cfg.frame_bus
+        self.bus_slots = cfg.bus_slots
+        self.bus_video_policy = cfg.bus_video_policy
+        self.preview = cfg.preview
+        self.frame_bus = None
+        self.bus_stats = None
+
+        # Mask and depth ===============================================================
+        if cfg.mask not in ["segmentation", "color"]:
+            raise ValueError(f"'mask' has to be either 'segmentation' or 'color'. "
+                             f"'{cfg.mask}' is invalid.")
+        if cfg.mask_storage not in ["alpha", "rle"]:
+            raise ValueError(f"'mask_storage' has to be either 'alpha' or 'rle'. "
+                             f"'{cfg.mask_storage}' is invalid.")
+        self.mask = cfg.mask
+        self.mask_storage = cfg.mask_storage
+        self.depth = cfg.depth
+        self.depth_unit = cfg.depth_unit
+
+        # Whether each geom belongs to the subtree of mask_body, bodies being
+        # ordered after their parents. The extra last one is for the background
+        # and the non-geom objects, i.e., id -1
+        in_subtree = np.zeros(m.nbody, dtype=bool)
+        in_subtree[get_element_id(m, "body", cfg.mask_body)] = True
+        for body_id in range(1, m.nbody):
+            in_subtree[body_id] |= in_subtree[m.body_parentid[body_id]]
+        self.mask_geoms = np.append(in_subtree[m.geom_bodyid], False)
+
+        # Cameras of each frame, the tracking camera first ============================
+        self.cameras = []
+        self.camera_names = []
+        self.camera_angles_x = []
+        for name in [self.cam_name, *cfg.extra_cam_names]:
+            camera = MjvCamera()
+            camera.type = mjtCamera.mjCAMERA_FIXED
+            camera.fixedcamid = get_element_id(m, "camera", name)
+            self.cameras.append(camera)
+            self.camera_names.append(name)
+            self.camera_angles_x.append(self._get_fovx(m.cam_fovy[camera.fixedcamid]))
+
+        self.orbit_site_id = get_element_id(m, "site", cfg.orbit_site) if cfg.n_orbit_cams else None
+        self.orbit_cameras = []
+        for k in range(cfg.n_orbit_cams):
+            camera = MjvCamera()
+            camera.type = mjtCamera.mjCAMERA_FREE
+            camera.distance = 4 * self.aabb_scale if cfg.orbit_distance <= 0 else cfg.orbit_distance
+            camera.azimuth = 360 * k / cfg.n_orbit_cams
+            camera.elevation = cfg.orbit_elevation
+            self.orbit_cameras.append(camera)
+            self.cameras.append(camera)
+            self.camera_names.append(f"orbit{k}")
+            self.camera_angles_x.append(self._get_fovx(m.vis.global_.fovy))
 
         os.makedirs(self.complete_image_dir, exist_ok=True)  # not sure but should be called before
                                                     # the videowriter is instantiated
 
-        self.videowriter = cv2.VideoWriter(
-            str(self.dataset_dir / cfg.videoname),
-            cv2.VideoWriter_fourcc(*cfg.videcodec),
-            self.fps,
-            (self.fig_width, self.fig_height),
-        )
+        # Opened on the first render so that a video restored from the stage
+        # cache is not truncated when nothing is rendered
+        self.videowriter = None
 
         self.base_transform = dict(
             date_time=datetime.now().strftime("%d/%m/%Y_%H:%M:%S"),
             camera_angle_x=self.cam_fovx,
             aabb_scale=self.aabb_scale,
         )
+        if self.depth:
+            self.base_transform["depth_unit"] = self.depth_unit
+
+    def _get_fovx(self, fovy):
+        focus = self.fig_height / tan(.5 * radians(fovy))
+        return 2 * atan2(self.fig_width, focus)
+
+    def get_file_name(self, file_name, k):
+        """Name the image of the k-th camera after that of the tracking camera"""
+        if 0 == k:
+            return file_name
+        path = Path(file_name)
+        return f"{path.stem}_{self.camera_names[k]}{path.suffix}"
+
+    def get_pose_x_cam(self, d, k):
+        """Global pose of the k-th camera in d, without rendering for a fixed one"""
+        camera = self.cameras[k]
+        if mjtCamera.mjCAMERA_FIXED == camera.type:
+            return tr2se3(d.cam_xpos[camera.fixedcamid].copy(),
+                          d.cam_xmat[camera.fixedcamid].reshape(3, 3).copy())
+
+        # Pose of a free camera, looking along -z with y up, as rendered
+        gl_camera = mjv_averageCamera(self.renderer.scene.camera[0], self.renderer.scene.camera[1])
+        forward = np.asarray(gl_camera.forward, dtype=float)
+        forward /= np.linalg.norm(forward)
+        up = np.asarray(gl_camera.up, dtype=float)
+        up -= up.dot(forward) * forward
+        up /= np.linalg.norm(up)
+        return tr2se3(np.asarray(gl_camera.pos, dtype=float),
+                      np.column_stack([np.cross(forward, up), up, -forward]))
+
+    def get_depth_file_name(self, file_name):
+        path = Path(file_name)
+        return f"{path.stem}_depth{path.suffix}"
+
+    def render(self, d, file_name):
+        """Render every camera and get their global poses and annotations.
+
+        The geometry of the scene is updated once for the tracking camera and
+        only the camera is updated for the others. The annotations of a camera
+        hold its run-length encoded mask and the name of its depth image if any.
+        """
+        for camera in self.orbit_cameras:
+            camera.lookat[:] = d.site_xpos[self.orbit_site_id]
+
+        poses_x_cam = []
+        annotations = []
+        for k, camera in enumerate(self.cameras):
+            if 0 == k:
+                self.renderer.update_scene(d, camera)
+            else:
+                mjv_updateCamera(self.renderer.model, d, camera, self.renderer.scene)
+
+            rgb = self.renderer.render()
+            segmentation = depth = None
+            if "segmentation" == self.mask or self.depth:  # a second pass
+                segmentation, depth = self.renderer.render_segmentation_depth()
+
+            annotations.append(self._write(rgb, segmentation, depth,
+                                           self.get_file_name(file_name, k), k))
+            poses_x_cam.append(self.get_pose_x_cam(d, k))
+
+        return poses_x_cam, annotations
+
+    def _get_mask(self, rgb, segmentation):
+        if "color" == self.mask:
+            return ~np.all(rgb == 0, axis=-1)
+
+        geom_ids = np.where(int(mjtObj.mjOBJ_GEOM) == segmentation[..., 1], segmentation[..., 0], -1)
+        return self.mask_geoms[geom_ids]
 
-    def render(self, d, file_name, cam_id=None):
-        if cam_id is None:
-            cam_id = self.cam_id
-
-        self.renderer.update_scene(d, cam_id)
-        bgr = self.renderer.render()[:, :, [2, 1, 0]]
-        # Make an alpha mask to remove the white background
-        alpha = np.where(np.all(bgr == 0, axis=-1), 0, 255)[..., np.newaxis]
-        cv2.imwrite(str(self.complete_image_dir / file_name),
-                    np.append(bgr, alpha, axis=2))  # image (bgr + alpha)
-        # Write a video frame
+    def _write(self, rgb, segmentation, depth, file_name, k):
+        """Write every output of a camera in one pass and get its annotations"""
+
+        mask = self._get_mask(rgb, segmentation)
+        annotation = {}
+        if "rle" == self.mask_storage:
+            annotation["mask"] = encode_mask(mask)
+
+        if self.depth:
+            # Depth of any geom in depth_unit counts, 0 for the background and out of range
+            counts = np.rint(depth / self.depth_unit)
+            counts[(segmentation[..., 0] < 0) | (np.iinfo(np.uint16).max < counts)] = 0
+            annotation["depth_file_name"] = self.get_depth_file_name(file_name)
+            cv2.imwrite(str(self.complete_image_dir / annotation["depth_file_name"]),
+                        counts.astype(np.uint16))
+
+        if self.use_frame_bus:
+            self._publish(rgb, mask, file_name, k)
+            return annotation
+
+        bgr = rgb[:, :, [2, 1, 0]]
+        if "alpha" == self.mask_storage:
+            # Make an alpha mask to remove the background
+            alpha = np.where(mask, 255, 0).astype(np.uint8)[..., np.newaxis]
+            cv2.imwrite(str(self.complete_image_dir / file_name),
+                        np.append(bgr, alpha, axis=2))  # image (bgr + alpha)
+        else:
+            cv2.imwrite(str(self.complete_image_dir / file_name), bgr)
+        if 0 < k or self.video_path is None:  # None if the caller encodes the video
+            return annotation
+
+        # Write a video frame of the tracking camera
+        if self.videowriter is None:
+            self.videowriter = cv2.VideoWriter(
+                str(self.video_path),
+                cv2.VideoWriter_fourcc(*self.videcodec),
+                self.fps,
+                (self.fig_width, self.fig_height),
+            )
         self.videowriter.write(bgr)
 
-    def _split(self, data, valid_ratio=0.1, test_ratio=0.1, seed=0):
+        return annotation
+
+    def _publish(self, rgb, mask, file_name, channel=0):
+        if self.frame_bus is None:
+            size = (self.fig_width, self.fig_height)
+            video_lossless = "block" == self.bus_video_policy
+            consumers = [("VideoConsumer", dict(path=str(self.video_path), codec=self.videcodec,
+                                                fps=self.fps, size=size), video_lossless),
+                         ("PngConsumer", dict(image_dir=str(self.complete_image_dir)), True)]
+            if self.preview:
+                consumers.append(("PreviewConsumer", dict(), False))
+            n_channels = 4 if "alpha" == self.mask_storage else 3
+            self.frame_bus = FrameBus((self.fig_height, self.fig_width, n_channels), consumers,
+                                      self.bus_slots, policy="block")
+
+        # Fill the slot in place, bgr (+ alpha to remove the background)
+        bgra = self.frame_bus.acquire()
+        if bgra is not None:
+            bgra[..., :3] = rgb[..., ::-1]
+            if "alpha" == self.mask_storage:
+                bgra[..., 3] = np.where(mask, 255, 0)
+            self.frame_bus.commit(file_name, channel)
+
+    def release(self):
+        if self.videowriter is not None:
+            self.videowriter.release()
+            self.videowriter = None
+
+        if self.frame_bus is not None:
+            self.bus_stats = self.frame_bus.close()
+            self.frame_bus = None
+            skipped = self.bus_stats["published"] - min(self.bus_stats["consumed"])
+            if skipped:
+                print(f"Frame bus: {skipped} / {self.bus_stats['published']} frames skipped "
+                      "by a lossy consumer.")
+
+    def _split(self, n, valid_ratio=0.1, test_ratio=0.1, seed=0):
         """
-        Splits the indices of a list into training and testing sets.
+        Splits the indices of a dataset into training, validation and testing sets.
 
         Args:
-            data_list: The list of dictionaries.
-            validation_ratio: The proportion of data to use for validation (default 0.2).
-            test_ratio: The proportion of data to use for test (default 0.2).
+            n: The number of data in the dataset.
+            validation_ratio: The proportion of data to use for validation (default 0.1).
+            test_ratio: The proportion of data to use for test (default 0.1).
 
         Returns:
-            A tuple containing two lists: train_indices and test_indices.
+            A tuple containing three index arrays: train, valid, and test indices.
         """
-        n = len(data)
         num_test = int(n * test_ratio)
         num_valid = int(n * valid_ratio)
         num_train = n - num_test - num_valid
 
         # Get shuffled indices for the whole dataset
         rng = np.random.default_rng(seed)
-        all_indices = list(range(n))
+        all_indices = np.arange(n)
         rng.shuffle(all_indices)
 
-        train = itemgetter(*all_indices[:num_train])(data)
-        valid = itemgetter(*all_indices[num_train:num_train+num_valid])(data)
-        test = itemgetter(*all_indices[num_train:num_train+num_valid])(data)
+        train, valid, test = np.split(all_indices, [num_train, num_train + num_valid])
 
         return train, valid, test
 
-    def _process_split(self, frames, regressors, scorer, split=None):
+    def split_frames(self, frames, indices=None, n_logged=None):
+        """Split the logged frames and get the frames and the logged ones of each split.
+
+        indices are the logged frame of each of the frames, all the n_logged ones
+        if None. A split identifies from all its logged frames and lists those of
+        them rendered, so it is the same whether a render budget is spent or not.
+        """
+        n_logged = len(frames) if n_logged is None else n_logged
+        positions = np.full(n_logged, -1)  # of each logged frame in frames
+        positions[np.arange(n_logged) if indices is None else indices] = np.arange(len(frames))
+
+        return [(split, [frames[p] for p in positions[logged] if 0 <= p], logged)
+                for split, logged in zip(["train", "valid", "test"], self._split(n_logged))]
+
+    def _copy_images(self, frames, split):
+        split_image_dir = self.dataset_dir / split
+        split_image_dir.mkdir(parents=True, exist_ok=True)
+
+        for frame in frames:
+            for camera in frame.get("cameras", [frame]):
+                for key in ["file_path", "depth_file_path"]:
+                    if key in camera:
+                        image_path = Path(camera[key])
+                        shutil.copy(image_path, split_image_dir / image_path.name)
+
+    def _process_split(self, frames, gram, scorer, split=None, indices=None):
         suffix = ""
-        fts_sen = []
 
         if split:
             suffix = f"_{split}"
-            split_image_dir = self.dataset_dir / split
-            split_image_dir.mkdir(parents=True, exist_ok=True)
+            self._copy_images(frames, split)
 
-            for frame in frames:
-                fts_sen.append(frame["ft_sen"])
-                image_path = Path(frame["file_path"])
-                shutil.copy(image_path, split_image_dir / image_path.name)
-        else:
-            for frame in frames:
-                fts_sen.append(frame["ft_sen"])
-
-        regressors = np.reshape(regressors, (-1, 10))
-        fts_sen = np.reshape(fts_sen, -1)
-        est_iparams, _, _, _ = np.linalg.lstsq(regressors, fts_sen)
-        score = scorer.calculate(est_iparams)
+        # Identify inertial params for all the K noise realizations at once from
+        # the per-frame statistics. The first realization is the one in the frames
+        est_iparams = gram.estimate(indices)  # (10, K)
+        scores = scorer.calculate(est_iparams)
+        score = scores[0]
         gt_iparams = scorer.gt_iparams
 
+        # Quantify the uncertainty of the estimate from the first realization
+        covariance = gram.covariance(indices)[0]
+        kfold = gram.kfold(indices, k=self.n_folds)
+        resampled = gram.bootstrap(indices, n_resamples=self.n_bootstraps)[..., 0]  # (B, 10)
+        alpha = 1 - self.confidence
+        lower, upper = np.percentile(resampled, [50 * alpha, 100 - 50 * alpha], axis=0)
+        score_lower, score_upper = np.percentile(scorer.calculate(resampled.T),
+                                                 [50 * alpha, 100 - 50 * alpha])
+
         labels = ["total_mass",
                   "mx", "my", "mz",
                   "ixx", "iyy", "izz", "ixy", "iyz", "izx",
                   "aabb_scale", "score"]
         global_gt = [ *gt_iparams, self.aabb_scale, np.nan]
-        lstsq     = [*est_iparams,          np.nan,  score]
+        lstsq     = [*est_iparams[:, 0],    np.nan,  score]
 
         split_transform = self.base_transform.copy()
         split_transform["frames"] = frames
         split_transform["labels"] = labels
         split_transform["global_gt"] = global_gt
         split_transform["lstsq"] = lstsq
+        split_transform["noise_realizations"] = dict(
+            lstsq=est_iparams.T.tolist(),
+            score=scores.tolist(),
+            score_mean=scores.mean(),
+            score_std=scores.std(),
+            kfold_rmse=kfold["rmse"].tolist(),
+        )
+        split_transform["uncertainty"] = dict(
+            covariance=covariance.tolist(),
+            std=np.sqrt(np.diag(covariance)).tolist(),
+            kfold=dict(k=len(kfold["estimates"]),
+                       rmse=kfold["rmse"][0],
+                       std=kfold["estimates"][..., 0].std(axis=0).tolist(),
+                       ),
+            bootstrap=dict(n_resamples=self.n_bootstraps,
+                           confidence=self.confidence,
+                           lower=lower.tolist(),
+                           upper=upper.tolist(),
+                           std=resampled.std(axis=0).tolist(),
+                           score_lower=score_lower,
+                           score_upper=score_upper,
+                           ),
+        )
         #split_transform["globalinertia"] = comparison.to_json()
 
-        with open(self.dataset_dir / f"transform{suffix}.json", "w") as f:
+        transform_path = self.dataset_dir / f"transform{suffix}.json"
+        with open(transform_path, "w") as f:
             json.dump(split_transform, f, indent=2)
 
+        return dict(path=str(transform_path),
+                    n_frames=len(frames),
+                    labels=labels,
+                    global_gt=global_gt,
+                    lstsq=lstsq,
+                    uncertainty=split_transform["uncertainty"],
+                    )
+
     def finish(self,
                frames,
-               regressors,
-               scorer):
-        self.videowriter.release()
+               regressors,  # of every logged frame, or sample with groups
+               scorer,
+               fts_sen=None,
+               groups=None,  # logged frame of each sample of a stream denser than the frames
+               indices=None,  # logged frame of each of the frames, see split_frames()
+               n_logged=None):
+        self.release()
+
+        if fts_sen is None:
+            fts_sen = np.array([[frame["ft_sen"] for frame in frames]])
+
+        # Reduce the regressors and wrenches to per-frame statistics only once
+        n_logged = len(frames) if n_logged is None else n_logged
+        gram = GramAccumulator(regressors, fts_sen, groups, n_logged)
+
+        summaries = dict(full=self._process_split(frames, gram, scorer))
+        for split, split_frames, logged in self.split_frames(frames, indices, n_logged):
+            summaries[split] = self._process_split(split_frames, gram, scorer,
+                                                   split=split, indices=logged)
+
+        return summaries
 
-        train_frames, valid_frames, test_frames = self._split(frames)
-        train_regressors, valid_regressors, test_regressors = self._split(regressors)
+    def restore(self, frames, indices=None, n_logged=None):
+        """Copy the images of each split as finish() does when its outputs are cached"""
+        self.release()
 
-        self._process_split(frames, regressors, scorer)
-        self._process_split(train_frames, train_regressors, scorer, split="train")
-        self._process_split(valid_frames, valid_regressors, scorer, split="valid")
-        self._process_split(test_frames, test_regressors, scorer, split="test")
+        for split, split_frames, _ in self.split_frames(frames, indices, n_logged):
+            self._copy_images(split_frames, split)
 
 #        with open(self.dataset_dir / "transform.json", "w") as f:
 #            json.dump(self.transform, f, indent=2)
@@ -0,0 +1,31 @@
+import numpy as np
+from numpy.typing import NDArray
+
+
+def encode_mask(mask: NDArray) -> dict:
+    """Run-length encode a binary mask with its bounding box.
+
+    The counts follow the uncompressed RLE of COCO: lengths of alternating runs
+    of 0 and 1 over the column-major pixels, starting with a (possibly empty)
+    run of 0. The bounding box is [x, y, width, height] in pixels.
+    """
+
+    height, width = mask.shape
+    flat = mask.ravel(order="F")
+    bounds = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate([[0], bounds, [flat.size]]))
+    if flat.size and flat[0]:
+        counts = np.concatenate([[0], counts])
+
+    ys, xs = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    bbox = [0, 0, 0, 0] if 0 == len(xs) else \
+        [int(xs[0]), int(ys[0]), int(xs[-1] - xs[0] + 1), int(ys[-1] - ys[0] + 1)]
+
+    return dict(size=[height, width], counts=counts.tolist(), bbox=bbox)
+
+
+def decode_mask(rle: dict) -> NDArray:
+    height, width = rle["size"]
+    values = np.arange(len(rle["counts"])) % 2 == 1
+    flat = np.repeat(values, rle["counts"])
+    return flat.reshape((height, width), order="F")
@@ -0,0 +1,75 @@
+from typing import Any, Iterable
+
+import numpy as np
+from numpy.typing import DTypeLike, NDArray
+
+
+class TrajectoryRecorder:
+    """Columnar buffers of the records of a trajectory, one row per frame.
+
+    Each column is a typed array preallocated for the expected number of rows
+    and written in place, so that nothing is converted per frame nor copied at
+    the end. A column grows geometrically if more rows are recorded than
+    expected. The recorded rows are read as views of the columns.
+    """
+
+    def __init__(self,
+                 capacity: int,  # expected number of rows
+                 growth: float = 2.0,  # ratio of the capacity after growing
+                 ) -> None:
+        self.capacity = max(int(capacity), 1)
+        self.growth = growth
+        self.n_rows = 0
+        self._columns: dict[str, NDArray] = {}
+
+    def add(self,
+            name: str,
+            shape: Iterable[int] = (),  # of a row
+            dtype: DTypeLike = float,
+            ) -> None:
+        self._columns[name] = np.empty((self.capacity, *shape), dtype=dtype)
+
+    def _grow(self, n_rows: int) -> None:
+        capacity = self.capacity
+        while capacity < n_rows:
+            capacity = max(int(np.ceil(self.growth * capacity)), capacity + 1)
+
+        for name, column in self._columns.items():
+            grown = np.empty((capacity, *column.shape[1:]), dtype=column.dtype)
+            grown[:self.n_rows] = column[:self.n_rows]
+            self._columns[name] = grown
+        self.capacity = capacity
+
+    def next_row(self) -> int:
+        """Reserve a row and get its index to write the columns in place"""
+
+        if self.capacity <= self.n_rows:
+            self._grow(self.n_rows + 1)
+        self.n_rows += 1
+        return self.n_rows - 1
+
+    def __getitem__(self, name: str) -> NDArray:
+        """Get the whole column to write a reserved row, e.g., recorder[name][row] = value"""
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def view(self, name: str) -> NDArray:
+        return self._columns[name][:self.n_rows]
+
+    def views(self) -> dict[str, NDArray]:
+        return {name: self.view(name) for name in self._columns}
+
+    def extend(self, records: dict[str, Any]) -> None:
+        """Append rows of every column, e.g., the records of a checkpoint"""
+
+        n_rows = len(next(iter(records.values()))) if records else 0
+        if 0 == n_rows:
+            return
+        if self.capacity < self.n_rows + n_rows:
+            self._grow(self.n_rows + n_rows)
+
+        for name, column in self._columns.items():
+            column[self.n_rows:self.n_rows + n_rows] = np.asarray(records[name])
+        self.n_rows += n_rows
@@ -0,0 +1,211 @@
+import os
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter, sleep
+from typing import Optional
+
+import numpy as np
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+
+
+N_PARAMS = 10  # inertial params of the running estimate
+NICENESS = 10  # of the monitor process, about a tenth of a contended core
+# Layout of the control block of int64 words
+WRITTEN, SEQUENCE, CLOSED, N_WORDS = 0, 1, 2, 3
+
+
+@dataclass
+class TelemetryConfig:
+    target_class: str = "Telemetry"
+    # Plot the latest tracking error, wrench and running estimate of simulate()
+    # live from another process
+    enabled: bool = False
+    interval: int = 10  # [steps] between the samples
+    history: int = 5000  # number of the latest samples kept and plotted
+    rate: float = 2.0  # [Hz], refresh rate of the plots
+    image_path: str = ""  # png refreshed instead of a window if given, e.g., headless
+
+
+def _read_sums(sums: NDArray, control: NDArray) -> NDArray:
+    """Copy the sums consistently, retrying while the writer updates them"""
+
+    while True:
+        sequence = control[SEQUENCE]
+        if 0 == sequence % 2:
+            copied = sums.copy()
+            if sequence == control[SEQUENCE]:
+                return copied
+        sleep(1e-4)
+
+
+def _monitor(shm_names: tuple[str, str, str],
+             history: int,
+             n_cols: int,
+             rate: float,
+             image_path: str,
+             ) -> None:
+    """Main function of the monitor process redrawing the plots at a fixed rate"""
+
+    import matplotlib
+    if image_path:
+        matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+
+    import visualization as vis
+
+    segments = [SharedMemory(name=name) for name in shm_names]  # owned by the simulation
+    rows = np.ndarray((history, n_cols), dtype=float, buffer=segments[0].buf)
+    sums = np.ndarray((N_PARAMS * N_PARAMS + N_PARAMS, ), dtype=float, buffer=segments[1].buf)
+    control = np.ndarray((N_WORDS, ), dtype=np.int64, buffer=segments[2].buf)
+    n_joints = n_cols - 7
+
+    fig, axes = plt.subplots(4, 1, sharex="col", figsize=(8, 10), tight_layout=True)
+    estimates_time, estimates = [], []
+    closed = False
+    while not closed:
+        start = perf_counter()
+        closed = bool(control[CLOSED])
+
+        # Copy the latest rows out of the ring in chronological order
+        written = int(control[WRITTEN])
+        n_rows = min(written, history)
+        order = np.arange(written - n_rows, written) % history
+        snapshot = rows[order]
+        # The oldest rows overwritten while copying once the ring is full
+        overwritten = min(max(int(control[WRITTEN]) - written - (history - n_rows), 0), n_rows)
+        snapshot = snapshot[overwritten:]
+        n_rows -= overwritten
+        if n_rows:
+            # Running least squares estimate from the sums of the frames so far
+            gram_moment = _read_sums(sums, control)
+            gram = gram_moment[:N_PARAMS * N_PARAMS].reshape(N_PARAMS, N_PARAMS)
+            if np.linalg.matrix_rank(gram) == N_PARAMS:
+                estimates_time.append(snapshot[-1, 0])
+                estimates.append(np.linalg.solve(gram, gram_moment[N_PARAMS * N_PARAMS:]))
+
+            time = snapshot[:, 0]
+            for ax in axes:
+                ax.clear()
+            vis.ax_plot_lines(axes[0], time, snapshot[:, 1:1 + n_joints], "qpos error",
+                              c=vis.tab_rgbo)
+            vis.ax_plot_lines(axes[1], time, snapshot[:, 1 + n_joints:4 + n_joints], "frc_sen [N]")
+            vis.ax_plot_lines(axes[2], time, snapshot[:, 4 + n_joints:], "trq_sen [N*m]")
+            if estimates:
+                vis.ax_plot_lines(axes[3], np.array(estimates_time), np.array(estimates),
+                                  "running estimate", c=vis.tab_rgbo)
+            axes[-1].set(xlabel="time [s]")
+
+            if image_path:
+                fig.savefig(image_path)
+            else:
+                plt.pause(1e-3)
+
+        if not closed:
+            sleep(max(1 / rate - (perf_counter() - start), 0.0))
+
+    plt.close(fig)
+    del rows, sums, control
+    for segment in segments:
+        segment.close()
+
+
+class Telemetry:
+    """Latest samples of simulate() in shared memory plotted by a monitor process.
+
+    The simulation writes a sample in place into a ring of rows and publishes
+    it by a counter, and adds the Gram matrix and the moment of each frame to
+    running sums under a sequence number, so that it neither waits for nor
+    copies anything to the monitor. The monitor copies the latest rows at its
+    own rate, solves the running least squares estimate of the clean wrench
+    and redraws the plots.
+    """
+
+    def __init__(self,
+                 cfg: TelemetryConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.enabled = cfg.enabled
+        self.interval = max(cfg.interval, 1)
+        self.history = cfg.history
+        self.rate = cfg.rate
+        self.image_path = cfg.image_path
+        self.process = None
+        self._segments: list[SharedMemory] = []
+
+    def start(self, n_joints: int) -> None:
+        n_cols = 1 + n_joints + 6  # time, qpos error and wrench
+        self._segments = [
+            SharedMemory(create=True, size=8 * self.history * n_cols),
+            SharedMemory(create=True, size=8 * (N_PARAMS * N_PARAMS + N_PARAMS)),
+            SharedMemory(create=True, size=8 * N_WORDS),
+        ]
+        self.rows = np.ndarray((self.history, n_cols), dtype=float, buffer=self._segments[0].buf)
+        self.sums = np.ndarray((N_PARAMS * N_PARAMS + N_PARAMS, ), dtype=float,
+                               buffer=self._segments[1].buf)
+        self.gram = self.sums[:N_PARAMS * N_PARAMS].reshape(N_PARAMS, N_PARAMS)
+        self.moment = self.sums[N_PARAMS * N_PARAMS:]
+        self.control = np.ndarray((N_WORDS, ), dtype=np.int64, buffer=self._segments[2].buf)
+        self.sums[:] = 0.0
+        self.control[:] = 0
+        self.n_joints = n_joints
+
+        # Spawn rather than fork not to inherit the rendering context
+        context = get_context("spawn")
+        self.process = context.Process(target=_monitor,
+                                       args=(tuple(s.name for s in self._segments),
+                                             self.history, n_cols, self.rate, self.image_path),
+                                       daemon=True)
+        self.process.start()
+        # Yield the cores to the simulation when they are contended, also while
+        # the monitor imports its modules
+        os.setpriority(os.PRIO_PROCESS, self.process.pid, NICENESS)
+
+    def due(self, step: int) -> bool:
+        return 0 == step % self.interval
+
+    def publish(self,
+                time: float,
+                qpos_error: NDArray,
+                force: NDArray,
+                torque: NDArray,
+                ) -> None:
+        row = self.rows[self.control[WRITTEN] % self.history]
+        row[0] = time
+        row[1:1 + self.n_joints] = qpos_error
+        row[1 + self.n_joints:4 + self.n_joints] = force
+        row[4 + self.n_joints:] = torque
+        self.control[WRITTEN] += 1
+
+    def accumulate(self, regressor: NDArray, wrench: NDArray) -> None:
+        """Add a frame's R^T R and R^T f to the sums of the running estimate"""
+
+        self.control[SEQUENCE] += 1  # odd while writing
+        self.gram += regressor.T @ regressor
+        self.moment += regressor.T @ wrench
+        self.control[SEQUENCE] += 1
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Let the monitor draw the final samples and release the shared memory.
+
+        The monitor is stopped if it has not finished in timeout, a refresh
+        period by default, e.g., if it was starved of a single contended core.
+        """
+
+        if self.process is None:
+            return
+
+        self.control[CLOSED] = 1
+        self.process.join(1 / self.rate if timeout is None else timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+
+        del self.rows, self.sums, self.gram, self.moment, self.control
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
@@ -1,44 +1,76 @@
+import json
 from pathlib import Path
 from shutil import copy
+from time import perf_counter
 
 import numpy as np
 import pandas as pd
+from omegaconf import OmegaConf
 from omegaconf.errors import MissingMandatoryValue
 
-from core import load_config, generate_model_data, autoinstantiate, get_element_id, simulate
+from mujoco._functions import mj_resetDataKeyframe
+from mujoco._structs import MjData
+
+from caches import hash_files, hash_model
+from core import (load_config, generate_model_data, autoinstantiate, get_element_id, simulate,
+                  simulate_kinematic, select_keyframes, render, compose_frames, plot_simulation)
 
 
 class Scorer:
-    def __init__(self, gt_total_mass, gt_f_moms, gt_moms_i):
-        self.gt_total_mass = gt_total_mass
-        self.gt_f_moms = gt_f_moms
-        self.gt_moms_i = gt_moms_i
+    def __init__(self, gt_total_mass, gt_f_moms, gt_moms_i, aabb_scale):
+        self.gt_total_mass = float(gt_total_mass)
+        self.gt_f_moms = np.asarray(gt_f_moms, dtype=float)
+        self.gt_moms_i = np.asarray(gt_moms_i, dtype=float)
+        self.aabb_scale = aabb_scale
 
     @property
     def gt_iparams(self):
         return (self.gt_total_mass, *self.gt_f_moms, *self.gt_moms_i)
 
     def _get_partial_score(self, est, gt, scale=None):
-        score = np.power(est - gt, 2).sum()
+        score = np.power(est - gt, 2).sum(axis=-1)
         return score if scale is None else score / np.power(scale, 2)
 
     def calculate(self, estimate):
-        aabb_scale = cfg.logger.aabb_scale
-        score  = self._get_partial_score(estimate[0], self.gt_total_mass,
+        """Score an estimate (10,) or a stack of estimates (10, K) column-wise"""
+        estimate = np.transpose(estimate)  # (..., 10)
+        aabb_scale = self.aabb_scale
+        score  = self._get_partial_score(estimate[..., :1], self.gt_total_mass,
                                    scale=self.gt_total_mass*np.power(aabb_scale, 0))  # eliminate [kg]
-        score += self._get_partial_score(estimate[1:4], self.gt_f_moms,
+        score += self._get_partial_score(estimate[..., 1:4], self.gt_f_moms,
                                    scale=self.gt_total_mass*np.power(aabb_scale, 1))  # eliminate [kg*m]
-        score += self._get_partial_score(estimate[4:10], self.gt_moms_i,
+        score += self._get_partial_score(estimate[..., 4:10], self.gt_moms_i,
                                    scale=self.gt_total_mass*np.power(aabb_scale, 2))  # eliminate [kg*m^2]
         score /= 10
 
         return score
 
 
+def build_model(cfg, catalog):
+    m, _, gt = generate_model_data(cfg, catalog)  # MjData is not cached but made from m
+    return m, gt
+
+
 if __name__ == "__main__":
 
     cfg = load_config()  # priority: cli > cli-specified .yaml > base.yaml > hard-coded
-    m, d, gt = generate_model_data(cfg)
+    # Skip the stages whose inputs are unchanged since a previous run
+    cache = autoinstantiate(cfg.cache, None, None)
+    timings = {}  # [s], wall-clock time of each stage registered to the results store
+
+    # Build the model =============================================================
+    start = perf_counter()
+    xml_dir = Path.cwd() / "xml_models"
+    catalog = autoinstantiate(cfg.catalog, None, None)  # hashes the target only if its files changed
+    model_key = cache.key("model", cfg.manipulator_name, cfg.target_name, cfg.inertia_setting,
+                          cfg.lod, cfg.logger.track_cam_name,
+                          hash_files([xml_dir / "manipulators"]),
+                          catalog.get(cfg.target_name)["content_hash"])
+    m, gt = cache.run("model", model_key, lambda: build_model(cfg, catalog))
+    d = MjData(m)
+    mj_resetDataKeyframe(m, d, get_element_id(m, "keyframe", cfg.reset_keyframe))
+    model_hash = hash_model(m)
+    timings["model"] = perf_counter() - start
     globalinertia = gt["globalinertia"]
 
     # Fill (potentially) missing fields of a logger configulation =================
@@ -59,28 +91,129 @@ if __name__ == "__main__":
     cfg.logger.dataset_dir = dataset_dir
 
     # Copy the ground truth mass distribution file to the dataset file ============
-    target_gt = Path.cwd() / "xml_models" / "targets" / dir / "ground_truth.csv"
+    target_gt = Path.cwd() / "xml_models" / "targets" / cfg.target_name / "ground_truth.csv"
     dataset_gt = dataset_dir / "ground_truth.csv"
     if dataset_gt.is_file():
         print("'ground_truth.csv' is not copied to the dataset dir since the file "
               "with the same name already existsd.")
     else:
         copy(target_gt, dataset_gt)
+    # The resolved config to replay the dataset under other render settings,
+    # see replay/__main__.py
+    OmegaConf.save(cfg, dataset_dir / "config.yaml")
 
     # Instantiate necessary classes ===============================================
     logger = autoinstantiate(cfg.logger, m, d)
-    planner = autoinstantiate(cfg.planner, m, d)
-    controller = autoinstantiate(cfg.controller, m, d)
-
-    result = simulate(m, d, logger, planner, controller)  # main process
+    noise = autoinstantiate(cfg.noise, m, d)
+    store = autoinstantiate(cfg.results, m, d)
+    selector = autoinstantiate(cfg.keyframes, m, d)
+    stream = autoinstantiate(cfg.stream, m, d)
+
+    # Run the physics =============================================================
+    physics_key = cache.key("simulate", model_hash, cfg.reset_keyframe, cfg.planner,
+                            cfg.controller, cfg.pacer, cfg.logger.fps, cfg.stream.enabled,
+                            cfg.inverse_dynamics, cfg.kinematic)
+
+    def run_physics():
+        planner = autoinstantiate(cfg.planner, m, d)
+        if cfg.kinematic.enabled:
+            # The ideal wrench along the planned motion, neither stepped nor controlled
+            return simulate_kinematic(m, d, logger, planner, gt, stream=stream)
+        controller = autoinstantiate(cfg.controller, m, d)
+        pacer = autoinstantiate(cfg.pacer, m, d)
+        # Checkpoints of the episode are resumed after a crash if enabled
+        checkpointer = autoinstantiate(cfg.checkpoint, m, d, physics_key)
+        telemetry = autoinstantiate(cfg.telemetry, m, d)  # live plots, not affecting the outputs
+        inverse_dynamics = autoinstantiate(cfg.inverse_dynamics, m, d)  # of the forwarded d
+        return simulate(m, d, logger, planner, controller, pacer, checkpointer,
+                        stream=stream, telemetry=telemetry,
+                        inverse_dynamics=inverse_dynamics)  # main process
+
+    start = perf_counter()
+    physics = cache.run("simulate", physics_key, run_physics)
+    timings["simulate"] = perf_counter() - start
+
+    # Report whether the control loop can sustain the control period
+    timing = physics["timing"]
+    if timing is not None:  # None if kinematic
+        print(f"Deadline misses: {timing['deadline_misses']} / {timing['n_steps']} steps "
+              f"(period: {1e3 * timing['period']:.3f} [ms], "
+              f"worst compute latency: {1e3 * timing['compute_latency']['max']:.3f} [ms])")
+        with open(dataset_dir / "timing.json", "w") as f:
+            json.dump(timing, f, indent=2)
+
+    # Render the frames by replaying the recorded states ==========================
+    start = perf_counter()
+    render_key = cache.key("render", physics_key, cfg.logger.track_cam_name, cfg.logger.fig_height,
+                           cfg.logger.fig_width, cfg.logger.videoname, cfg.logger.videcodec,
+                           cfg.logger.frame_bus and cfg.logger.bus_video_policy,
+                           cfg.logger.extra_cam_names, cfg.logger.n_orbit_cams, cfg.logger.orbit_site,
+                           cfg.logger.orbit_distance, cfg.logger.orbit_elevation,
+                           cfg.logger.mask, cfg.logger.mask_body, cfg.logger.mask_storage,
+                           cfg.logger.depth, cfg.logger.depth_unit, cfg.keyframes)
+
+    def run_render():
+        # Spend the render budget on the most useful frames if any
+        indices = select_keyframes(m, d, logger, selector, physics)
+        return render(m, d, logger, physics["states"], indices)
+
+    rendered = cache.run(
+        "render", render_key, run_render,
+        files=lambda r: [logger.complete_image_dir / f for fs in r["file_names"] for f in fs]
+                        + [logger.complete_image_dir / a["depth_file_name"]
+                           for annotations in r["annotations"] for a in annotations
+                           if "depth_file_name" in a]
+                        + [logger.video_path],
+        files_dir=dataset_dir)
+    timings["render"] = perf_counter() - start
+    np.savez(dataset_dir / "states.npz", states=physics["states"], indices=rendered["indices"])
+
+    # Perturb the wrench and identify the inertial params =========================
+    # Make K noisy realizations from the clean measurements. The first one is
+    # written into the frames and all of them are passed to the identification
+    # from every logged frame
+    fts_sen = noise.realize(physics["fts_sen_clean"])
+    frames = compose_frames(logger, physics, rendered, fts_sen[0])
+    indices, n_logged = rendered["indices"], len(physics["time"])
 
     # Show inertial params identified with the least squares method
     gt_total_mass = gt["mass"]
     gt_f_moms = gt_total_mass * gt["com"]  # type: ignore
     gt_moms_i = gt["globalinertia"]
-    scorer = Scorer(gt_total_mass, gt_f_moms, gt_moms_i)
-
-    # Log the identified inertial params and their ground truth
-    #logger.transform["globalinertia"] = comparison.to_json()
-    logger.finish(result["frames"], result["regressors"], scorer)  # video and dataset json generated
-
+    scorer = Scorer(gt_total_mass, gt_f_moms, gt_moms_i, cfg.logger.aabb_scale)
+
+    def identify():
+        # Log the identified inertial params and their ground truth
+        #logger.transform["globalinertia"] = comparison.to_json()
+        # From every logged frame whether rendered or not, the images being of the frames only
+        regressors, fts_sen_id, groups = physics["regressors"], fts_sen, None
+        if cfg.stream.enabled:
+            # From the wrench of every step, noisy at the physics rate and decimated
+            regressors, fts_sen_id, groups = stream.get_identification_data(physics, noise)
+        summaries = logger.finish(frames, regressors, scorer, fts_sen_id, groups,
+                                  indices, n_logged)  # video and dataset json generated
+        # Keep the clean wrench and the seeds to regenerate any noise realization
+        noise.save(dataset_dir / "noise.npz", physics["fts_sen_clean"],
+                   stream=physics["stream"]["fts_sen"] if cfg.stream.enabled else None)
+        return summaries
+
+    start = perf_counter()
+    identify_key = cache.key("identify", model_key, render_key, cfg.noise, cfg.stream,
+                             cfg.logger.aabb_scale, cfg.logger.n_folds, cfg.logger.n_bootstraps,
+                             cfg.logger.confidence, dataset_dir)
+    summaries = cache.run(
+        "identify", identify_key, identify,
+        files=lambda s: [Path(v["path"]) for v in s.values()] + [dataset_dir / "noise.npz"],
+        files_dir=dataset_dir)
+    if cache.hits["identify"]:
+        logger.restore(frames, indices, n_logged)  # split images
+    timings["identify"] = perf_counter() - start
+
+    print("Cached stages: " + (", ".join(s for s, hit in cache.hits.items() if hit) or "none"))
+
+    # Index the run to rank and compare it with the others, see results/__main__.py
+    run_id = store.register(cfg, summaries, timings)
+    print(f"Registered as run {run_id} in '{store.path}' "
+          f"(score: {summaries['full']['lstsq'][-1]:.6g})")
+
+    plot_simulation(physics, fts_sen[0])
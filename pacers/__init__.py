@@ -0,0 +1 @@
+from .realtime_pacer import *
@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field
+from time import perf_counter, sleep
+
+import numpy as np
+from mujoco._structs import MjData, MjModel, MjOption
+from numpy.typing import NDArray
+
+
+@dataclass
+class RealtimePacerConfig:
+    target_class: str = "RealtimePacer"
+    enabled: bool = False  # pace each step to the wall clock, otherwise just measure
+    period: float = -1  # [s], control period. MjOption().timestep if non-positive
+    spin: float = 5e-4  # [s], busy-wait the end of a period for an accurate wake-up
+    hist_bins: int = 50  # number of bins of the latency and jitter histograms
+    # Stages that run on the controller at deployment. The others (e.g., logging
+    # and mj_step emulating the plant) are measured but not charged to a deadline
+    deadline_stages: list[str] = field(default_factory=lambda: ["plan", "inverse", "control"])
+
+
+class RealtimePacer:
+    def __init__(self,
+                 cfg: RealtimePacerConfig,
+                 m: MjModel,
+                 d: MjData,
+                 ) -> None:
+        self.enabled = cfg.enabled
+        self.period = MjOption().timestep if cfg.period <= 0 else cfg.period
+        self.spin = cfg.spin
+        self.hist_bins = cfg.hist_bins
+        self.deadline_stages = list(cfg.deadline_stages)
+
+    def start(self,
+              n_steps: int,
+              stages: list[str],
+              ) -> None:
+        """Allocate the latency storage and anchor the schedule to the wall clock."""
+
+        self.stages = list(stages)
+        self._stage_ids = {stage: i for i, stage in enumerate(self.stages)}
+        self._latencies = np.zeros((n_steps, len(self.stages)))  # [s]
+        self._lateness = np.zeros(n_steps)  # [s], wake-up w.r.t. the end of a period
+        self._step = 0
+        self._origin = perf_counter()
+        self._mark = self._origin
+        self._deadline = self._origin + self.period
+
+    def tick(self) -> None:
+        """Mark the start of a step."""
+
+        self._mark = perf_counter()
+
+    def lap(self, stage: str) -> None:
+        """Charge the time elapsed since the previous mark to a stage."""
+
+        now = perf_counter()
+        self._latencies[self._step, self._stage_ids[stage]] += now - self._mark
+        self._mark = now
+
+    def wait(self) -> None:
+        """Close the step and sleep until the next period starts if pacing."""
+
+        step = self._step
+        self._step += 1
+
+        if not self.enabled:
+            return
+
+        remaining = self._deadline - perf_counter()
+        if self.spin < remaining:
+            sleep(remaining - self.spin)
+        while perf_counter() < self._deadline:
+            pass
+
+        wake = perf_counter()
+        self._lateness[step] = wake - self._deadline
+        # Re-anchor the schedule after an overrun instead of bursting to catch up
+        self._deadline = max(self._deadline, wake) + self.period
+
+    def _histogram(self, values: NDArray) -> dict[str, list[float]]:
+        if 0 == len(values):
+            return dict(counts=[], bin_edges=[])
+        counts, edges = np.histogram(values, bins=self.hist_bins)
+        return dict(counts=counts.tolist(), bin_edges=edges.tolist())
+
+    def _statistics(self, values: NDArray) -> dict[str, float]:
+        if 0 == len(values):  # e.g., resumed from the checkpoint of the last step
+            return dict(mean=np.nan, p50=np.nan, p99=np.nan, max=np.nan)
+        return dict(mean=float(values.mean()),
+                    p50=float(np.percentile(values, 50)),
+                    p99=float(np.percentile(values, 99)),
+                    max=float(values.max()),
+                    )
+
+    def summary(self) -> dict:
+        """Summarize the latency of the steps recorded so far in seconds.
+
+        A deadline is missed when the compute latency of the deadline stages in a
+        step exceeds the control period. Jitter is the lateness of each wake-up
+        w.r.t. the end of its period, including overruns, and is only reported
+        while pacing. The statistics are NaN if no step is recorded.
+        """
+
+        latencies = self._latencies[:self._step]
+        deadline_ids = [self._stage_ids[s] for s in self.deadline_stages if s in self._stage_ids]
+        compute = latencies[:, deadline_ids].sum(axis=1)
+        misses = self.period < compute
+        jitter = self._lateness[:self._step]
+
+        return dict(
+            paced=self.enabled,
+            period=self.period,
+            n_steps=self._step,
+            wall_time=perf_counter() - self._origin,
+            deadline_stages=self.deadline_stages,
+            deadline_misses=int(misses.sum()),
+            miss_rate=float(misses.mean()) if self._step else np.nan,
+            missed_steps=np.flatnonzero(misses).tolist(),
+            compute_latency=dict(**self._statistics(compute), histogram=self._histogram(compute)),
+            stage_latency={s: self._statistics(latencies[:, i]) for i, s in enumerate(self.stages)},
+            jitter=dict(**self._statistics(jitter), std=float(jitter.std()) if self._step else np.nan,
+                        histogram=self._histogram(jitter)) if self.enabled else None,
+        )
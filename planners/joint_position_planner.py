@@ -116,16 +116,42 @@ def traj_5th_spline(displacement: ArrayLike,
     displacement = np.array(displacement)
     pos_offset = np.array(pos_offset)
 
-    def plan(step: int):
-        fifth = np.array([step**i for i in range(5, -1, -1)])
-        fourth = np.array([step**i * (i + 1) for i in range(4, -1, -1)])
-        third = np.array([
-            step**i * (i + 1) * (i + 2)for i in range(3, -1, -1)])
-
-        pos = displacement * np.dot(coeffs[:], fifth) + pos_offset
-        vel = displacement * np.dot(coeffs[:-1], fourth) / timestep
-        acc = displacement * np.dot(coeffs[:-2], third) / timestep**2
-
-        return np.array([pos, vel, acc])
+    # Coefficients of the powers of step (5, ..., 0) giving the normalized pos,
+    # vel and acc, and the offsets of the pos, vel and acc
+    derivative_matrix = np.zeros((3, 6))
+    derivative_matrix[0] = coeffs
+    derivative_matrix[1, 1:] = coeffs[:-1] * np.arange(5, 0, -1) / timestep
+    derivative_matrix[2, 2:] = coeffs[:-2] * np.arange(5, 1, -1) * np.arange(4, 0, -1) \
+                             / timestep**2
+    displacement = displacement.reshape(1, -1)
+    offsets = np.zeros((3, displacement.shape[1]))
+    offsets[0] = pos_offset
+
+    # Buffers of the calls, which allocate nothing if out is given
+    powers = np.ones(6)
+    normd_traj = np.empty((3, 1))
+    normd_traj_flat = normd_traj.reshape(3)  # view
+
+    def plan(step: Union[int, NDArray], out: NDArray = None) -> NDArray:
+        """Target (pos, vel, acc) at step, written into out of (3, n) if given.
+
+        The targets of an array of steps (n_steps, 3, n) are got at once.
+        """
+
+        if isinstance(step, np.ndarray):
+            powers_steps = np.power.outer(step.astype(float), np.arange(5, -1, -1))
+            normd_trajs = powers_steps @ derivative_matrix.T
+            return normd_trajs[..., np.newaxis] * displacement + offsets
+
+        if out is None:
+            out = np.empty(offsets.shape)
+
+        s = float(step)
+        powers[0], powers[1], powers[2], powers[3], powers[4] = s**5, s**4, s**3, s * s, s
+        np.dot(derivative_matrix, powers, out=normd_traj_flat)
+        np.dot(normd_traj, displacement, out=out)  # outer product
+        np.add(out, offsets, out=out)
+
+        return out
 
     return plan
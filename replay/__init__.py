@@ -0,0 +1 @@
+from .dataset_replay import *
@@ -0,0 +1,12 @@
+import tyro
+
+from .dataset_replay import ReplayConfig, replay
+
+
+# Usage (from the repository root):
+#     python -m replay --dataset-dir ./datasets/hammer \
+#         --overrides logger.fig_width=1280 logger.fig_height=720 logger.dataset_dir=./datasets/hammer_hd
+#     python -m replay --dataset-dir ./datasets/hammer --headlight-ambient .3 .3 .3 --n-workers 4
+if __name__ == "__main__":
+    cfg = tyro.cli(ReplayConfig)
+    print(f"Re-rendered into '{replay(cfg)}'")
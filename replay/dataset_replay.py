@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+
+import cv2
+import numpy as np
+from mujoco._structs import MjData, MjModel
+from omegaconf import OmegaConf
+from omegaconf.dictconfig import DictConfig
+
+from core import autoinstantiate, compose_frames, generate_model_data, render
+
+
+# Settings which change the images only, the physics and the identification
+# being carried over from the dataset. Other logger settings, e.g., fps, would
+# not match the recorded states
+RENDER_KEYS = ["logger.track_cam_name", "logger.extra_cam_names", "logger.n_orbit_cams",
+               "logger.orbit_site", "logger.orbit_distance", "logger.orbit_elevation",
+               "logger.fig_height", "logger.fig_width", "logger.mask", "logger.mask_body",
+               "logger.mask_storage", "logger.depth", "logger.depth_unit", "logger.videoname",
+               "logger.videcodec", "logger.dataset_dir", "lod.dataset", "lod.preview", "lod.render"]
+# Outputs of main.py other than the images and the transforms
+CARRIED_FILES = ["ground_truth.csv", "noise.npz", "timing.json", "states.npz"]
+
+
+@dataclass
+class ReplayConfig:
+    dataset_dir: str  # written by main.py
+    # Render settings overriding those of the dataset's config.yaml, e.g.,
+    # logger.fig_width=1280. The dataset is re-rendered in place unless
+    # logger.dataset_dir is given
+    overrides: list[str] = field(default_factory=list)
+    headlight_ambient: list[float] = field(default_factory=list)  # of the model's if empty
+    headlight_diffuse: list[float] = field(default_factory=list)
+    n_workers: int = 0  # processes rendering the frames, the number of CPUs if non-positive
+
+
+def load_replay_config(cfg: ReplayConfig) -> DictConfig:
+    """Config of the dataset's run with the render settings overridden"""
+
+    overrides = OmegaConf.from_dotlist(cfg.overrides)
+    for key in cfg.overrides:
+        key = key.split("=", 1)[0]
+        if key not in RENDER_KEYS:
+            raise ValueError(f"'{key}' is not a render setting, i.e., of {RENDER_KEYS}. "
+                             "Rerun main.py to change the physics or the identification.")
+
+    run_cfg = OmegaConf.load(Path(cfg.dataset_dir) / "config.yaml")
+    return OmegaConf.merge(run_cfg, overrides)
+
+
+def _render_frames(m: MjModel,
+                   run_cfg: DictConfig,
+                   states: np.ndarray,
+                   indices: np.ndarray,
+                   ) -> dict:
+    """Render some of the frames, leaving the video to the caller"""
+
+    d = MjData(m)
+    logger = autoinstantiate(run_cfg.logger, m, d)
+    logger.use_frame_bus = False
+    logger.video_path = None  # written in the order of the frames afterwards
+    return render(m, d, logger, states, indices)
+
+
+def write_video(logger, file_names: list[list[str]]) -> None:
+    """Encode the video of the tracking camera from its images"""
+
+    videowriter = cv2.VideoWriter(str(logger.video_path),
+                                  cv2.VideoWriter_fourcc(*logger.videcodec),
+                                  logger.fps,
+                                  (logger.fig_width, logger.fig_height),
+                                  )
+    for fnames in file_names:
+        videowriter.write(cv2.imread(str(logger.complete_image_dir / fnames[0]), cv2.IMREAD_COLOR))
+    videowriter.release()
+
+
+def replay(cfg: ReplayConfig) -> Path:
+    """Re-render a dataset from its recorded states under new render settings.
+
+    The states of the rendered frames are restored into MjData and forwarded
+    by render(), split into contiguous chunks rendered by worker processes. The
+    frames keep their FT data, and the transforms of every split keep the
+    identification of the dataset, their images, camera poses and intrinsics
+    being replaced.
+
+    Returns the directory of the re-rendered dataset.
+    """
+
+    src_dir = Path(cfg.dataset_dir)
+    run_cfg = load_replay_config(cfg)
+    if not any(override.startswith("logger.dataset_dir=") for override in cfg.overrides):
+        run_cfg.logger.dataset_dir = str(src_dir)  # in place, even if moved since
+    dst_dir = Path(run_cfg.logger.dataset_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+
+    m, d, _ = generate_model_data(run_cfg)
+    if cfg.headlight_ambient:
+        m.vis.headlight.ambient[:] = cfg.headlight_ambient
+    if cfg.headlight_diffuse:
+        m.vis.headlight.diffuse[:] = cfg.headlight_diffuse
+
+    recorded = np.load(src_dir / "states.npz")
+    states, indices = recorded["states"], recorded["indices"]
+    with open(src_dir / "transform.json") as f:
+        transform = json.load(f)
+
+    # Render the frames in parallel ===============================================
+    n_workers = min(cfg.n_workers if 0 < cfg.n_workers else os.cpu_count(), len(indices))
+    chunks = [chunk for chunk in np.array_split(indices, max(n_workers, 1)) if len(chunk)]
+    if len(chunks) <= 1:
+        parts = [_render_frames(m, run_cfg, states, indices)]
+    else:
+        # Spawned so that each worker makes its own rendering context
+        with ProcessPoolExecutor(len(chunks), mp_context=get_context("spawn")) as executor:
+            parts = list(executor.map(_render_frames, [m] * len(chunks),
+                                      [run_cfg] * len(chunks), [states] * len(chunks), chunks))
+    rendered = {key: [v for part in parts for v in part[key]]
+                for key in ["file_names", "transform_matrices", "annotations"]}
+    rendered["indices"] = indices
+
+    logger = autoinstantiate(run_cfg.logger, m, d)
+    write_video(logger, rendered["file_names"])
+
+    # Carry over the FT data of the frames and the identification =================
+    records = {}
+    for key, frame_key in [("poses_sen_obj", "pose_sen_obj"), ("twists_sen", "twist_sen"),
+                           ("dtwists_sen", "dtwist_sen"), ("fts_sen", "ft_sen")]:
+        values = np.array([frame[frame_key] for frame in transform["frames"]])
+        records[key] = np.zeros((len(states), *values.shape[1:]))
+        records[key][indices] = values
+    frames = compose_frames(logger, records, rendered, records["fts_sen"])
+
+    splits = [("", frames), *[(split, split_frames) for split, split_frames, _
+                              in logger.split_frames(frames, indices, len(states))]]
+    for split, split_frames in splits:
+        suffix = f"_{split}" if split else ""
+        with open(src_dir / f"transform{suffix}.json") as f:
+            split_transform = json.load(f)
+
+        if split:
+            logger._copy_images(split_frames, split)
+        split_transform.update(logger.base_transform, frames=split_frames)
+        if not logger.depth:
+            split_transform.pop("depth_unit", None)
+        with open(dst_dir / f"transform{suffix}.json", "w") as f:
+            json.dump(split_transform, f, indent=2)
+
+    if src_dir.resolve() != dst_dir.resolve():
+        for name in CARRIED_FILES:
+            if (src_dir / name).is_file():
+                shutil.copy(src_dir / name, dst_dir / name)
+    OmegaConf.save(run_cfg, dst_dir / "config.yaml")
+
+    return dst_dir
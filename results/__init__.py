@@ -0,0 +1 @@
+from .results_store import *
@@ -0,0 +1,39 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+import tyro
+
+from .results_store import ResultsStore, ResultsStoreConfig
+
+
+@dataclass
+class LeaderboardConfig:
+    store: ResultsStoreConfig = field(default_factory=ResultsStoreConfig)
+    target: Optional[str] = None  # every target if None
+    split: str = "full"
+    limit: int = 20
+
+
+@dataclass
+class DiffConfig:
+    run_a: int
+    run_b: int
+    store: ResultsStoreConfig = field(default_factory=ResultsStoreConfig)
+
+
+# Usage (from the repository root):
+#     python -m results leaderboard --target wooden-tray-2 --split test
+#     python -m results diff --run-a 1 --run-b 2
+if __name__ == "__main__":
+    cfg = tyro.extras.subcommand_cli_from_dict({"leaderboard": LeaderboardConfig,
+                                                "diff": DiffConfig})
+    store = ResultsStore(cfg.store)
+
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        if isinstance(cfg, LeaderboardConfig):
+            print(store.leaderboard(cfg.target, cfg.split, cfg.limit))
+        else:
+            for name, table in store.diff(cfg.run_a, cfg.run_b).items():
+                print(f"# {name} {'=' * (78 - len(name))}")
+                print(table, end="\n\n")
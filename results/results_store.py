@@ -0,0 +1,209 @@
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import pandas as pd
+from mujoco._structs import MjData, MjModel
+from omegaconf import OmegaConf
+from omegaconf.dictconfig import DictConfig
+
+from utilities import get_code_version
+
+
+@dataclass
+class ResultsStoreConfig:
+    target_class: str = "ResultsStore"
+    path: str = "./datasets/results.sqlite"
+
+
+# Fields varying per run without changing what is simulated and identified
+VOLATILE_KEYS = ["read_config", "write_config", "logger.dataset_dir"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    target TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    config TEXT NOT NULL,         -- resolved configuration as json
+    code_version TEXT NOT NULL,
+    score REAL,                   -- score of the whole dataset
+    labels TEXT NOT NULL,         -- names of the inertial params
+    estimate TEXT NOT NULL,       -- lstsq estimate of the whole dataset
+    ground_truth TEXT NOT NULL,
+    splits TEXT NOT NULL,         -- score, estimate and #frames of each split
+    timings TEXT NOT NULL,        -- wall-clock time of each pipeline stage [s]
+    dataset_dir TEXT NOT NULL,
+    paths TEXT NOT NULL           -- transform*.json of each split
+);
+CREATE INDEX IF NOT EXISTS runs_target ON runs (target);
+CREATE INDEX IF NOT EXISTS runs_config_hash ON runs (config_hash);
+"""
+
+
+def hash_config(config: dict[str, Any]) -> str:
+    config = json.loads(json.dumps(config))  # deep copy
+    for key in VOLATILE_KEYS:
+        *parents, leaf = key.split(".")
+        node = config
+        for parent in parents:
+            node = node.get(parent, {})
+        node.pop(leaf, None)
+
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def flatten(tree: dict[str, Any], prefix: str = "") -> dict[str, Any]:
+    flat = {}
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+
+    return flat
+
+
+class ResultsStore:
+    """Local SQLite index of runs to compare results without reading datasets"""
+
+    def __init__(self,
+                 cfg: ResultsStoreConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.path = Path(cfg.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with closing(self._connect()) as connection, connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Used as a context manager it only commits, so it is wrapped by closing()
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def register(self,
+                 cfg: DictConfig,
+                 summaries: dict[str, dict[str, Any]],
+                 timings: dict[str, float],
+                 ) -> int:
+        """Add a row of a finished run given the summaries returned by Logger.finish()"""
+
+        config = OmegaConf.to_container(cfg, resolve=True)
+        config = json.loads(json.dumps(config, default=str))  # e.g., Path to str
+        full = summaries["full"]
+        score_idx = full["labels"].index("score")
+        splits = {split: dict(score=s["lstsq"][score_idx],
+                              estimate=s["lstsq"][:score_idx - 1],
+                              n_frames=s["n_frames"],
+                              score_lower=s["uncertainty"]["bootstrap"]["score_lower"],
+                              score_upper=s["uncertainty"]["bootstrap"]["score_upper"],
+                              )
+                  for split, s in summaries.items()}
+
+        row = dict(created_at=datetime.now().isoformat(timespec="seconds"),
+                   target=cfg.target_name,
+                   config_hash=hash_config(config),
+                   config=json.dumps(config),
+                   code_version=get_code_version(),
+                   score=full["lstsq"][score_idx],
+                   labels=json.dumps(full["labels"][:score_idx - 1]),
+                   estimate=json.dumps(full["lstsq"][:score_idx - 1]),
+                   ground_truth=json.dumps(full["global_gt"][:score_idx - 1]),
+                   splits=json.dumps(splits),
+                   timings=json.dumps(timings),
+                   dataset_dir=str(cfg.logger.dataset_dir),
+                   paths=json.dumps({split: s["path"] for split, s in summaries.items()}),
+                   )
+
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                list(row.values()))
+
+        return cursor.lastrowid
+
+    def get(self, run_id: int) -> dict[str, Any]:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+
+        if row is None:
+            raise ValueError(f"Run {run_id} is not found in '{self.path}'.")
+
+        run = dict(row)
+        for key in ["config", "labels", "estimate", "ground_truth", "splits", "timings", "paths"]:
+            run[key] = json.loads(run[key])
+
+        return run
+
+    def leaderboard(self,
+                    target: Optional[str] = None,
+                    split: str = "full",
+                    limit: int = 20,
+                    ) -> pd.DataFrame:
+        """Rank runs by the score of a split, lower is better"""
+
+        query = "SELECT run_id, created_at, target, config_hash, code_version, splits, timings FROM runs"
+        params: list[Union[str, int]] = []
+        if target is not None:
+            query += " WHERE target = ?"
+            params.append(target)
+
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(query, params).fetchall()
+
+        records = []
+        for row in rows:
+            splits = json.loads(row["splits"])
+            if split not in splits:
+                continue
+            records.append(dict(run_id=row["run_id"],
+                                created_at=row["created_at"],
+                                target=row["target"],
+                                score=splits[split]["score"],
+                                score_lower=splits[split].get("score_lower"),
+                                score_upper=splits[split].get("score_upper"),
+                                n_frames=splits[split]["n_frames"],
+                                total_time=sum(json.loads(row["timings"]).values()),
+                                config_hash=row["config_hash"][:8],
+                                code_version=row["code_version"][:8],
+                                ))
+
+        columns = ["run_id", "created_at", "target", "score", "score_lower", "score_upper",
+                   "n_frames", "total_time", "config_hash", "code_version"]
+        board = pd.DataFrame.from_records(records, columns=columns)
+
+        return board.sort_values("score").head(limit).reset_index(drop=True)
+
+    def diff(self, run_a: int, run_b: int) -> dict[str, pd.DataFrame]:
+        """Differences of configs, estimates, split scores and timings of two runs"""
+
+        a, b = self.get(run_a), self.get(run_b)
+
+        config_a, config_b = flatten(a["config"]), flatten(b["config"])
+        keys = sorted(k for k in config_a.keys() | config_b.keys() if config_a.get(k) != config_b.get(k))
+        config = pd.DataFrame({run_a: [config_a.get(k) for k in keys],
+                               run_b: [config_b.get(k) for k in keys]}, index=keys)
+
+        estimate = pd.DataFrame({"ground_truth": a["ground_truth"],
+                                 run_a: a["estimate"],
+                                 run_b: b["estimate"]}, index=a["labels"])
+        estimate["difference"] = estimate[run_b] - estimate[run_a]
+
+        splits = sorted(a["splits"].keys() | b["splits"].keys())
+        score = pd.DataFrame({run_a: [a["splits"].get(s, {}).get("score") for s in splits],
+                              run_b: [b["splits"].get(s, {}).get("score") for s in splits]},
+                             index=splits)
+
+        stages = sorted(a["timings"].keys() | b["timings"].keys())
+        timings = pd.DataFrame({run_a: [a["timings"].get(s) for s in stages],
+                                run_b: [b["timings"].get(s) for s in stages]}, index=stages)
+
+        return dict(config=config, estimate=estimate, score=score, timings=timings)
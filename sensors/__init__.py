@@ -1 +1,3 @@
 from .sensors import *
+from .noise_models import *
+from .ft_stream import *
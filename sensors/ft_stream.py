@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from mujoco._structs import MjData, MjModel
+from numpy.typing import NDArray
+
+from dynamics import get_regressor_matrices
+from loggers import TrajectoryRecorder
+from .noise_models import WrenchNoise
+
+
+@dataclass
+class FTStreamConfig:
+    target_class: str = "FTStream"
+    # Identify from the wrench of every physics step instead of the rendered
+    # frames only, the images staying at logger.fps
+    enabled: bool = False
+    decimation: int = 10  # ratio of the physics rate to the rate of identification
+    half_width: int = 8  # taps of the anti-aliasing filter on each side, per decimation
+
+
+def get_lowpass_taps(decimation: int, half_width: int) -> NDArray:
+    """Blackman-windowed sinc FIR cutting off at the Nyquist rate after decimation"""
+
+    if decimation <= 1:
+        return np.ones(1)
+
+    n = np.arange(-half_width * decimation, half_width * decimation + 1)
+    taps = np.sinc(n / decimation) * np.blackman(len(n))
+    return taps / taps.sum()  # unit DC gain
+
+
+def decimate(signal: NDArray,
+             taps: NDArray,  # odd and symmetric, i.e., of zero phase when centered
+             decimation: int,
+             axis: int = 0,
+             ) -> NDArray:
+    """Low-pass filter a signal along an axis and keep every decimation-th sample.
+
+    Only the kept samples are filtered, each tap weighting a strided slice of
+    the whole signal at once, and the ends are padded with the edge values.
+    """
+
+    signal = np.moveaxis(np.asarray(signal, dtype=float), axis, 0)
+    n_samples = len(signal)
+    n_out = (n_samples - 1) // decimation + 1
+    half = len(taps) // 2
+    padded = np.concatenate([np.repeat(signal[:1], half, axis=0), signal,
+                             np.repeat(signal[-1:], half, axis=0)])
+
+    filtered = np.zeros((n_out, *signal.shape[1:]))
+    stop = decimation * (n_out - 1) + 1
+    for j, tap in enumerate(taps):
+        filtered += tap * padded[j:j + stop:decimation]
+
+    return np.moveaxis(filtered, 0, axis)
+
+
+class FTStream:
+    """Wrench and twists of the FT sensor recorded at every physics step.
+
+    The noise is added at the physics rate as a sensor would, and the wrench and
+    the regressor are filtered by the same linear filter before decimation,
+    which keeps f = R θ since the regressor is linear in the wrench's params.
+    """
+
+    def __init__(self,
+                 cfg: FTStreamConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.enabled = cfg.enabled
+        self.decimation = max(cfg.decimation, 1)
+        self.taps = get_lowpass_taps(self.decimation, cfg.half_width)
+        self.recorder: Optional[TrajectoryRecorder] = None
+
+    def start(self, n_steps: int) -> None:
+        self.recorder = TrajectoryRecorder(n_steps)
+        self.recorder.add("time")
+        self.recorder.add("fts_sen", (6, ))
+        self.recorder.add("twists_sen", (6, ))
+        self.recorder.add("dtwists_sen", (6, ))
+
+    def record(self,
+               time: float,
+               force: NDArray,
+               torque: NDArray,
+               twist_sen: NDArray,
+               dtwist_sen: NDArray,
+               ) -> None:
+        row = self.recorder.next_row()
+        self.recorder["time"][row] = time
+        self.recorder["fts_sen"][row, :3] = force
+        self.recorder["fts_sen"][row, 3:] = torque
+        self.recorder["twists_sen"][row] = twist_sen
+        self.recorder["dtwists_sen"][row] = dtwist_sen
+
+    def get_identification_data(self,
+                                physics: dict,  # returned by simulate()
+                                noise: WrenchNoise,
+                                ) -> tuple[NDArray, NDArray, NDArray]:
+        """Decimated regressors (n, 6, 10), K noisy wrenches (K, n, 6) and the
+        logged frame each sample belongs to (n,).
+
+        A sample belongs to the latest frame recorded at or before it, whether
+        the frame is rendered or not, and the samples before the first frame
+        are dropped.
+        """
+
+        records = physics["stream"]
+        regressors = get_regressor_matrices(records["twists_sen"], records["dtwists_sen"])
+        regressors = decimate(regressors, self.taps, self.decimation)
+        # The noise rates are per logged frame, of steps_per_frame physics steps
+        steps_per_frame = (np.diff(physics["time"]).mean() / np.diff(records["time"]).mean()
+                           if 1 < len(physics["time"]) else 1.0)
+        fts_sen = noise.realize(records["fts_sen"], steps_per_frame=steps_per_frame)
+        fts_sen = decimate(fts_sen, self.taps, self.decimation, axis=1)
+        time = records["time"][::self.decimation]
+
+        groups = np.searchsorted(physics["time"], time, side="right") - 1
+        keep = 0 <= groups
+
+        return regressors[keep], fts_sen[:, keep], groups[keep]
@@ -0,0 +1,150 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+from mujoco._structs import MjData, MjModel
+from numpy import linalg as nla
+from numpy.typing import NDArray
+from omegaconf import OmegaConf
+
+
+@dataclass
+class WrenchNoiseConfig:
+    target_class: str = "WrenchNoise"
+    n_realizations: int = 1  # K, number of noisy copies made from a clean wrench
+    seed: int = 0  # seed of the first realization, the k-th one uses seed + k
+    models: list[str] = field(default_factory=lambda: ["GaussianNoise"])  # applied in order
+    # Scales multiplied to the std of the stochastic models for each axis
+    axis_scales: list[float] = field(default_factory=lambda: [1.0] * 6)
+    # Std of each model relative to the peak norm of the clean force or torque,
+    # per logged frame whatever the sample rate, see WrenchNoise.realize()
+    error_rate: float = 0.05  # GaussianNoise, white noise
+    bias_rate: float = 0.0  # BiasDrift, constant offset
+    drift_rate: float = 0.0  # BiasDrift, random-walk increment per frame
+    # Resolutions of the sensor [N], [N*m]. Quantization is skipped if non-positive
+    force_resolution: float = 0.0
+    torque_resolution: float = 0.0
+
+
+class GaussianNoise:
+    def __init__(self, cfg: WrenchNoiseConfig) -> None:
+        self.error_rate = cfg.error_rate
+
+    def __call__(self, wrench, stds, rng, steps_per_frame=1.0):
+        noise = np.empty_like(wrench)
+        # Draw force noise first and torque noise second for reproducibility
+        noise[:, :3] = rng.standard_normal((len(wrench), 3))
+        noise[:, 3:] = rng.standard_normal((len(wrench), 3))
+        # Of the same density, i.e., the same std once averaged over a frame
+        error_rate = self.error_rate * np.sqrt(steps_per_frame)
+
+        return wrench + error_rate * stds * noise
+
+
+class BiasDrift:
+    def __init__(self, cfg: WrenchNoiseConfig) -> None:
+        self.bias_rate = cfg.bias_rate
+        self.drift_rate = cfg.drift_rate
+
+    def __call__(self, wrench, stds, rng, steps_per_frame=1.0):
+        bias = self.bias_rate * stds * rng.standard_normal(6)
+        # Of the same std after a frame's worth of increments
+        drift_rate = self.drift_rate / np.sqrt(steps_per_frame)
+        drift = drift_rate * stds * rng.standard_normal(wrench.shape).cumsum(axis=0)
+
+        return wrench + bias + drift
+
+
+class Quantization:
+    def __init__(self, cfg: WrenchNoiseConfig) -> None:
+        self.resolution = np.repeat([cfg.force_resolution, cfg.torque_resolution], 3)
+
+    def __call__(self, wrench, stds, rng, steps_per_frame=1.0):
+        quantized = wrench.copy()
+        axes = 0 < self.resolution
+        quantized[:, axes] = self.resolution[axes] * np.round(wrench[:, axes] / self.resolution[axes])
+
+        return quantized
+
+
+NOISE_MODELS = {"GaussianNoise": GaussianNoise, "BiasDrift": BiasDrift, "Quantization": Quantization}
+
+
+class WrenchNoise:
+    """Make K noisy realizations of a clean wrench signal measured by the FT sensor.
+
+    Each realization is reproducible from its seed, so storing the clean signal
+    and the seeds is enough to regenerate any of them on demand.
+    """
+
+    def __init__(self,
+                 cfg: WrenchNoiseConfig,
+                 m: MjModel = None,
+                 d: MjData = None,
+                 ) -> None:
+        self.cfg = cfg
+        self.n_realizations = cfg.n_realizations
+        self.seeds = cfg.seed + np.arange(cfg.n_realizations)
+        self.axis_scales = np.array(cfg.axis_scales)
+        for name in cfg.models:
+            if name not in NOISE_MODELS:
+                raise ValueError(f"'models' have to be of {list(NOISE_MODELS)}. '{name}' is invalid.")
+        self.models = [NOISE_MODELS[name](cfg) for name in cfg.models]
+
+    def get_stds(self, clean: NDArray) -> NDArray:
+        """Get the base std of each axis, the peak norm of the force or the torque"""
+
+        peak_norms = nla.norm(clean.reshape(len(clean), 2, 3), axis=-1).max(axis=0)
+        return self.axis_scales * np.repeat(peak_norms, 3)
+
+    def realize(self,
+                clean: NDArray,
+                k: Union[int, list[int], None] = None,
+                steps_per_frame: float = 1.0,  # samples of the clean wrench per logged frame
+                ) -> NDArray:
+        """Regenerate the k-th realization (n_frames, 6) or a stack of them (K, n_frames, 6).
+
+        The rates are per logged frame. Sampled steps_per_frame times faster,
+        the white noise keeps its density and the drift its growth over time,
+        so that one config describes the same sensor at any sample rate.
+        """
+
+        clean = np.asarray(clean)
+        stds = self.get_stds(clean)
+
+        single = isinstance(k, (int, np.integer))
+        ks = range(self.n_realizations) if k is None else [k] if single else k
+
+        realizations = np.empty((len(ks), *clean.shape))
+        for i, _k in enumerate(ks):
+            rng = np.random.default_rng(self.seeds[_k])
+            wrench = clean
+            for model in self.models:
+                wrench = model(wrench, stds, rng, steps_per_frame)
+            realizations[i] = wrench
+
+        return realizations[0] if single else realizations
+
+    def save(self,
+             path: Union[str, Path],
+             clean: NDArray,
+             stream: Optional[NDArray] = None,  # clean wrench at the physics rate if recorded
+             ) -> None:
+        """Save the clean signal and the noise configuration instead of realizations"""
+
+        np.savez_compressed(path,
+                            clean=clean,
+                            **({} if stream is None else dict(stream=stream)),
+                            seeds=self.seeds,
+                            config=json.dumps(OmegaConf.to_container(OmegaConf.structured(self.cfg))),
+                            )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> tuple["WrenchNoise", NDArray]:
+        archive = np.load(path)
+        cfg = OmegaConf.merge(OmegaConf.structured(WrenchNoiseConfig),
+                              json.loads(str(archive["config"])))
+
+        return cls(cfg), archive["clean"]
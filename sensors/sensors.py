@@ -12,13 +12,17 @@ class Sensors:
                  ) -> None:
         self.m = m
         self._sensordata = d.sensordata
+        self._slices = {}
 
     def get(self,
             key,
             ):
+        """View of the measurement in d.sensordata, which follows mj_step"""
 
-        idx = get_sensor_measurement_idx(self.m, key)
-        return self._sensordata[idx]
+        if key not in self._slices:
+            idx = get_sensor_measurement_idx(self.m, key)
+            self._slices[key] = slice(idx[0], idx[-1] + 1)  # contiguous
+        return self._sensordata[self._slices[key]]
 
 
 def get_sensor_measurement_idx(m: MjModel,
@@ -0,0 +1,49 @@
+import tracemalloc
+
+import numpy as np
+
+from core import autoinstantiate, generate_model_data, simulate
+from pacers import RealtimePacer, RealtimePacerConfig
+
+
+# [B], traced at most in a step without a frame, of which mj_differentiatePos()
+# and the measurement itself take about 250. A regression, e.g., an np.stack()
+# of the trajectory, makes it several hundred more
+STEP_BUDGET = 512
+
+
+class AllocationPacer(RealtimePacer):
+    """Measure the peak of the memory traced in each step above its start"""
+
+    def start(self, n_steps, stages):
+        super().start(n_steps, stages)
+        self.peaks = []
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._current = tracemalloc.get_traced_memory()[0]
+
+    def tick(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.peaks.append(peak - self._current)
+        tracemalloc.reset_peak()
+        self._current = tracemalloc.get_traced_memory()[0]
+        super().tick()
+
+
+def test_simulate_allocations(make_config, frame_logger):
+    cfg = make_config("wooden-tray-2", 0.2)
+    cfg.inverse_dynamics.target_class = "NativeInverseDynamics"  # the RNEA allocates
+    m, d, _ = generate_model_data(cfg)
+    planner = autoinstantiate(cfg.planner, m, d)
+    controller = autoinstantiate(cfg.controller, m, d)
+    pacer = AllocationPacer(RealtimePacerConfig(), m, d)
+
+    frame_logger.fps = 1e-3  # a frame at the first step only
+    try:
+        simulate(m, d, frame_logger, planner, controller, pacer,
+                 inverse_dynamics=autoinstantiate(cfg.inverse_dynamics, m, d))
+    finally:
+        tracemalloc.stop()
+
+    peaks = np.array(pacer.peaks[10:])  # in the steady state
+    assert len(peaks) and peaks.max() <= STEP_BUDGET
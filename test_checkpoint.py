@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from checkpoints import Checkpointer, CheckpointerConfig
+from core import autoinstantiate, fork, generate_model_data, get_element_id, simulate
+from loggers import Telemetry, TelemetryConfig
+from pacers import RealtimePacer, RealtimePacerConfig
+
+
+class InterruptingPacer(RealtimePacer):
+    """Interrupt the episode at a step as a crash would"""
+
+    interrupt_step = 60
+
+    def tick(self):
+        if self.interrupt_step == self._step:
+            raise KeyboardInterrupt
+        super().tick()
+
+
+def run(cfg, logger, pacer=None, checkpointer=None, telemetry=None):
+    m, d, _ = generate_model_data(cfg)
+    return simulate(m, d, logger, autoinstantiate(cfg.planner, m, d),
+                    autoinstantiate(cfg.controller, m, d), pacer, checkpointer, telemetry=telemetry)
+
+
+@pytest.mark.parametrize("keep_finished", [False, True])
+def test_resume(tmp_path, make_config, frame_logger, keep_finished):
+    cfg = make_config("hammer", 0.2)  # 100 steps
+    checkpoint_cfg = CheckpointerConfig(interval=25, checkpoint_dir=str(tmp_path / "checkpoints"),
+                                        keep_finished=keep_finished)
+
+    expected = run(cfg, frame_logger)
+
+    with pytest.raises(KeyboardInterrupt):
+        run(cfg, frame_logger, InterruptingPacer(RealtimePacerConfig(), None, None), Checkpointer(checkpoint_cfg))
+    checkpointer = Checkpointer(checkpoint_cfg)
+    assert "step_0000049.pkl" == checkpointer.latest().name
+
+    # Resumed after the step 49, bit-identical to the uninterrupted episode
+    physics = run(cfg, frame_logger, checkpointer=checkpointer)
+    assert 50 == physics["timing"]["n_steps"]
+    for key in ["states", "time", "trajectory", "regressors", "fts_sen_clean", "twists_sen"]:
+        assert np.array_equal(expected[key], physics[key])
+
+    # A rerun of the finished episode starts over
+    assert keep_finished == checkpointer.episode_dir.is_dir()
+    physics = run(cfg, frame_logger, checkpointer=checkpointer)
+    assert 100 == physics["timing"]["n_steps"]
+    assert np.array_equal(expected["states"], physics["states"])
+
+
+def test_fork(tmp_path, make_config, frame_logger):
+    cfg = make_config("hammer", 0.2)
+    checkpoint_cfg = CheckpointerConfig(interval=25, checkpoint_dir=str(tmp_path / "checkpoints"))
+
+    expected = run(cfg, frame_logger)
+    with pytest.raises(KeyboardInterrupt):
+        run(cfg, frame_logger, InterruptingPacer(RealtimePacerConfig(), None, None), Checkpointer(checkpoint_cfg))
+    checkpoint = Checkpointer.load(Checkpointer(checkpoint_cfg).latest())
+
+    def heavier(m):
+        m.body_mass[get_element_id(m, "body", "target/object")] *= 2
+
+    m, d, _ = generate_model_data(cfg)
+    identity, variant = fork(m, frame_logger, autoinstantiate(cfg.planner, m, d),
+                             autoinstantiate(cfg.controller, m, d), checkpoint, [lambda m: None, heavier])
+
+    # The identity perturbation reproduces the episode bit for bit
+    for key in ["states", "time", "trajectory", "regressors", "fts_sen_clean", "twists_sen"]:
+        assert np.array_equal(expected[key], identity[key])
+
+    # A variant shares the frames recorded up to the step 49 only
+    n_shared = len(checkpoint["records"]["states"])
+    assert 5 == n_shared
+    assert np.array_equal(expected["fts_sen_clean"][:n_shared], variant["fts_sen_clean"][:n_shared])
+    assert not np.allclose(expected["fts_sen_clean"][n_shared:], variant["fts_sen_clean"][n_shared:])
+
+
+def test_interrupted_telemetry(tmp_path, make_config, frame_logger):
+    telemetry = Telemetry(TelemetryConfig(enabled=True, interval=5, rate=50.0,
+                                          image_path=str(tmp_path / "telemetry.png")))
+
+    with pytest.raises(KeyboardInterrupt):
+        run(make_config("hammer", 0.2), frame_logger, InterruptingPacer(RealtimePacerConfig(), None, None),
+            telemetry=telemetry)
+
+    # The monitor is stopped and the shared memory released
+    assert telemetry.process is None and not telemetry._segments
@@ -0,0 +1,75 @@
+from time import sleep
+
+import numpy as np
+import pytest
+
+from loggers.frame_bus import FrameBus
+
+
+class SlowConsumer:
+    """Take a while per frame and log its name and whether it was read whole"""
+
+    def __init__(self, path: str, delay: float = 0.02) -> None:
+        self.file = open(path, "w")
+        self.delay = delay
+
+    def __call__(self, bgra, name, channel):
+        sleep(self.delay)
+        intact = np.all(int(name) % 256 == bgra)  # not overwritten while read
+        self.file.write(f"{name} {int(intact)}\n")
+
+    def close(self):
+        self.file.close()
+
+
+def publish(bus, n_frames):
+    for i in range(n_frames):
+        slot = bus.acquire()
+        if slot is not None:
+            slot[:] = i % 256
+            bus.commit(str(i))
+    return bus.close()
+
+
+def read_log(path):
+    rows = [line.split() for line in path.read_text().splitlines()]
+    return [int(name) for name, _ in rows], all("1" == intact for _, intact in rows)
+
+
+def test_blocking_consumer(tmp_path):
+    # Backpressure: every frame reaches the lossless consumer, the producer waits
+    bus = FrameBus((4, 4, 4), [(SlowConsumer, dict(path=str(tmp_path / "log")), True)], n_slots=2)
+    stats = publish(bus, 20)
+
+    names, intact = read_log(tmp_path / "log")
+    assert 20 == stats["published"] and 0 == stats["dropped"] and [20] == stats["consumed"]
+    assert list(range(20)) == names and intact
+    assert 0.02 * (20 - 2 - 1) < stats["blocked_time"]
+
+
+def test_dropping_producer(tmp_path):
+    # Drop policy: the producer never waits and drops the frames with no free slot
+    bus = FrameBus((4, 4, 4), [(SlowConsumer, dict(path=str(tmp_path / "log")), True)], n_slots=2,
+                   policy="drop")
+    stats = publish(bus, 20)
+
+    names, intact = read_log(tmp_path / "log")
+    assert 0 < stats["dropped"] and 20 == stats["published"] + stats["dropped"]
+    assert [stats["published"]] == stats["consumed"] and len(names) == stats["published"] and intact
+    assert names == sorted(names)
+
+
+def test_lossy_consumer(tmp_path):
+    # A lossy consumer never holds the producer back and skips the frames it missed
+    bus = FrameBus((4, 4, 4), [(SlowConsumer, dict(path=str(tmp_path / "log")), False)], n_slots=2)
+    stats = publish(bus, 20)
+
+    names, intact = read_log(tmp_path / "log")
+    assert 20 == stats["published"] and 0 == stats["dropped"] and stats["blocked_time"] < 0.02
+    assert stats["consumed"][0] < 20 and len(names) == stats["consumed"][0] and intact
+    assert names == sorted(set(names)) and 19 == names[-1]  # the latest one at last
+
+
+def test_unknown_consumer():
+    with pytest.raises(ValueError):
+        FrameBus((4, 4, 4), [("np", dict(), True)])
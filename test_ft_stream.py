@@ -0,0 +1,74 @@
+import numpy as np
+
+from dynamics import GramAccumulator, get_regressor_matrices, get_regressor_matrix
+from sensors import WrenchNoise, WrenchNoiseConfig, decimate, get_lowpass_taps
+
+
+def test_regressor_matrices():
+    rng = np.random.default_rng(0)
+    twists, dtwists = rng.standard_normal((2, 20, 6))
+    regressors = get_regressor_matrices(twists, dtwists)
+    for twist, dtwist, regressor in zip(twists, dtwists, regressors):
+        assert np.allclose(regressor, get_regressor_matrix(twist, dtwist))
+
+
+def test_decimate():
+    decimation = 10
+    taps = get_lowpass_taps(decimation, 8)
+    assert np.isclose(taps.sum(), 1) and np.allclose(taps, taps[::-1])
+
+    # 1 kHz sampling: 2 Hz passes with no delay, 300 Hz would alias into the band of 100 Hz
+    time = np.arange(5000) * 1e-3
+    slow, fast = np.sin(2 * np.pi * 2 * time), np.sin(2 * np.pi * 300 * time)
+    signal = np.stack([slow + fast, 2 * slow], axis=-1)
+    decimated = decimate(signal, taps, decimation)
+    assert (500, 2) == decimated.shape
+    inner = slice(20, -20)  # away from the padded ends
+    assert np.allclose(decimated[inner, 0], slow[::decimation][inner], atol=1e-3)
+    assert np.allclose(decimated[inner, 1], 2 * slow[::decimation][inner], atol=1e-3)
+
+    # Along another axis, e.g., of the noise realizations
+    stacked = decimate(np.stack([signal, -signal]), taps, decimation, axis=1)
+    assert np.allclose(stacked, [decimated, -decimated])
+
+
+def test_stream_identification():
+    rng = np.random.default_rng(1)
+    params = rng.standard_normal(10)
+    twists, dtwists = np.cumsum(rng.standard_normal((2, 3000, 6)), axis=1) * 1e-2
+    regressors = get_regressor_matrices(twists, dtwists)
+    wrenches = regressors @ params
+
+    # The same filter on both sides keeps the wrench linear in the params
+    taps = get_lowpass_taps(10, 8)
+    regressors, wrenches = decimate(regressors, taps, 10), decimate(wrenches, taps, 10)
+    assert np.allclose(regressors @ params, wrenches)
+
+    # Samples summed into frames give the estimate of the samples
+    groups = np.arange(len(wrenches)) // 7
+    gram = GramAccumulator(regressors, wrenches, groups, groups.max() + 2)
+    assert np.allclose(gram.estimate()[:, 0], params)
+    assert np.allclose(gram.row_counts[:-2], 6 * 7) and 0 == gram.row_counts[-1]
+    assert np.allclose(GramAccumulator(regressors, wrenches).estimate(), gram.estimate())
+
+
+def test_noise_rates():
+    n_frames, steps_per_frame = 50, 10
+    clean = np.ones((n_frames * steps_per_frame, 6))
+    stds = WrenchNoise(WrenchNoiseConfig()).get_stds(clean)
+
+    # White noise of the same std once averaged over a frame
+    noise = WrenchNoise(WrenchNoiseConfig(n_realizations=100))
+    per_frame = noise.realize(clean[:n_frames]) - 1
+    per_step = noise.realize(clean, steps_per_frame=steps_per_frame) - 1
+    per_step = per_step.reshape(100, n_frames, steps_per_frame, 6).mean(axis=2)
+    assert np.allclose(per_frame.std(axis=(0, 1)), 0.05 * stds, rtol=0.1)
+    assert np.allclose(per_step.std(axis=(0, 1)), 0.05 * stds, rtol=0.1)
+
+    # Drift of the same std at the end of the same duration
+    noise = WrenchNoise(WrenchNoiseConfig(n_realizations=400, models=["BiasDrift"], drift_rate=0.01))
+    per_frame = noise.realize(clean[:n_frames])[:, -1] - 1
+    per_step = noise.realize(clean, steps_per_frame=steps_per_frame)[:, -1] - 1
+    expected = 0.01 * stds * np.sqrt(n_frames)
+    assert np.allclose(per_frame.std(axis=0), expected, rtol=0.15)
+    assert np.allclose(per_step.std(axis=0), expected, rtol=0.15)
@@ -0,0 +1,80 @@
+import numpy as np
+
+from dynamics import GramAccumulator
+
+
+def get_data(n_frames=40, n_realizations=3):
+    rng = np.random.default_rng(0)
+    regressors = rng.standard_normal((n_frames, 6, 10))
+    wrenches = regressors @ rng.standard_normal(10) + 0.1 * rng.standard_normal((n_realizations,
+                                                                                 n_frames, 6))
+    return regressors, wrenches
+
+
+def lstsq(regressors, wrenches, counts=None):
+    """Estimates (10, K) of the frames repeated by counts, stacking their rows"""
+
+    counts = np.ones(len(regressors), dtype=int) if counts is None else counts
+    A = np.repeat(regressors, counts, axis=0).reshape(-1, 10)
+    b = np.repeat(wrenches, counts, axis=1).reshape(len(wrenches), -1)
+    return np.linalg.lstsq(A, b.T, rcond=None)[0]
+
+
+def test_estimate_covariance():
+    regressors, wrenches = get_data()
+    gram = GramAccumulator(regressors, wrenches)
+    assert np.allclose(gram.estimate(), lstsq(regressors, wrenches))
+
+    # Repeated indices weigh their frames
+    indices = [0, 3, 3, 5, 7, 8, 9, 9, 9, 12]
+    counts = np.bincount(indices, minlength=len(regressors))
+    assert np.allclose(gram.estimate(indices), lstsq(regressors, wrenches, counts))
+
+    # σ^2 (A^T A)^-1 with the residual variance over the dof of the rows
+    A = regressors.reshape(-1, 10)
+    for k, covariance in enumerate(gram.covariance()):
+        residuals = wrenches[k].reshape(-1) - A @ lstsq(regressors, wrenches)[:, k]
+        variance = residuals @ residuals / (len(A) - 10)
+        assert np.allclose(covariance, variance * np.linalg.inv(A.T @ A))
+
+
+def test_kfold_bootstrap():
+    regressors, wrenches = get_data()
+    gram = GramAccumulator(regressors, wrenches)
+
+    # Each fold is estimated from the others and predicts the held-out frames
+    kfold = gram.kfold(k=5, seed=1)
+    folds = np.array_split(np.random.default_rng(1).permutation(40), 5)
+    assert (5, 10, 3) == kfold["estimates"].shape and [8] * 5 == [len(f) for f in folds]
+    rss = 0
+    for fold, estimate in zip(folds, kfold["estimates"]):
+        kept = np.setdiff1d(np.arange(40), fold)
+        assert np.allclose(estimate, lstsq(regressors[kept], wrenches[:, kept]))
+        predicted = np.einsum("nri,ik->knr", regressors[fold], estimate)
+        rss += ((wrenches[:, fold] - predicted) ** 2).sum(axis=(1, 2))
+    assert np.allclose(kfold["rmse"], np.sqrt(rss / (6 * 40)))
+    assert 3 == len(gram.kfold([4, 5, 6], k=5)["estimates"])  # a frame per fold
+
+    # Each resample draws as many frames as given, with replacement
+    indices = np.arange(10, 30)
+    resampled = gram.bootstrap(indices, n_resamples=50, seed=2)
+    counts = np.random.default_rng(2).multinomial(20, np.full(20, 1 / 20), size=50)
+    assert (50, 10, 3) == resampled.shape and np.all(20 == counts.sum(axis=1))
+    for estimate, count in zip(resampled[:3], counts):
+        assert np.allclose(estimate, lstsq(regressors[indices], wrenches[:, indices], count))
+
+
+def test_no_frames():
+    # e.g., the valid split of a run of a few frames
+    gram = GramAccumulator(*get_data(n_frames=5))
+
+    assert (10, 3) == gram.estimate([]).shape and np.isnan(gram.estimate([])).all()
+    kfold = gram.kfold([], k=5)
+    assert (5, 10, 3) == kfold["estimates"].shape and np.isnan(kfold["estimates"]).all()
+    assert (3, ) == kfold["rmse"].shape and np.isnan(kfold["rmse"]).all()
+    assert (20, 10, 3) == gram.bootstrap([], n_resamples=20).shape
+    assert np.isnan(gram.bootstrap([], n_resamples=20)).all()
+
+    # Fewer rows than params leave the residual variance undetermined
+    covariance = gram.covariance([0])
+    assert (3, 10, 10) == covariance.shape and np.isnan(covariance).all()
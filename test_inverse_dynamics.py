@@ -0,0 +1,38 @@
+import numpy as np
+from mujoco._functions import mj_forward
+
+from core import autoinstantiate, generate_model_data, simulate
+from dynamics import InverseDynamicsConfig, NativeInverseDynamics, RneaInverseDynamics
+
+
+def test_backends(make_config):
+    m, d, _ = generate_model_data(make_config("hammer", 0.1))
+    mj_forward(m, d)
+    rnea = RneaInverseDynamics(InverseDynamicsConfig(), m, d)
+    native = NativeInverseDynamics(InverseDynamicsConfig("NativeInverseDynamics"), m, d)
+
+    rng = np.random.default_rng(0)
+    trajs = rng.standard_normal((10, 3, m.nu))
+    batch = rnea.get_twists_sen_batch(trajs)
+    for k, traj in enumerate(trajs):
+        assert np.allclose(native.get_ctrl(traj), rnea.get_ctrl(traj))
+        for native_twist, rnea_twist, batch_twists in zip(native.get_twists_sen(traj),
+                                                          rnea.get_twists_sen(traj), batch):
+            assert np.allclose(native_twist, rnea_twist)
+            assert np.allclose(batch_twists[k], rnea_twist)
+
+
+def test_simulate_backends(make_config, frame_logger):
+    cfg = make_config("hammer", 0.1)
+
+    physics = []
+    for target_class in ["RneaInverseDynamics", "NativeInverseDynamics"]:
+        m, d, _ = generate_model_data(cfg)
+        planner = autoinstantiate(cfg.planner, m, d)
+        controller = autoinstantiate(cfg.controller, m, d)
+        cfg.inverse_dynamics.target_class = target_class
+        physics.append(simulate(m, d, frame_logger, planner, controller,
+                                inverse_dynamics=autoinstantiate(cfg.inverse_dynamics, m, d)))
+
+    for key in ["fts_sen_clean", "twists_sen", "dtwists_sen", "regressors", "states"]:
+        assert np.allclose(physics[0][key], physics[1][key], atol=1e-8)
@@ -0,0 +1,54 @@
+import time
+
+from jobs import JobQueue, JobQueueConfig, make_jobs
+
+
+def get_queue(tmp_path, **kwargs) -> JobQueue:
+    # Exits with the code given as the first arg, standing in for main.py
+    cfg = JobQueueConfig(path=str(tmp_path / "jobs.sqlite"), log_dir=str(tmp_path / "logs"),
+                         command=["-c", "import sys; sys.exit(int(sys.argv[1]))"],
+                         retry_delay=0.0, poll_seconds=0.01, **kwargs)
+    return JobQueue(cfg)
+
+
+def test_make_jobs():
+    jobs = make_jobs(["hammer"], ["planner.duration=5,10", "noise.seed=0,1"], ["logger.fps=30"])
+    assert 4 == len(jobs)
+    assert ["target_name=hammer", "logger.fps=30", "planner.duration=5", "noise.seed=0"] \
+        == jobs[0][:4]
+    assert 4 == len({j[-1] for j in jobs})  # dataset dirs
+    assert [["target_name=hammer"]] == make_jobs(["hammer"])
+
+
+def test_work_and_retry(tmp_path):
+    queue = get_queue(tmp_path, max_attempts=2)
+    assert 2 == len(queue.enqueue([["0"], ["3"]]))
+    assert 0 == len(queue.enqueue([["0"]]))  # queued before
+
+    result = queue.work("worker")
+    assert 1 == len(result["done"]) and 2 == len(result["failed"])
+    table = queue.table().set_index("args")
+    assert "done" == table.loc["0", "status"]
+    assert ("failed", 2, 3) == tuple(table.loc["3", ["status", "attempts", "returncode"]])
+
+    # A relaunch runs nothing more until the failed jobs are queued again
+    assert {"done": [], "failed": [], "lost": []} == queue.work("worker")
+    assert 1 == queue.retry_failed()
+    assert 2 == len(queue.work("worker")["failed"])
+
+
+def test_expired_lease(tmp_path):
+    queue = get_queue(tmp_path, lease_seconds=0.05)
+    queue.enqueue([["0"]])
+    crashed = queue.claim("crashed")
+    assert queue.claim("other") is None  # leased
+
+    time.sleep(0.1)
+    job = queue.claim("other")
+    assert job.job_id == crashed.job_id and 2 == job.attempts
+
+    # The crashed worker can neither renew nor complete the job taken over
+    assert not queue.heartbeat(crashed)
+    assert not queue.complete(crashed, 0)
+    assert queue.complete(job, 0)
+    assert 0 == queue.n_unfinished()
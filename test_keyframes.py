@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from transforms3d.euler import euler2mat
+
+from core import generate_model_data
+from keyframes import KeyframeSelector, KeyframeSelectorConfig
+
+
+@pytest.fixture
+def m(make_config):
+    m, _, _ = generate_model_data(make_config("hammer"))
+    return m
+
+
+def get_poses(yaws):
+    poses = np.tile(np.eye(4), (len(yaws), 1, 1))
+    poses[:, :3, :3] = [euler2mat(0, 0, yaw) for yaw in yaws]
+    return poses
+
+
+def test_budget(m):
+    rng = np.random.default_rng(0)
+    poses, regressors = get_poses(rng.uniform(-np.pi, np.pi, 50)), rng.standard_normal((50, 6, 10))
+    wrenches = rng.standard_normal((50, 6))
+
+    for budget, n_selected in [(0, 50), (10, 10), (50, 50), (80, 50)]:
+        selector = KeyframeSelector(KeyframeSelectorConfig(budget=budget), m)
+        indices = selector.select(poses, regressors, wrenches)
+        assert n_selected == len(indices) == len(np.unique(indices))
+        assert np.array_equal(np.sort(indices), indices)
+
+
+def test_information(m):
+    # Copies of one regressor (rank 6) and one completing it, besides an uninformative one
+    rng = np.random.default_rng(0)
+    regressors = np.concatenate([np.tile(rng.standard_normal((1, 6, 10)), (8, 1, 1)),
+                                 rng.standard_normal((1, 6, 10)), np.zeros((1, 6, 10))])
+    selector = KeyframeSelector(KeyframeSelectorConfig(budget=2, novelty_weight=0.0), m)
+    indices = selector.select(get_poses(np.zeros(10)), regressors, rng.standard_normal((10, 6)))
+
+    assert 8 in indices and 1 == np.sum(indices < 8)
+
+
+def test_novelty(m):
+    # Viewpoints close to the first one but two, the farthest of which is picked first
+    yaws = np.radians([0, 1, 2, 3, 90, 4, 5, 180, 6, 7])
+    selector = KeyframeSelector(KeyframeSelectorConfig(budget=3, information_weight=0.0), m)
+    rng = np.random.default_rng(0)
+    indices = selector.select(get_poses(yaws), rng.standard_normal((10, 6, 10)),
+                              rng.standard_normal((10, 6)))
+
+    assert [0, 4, 7] == indices.tolist()
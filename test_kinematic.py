@@ -0,0 +1,53 @@
+import numpy as np
+from mujoco._functions import mj_inverse, mj_rnePostConstraint, mj_sensorAcc
+from mujoco._structs import MjData
+
+from core import (autoinstantiate, generate_model_data, get_frame_steps, simulate,
+                  simulate_kinematic)
+from sensors import FTStream, FTStreamConfig, Sensors
+
+
+def test_frame_steps():
+    steps, times = get_frame_steps(0.0, 0.002, 1000, 30)
+
+    # The condition of simulate() with the time accumulated as mj_step does
+    expected, frame_count, time = [], 0, 0.0
+    for step in range(1000):
+        assert time == times[step]
+        if frame_count <= time * 30:
+            expected.append(step)
+            frame_count += 1
+        time += 0.002
+    assert np.array_equal(steps, expected)
+
+
+def test_simulate_kinematic(make_config, frame_logger):
+    cfg = make_config("hammer", 0.2)
+    m, d, gt = generate_model_data(cfg)
+    stream = FTStream(FTStreamConfig(enabled=True))
+    physics = simulate_kinematic(m, d, frame_logger, autoinstantiate(cfg.planner, m, d), gt, stream)
+
+    # The wrench is the reading of the FT sensor along the planned trajectory
+    d_sensor = MjData(m)
+    sensors = Sensors(m, d_sensor)
+    for traj, ft in zip(physics["trajectory"], physics["fts_sen_clean"]):
+        d_sensor.qpos[:], d_sensor.qvel[:], d_sensor.qacc[:] = traj
+        mj_inverse(m, d_sensor)
+        mj_rnePostConstraint(m, d_sensor)
+        mj_sensorAcc(m, d_sensor)
+        # Up to the rounding of the ground truth compiled into the model
+        assert np.allclose(ft, np.concatenate([sensors.get("force"), sensors.get("torque")]),
+                           atol=1e-4)
+
+    # The frames of simulate(), replayed at the planned qpos, and the stream of
+    # every step
+    m, d, _ = generate_model_data(cfg)
+    expected = simulate(m, d, frame_logger, autoinstantiate(cfg.planner, m, d),
+                        autoinstantiate(cfg.controller, m, d))
+    assert np.array_equal(physics["time"], expected["time"])
+    assert np.allclose(physics["tgt_trajectory"], expected["tgt_trajectory"])
+    assert np.array_equal(physics["states"][:, 1:1 + m.nq], physics["trajectory"][:, 0])
+
+    steps = np.searchsorted(physics["stream"]["time"], physics["time"])
+    assert 100 == len(physics["stream"]["time"])  # steps of 0.2 [s]
+    assert np.allclose(physics["stream"]["fts_sen"][steps], physics["fts_sen_clean"])
@@ -0,0 +1,70 @@
+import numpy as np
+from liegroups.numpy import SE3, SO3
+
+from transformations import kernels as lie
+
+
+rng = np.random.default_rng(0)
+N = 50
+# Rotation vectors of generic, tiny and near-pi angles
+phis = np.concatenate([rng.standard_normal((N, 3)),
+                       1e-12 * rng.standard_normal((5, 3)),
+                       (np.pi - 1e-3) * rng.standard_normal((5, 3)).clip(-1, 1) / np.sqrt(3)])
+xis = np.concatenate([rng.standard_normal((len(phis), 3)), phis], axis=1)
+poses = [SE3.exp(xi) for xi in xis]
+mats = np.array([pose.as_matrix() for pose in poses])
+
+
+def test_wedge():
+    assert np.allclose(lie.so3_wedge(phis), [SO3.wedge(phi) for phi in phis])
+    assert np.allclose(lie.se3_wedge(xis), [SE3.wedge(xi) for xi in xis])
+    assert np.allclose(lie.se3_curlywedge(xis), [SE3.curlywedge(xi) for xi in xis])
+    assert np.allclose(lie.so3_vee(lie.so3_wedge(phis)), phis)
+    assert np.allclose(lie.se3_vee(lie.se3_wedge(xis)), xis)
+
+
+def test_exp_log():
+    assert np.allclose(lie.so3_exp(phis), [SO3.exp(phi).as_matrix() for phi in phis])
+    assert np.allclose(lie.se3_exp(xis), mats)
+    assert np.allclose(lie.so3_left_jacobian(phis), [SO3.left_jacobian(phi) for phi in phis])
+    assert np.allclose(lie.so3_inv_left_jacobian(phis) @ lie.so3_left_jacobian(phis), np.eye(3))
+    assert np.allclose(lie.se3_exp(lie.se3_log(mats)), mats)
+    # Away from pi, where liegroups is accurate
+    generic = slice(0, N + 5)
+    assert np.allclose(lie.se3_log(mats[generic]), [pose.log() for pose in poses[generic]])
+
+
+def test_group_operations():
+    assert np.allclose(lie.se3_inv(mats), [pose.inv().as_matrix() for pose in poses])
+    assert np.allclose(lie.se3_adjoint(mats), [pose.adjoint() for pose in poses])
+    assert np.allclose(lie.se3_compose(mats, mats[::-1], mats),
+                       [a.dot(b).dot(a).as_matrix() for a, b in zip(poses, poses[::-1])])
+    points = rng.standard_normal((len(poses), 3))
+    assert np.allclose(lie.se3_transform(mats, points),
+                       [pose.dot(point) for pose, point in zip(poses, points)])
+
+
+def test_screw_exp():
+    # One-hot joint screws, revolute about and prismatic along each axis, and
+    # a general screw
+    screws = np.concatenate([np.eye(6), [[0.3, -0.2, 0.1, 0.0, 0.6, 0.8]],
+                             [[0.3, -0.2, 0.1, 0.0, 1.2, 0.5]]])
+    thetas = rng.standard_normal((len(screws)))
+    assert np.allclose(lie.screw_exp(screws, thetas),
+                       [SE3.exp(s * t).as_matrix() for s, t in zip(screws, thetas)])
+
+
+def test_conversions():
+    rots = lie.so3_exp(phis)
+    quats = lie.matrix_to_quat(rots)
+    assert np.allclose(np.linalg.norm(quats, axis=-1), 1)
+    assert np.allclose(lie.quat_to_matrix(quats), rots)
+    assert np.allclose(lie.quat_to_matrix(quats),
+                       [SO3.from_quaternion(q).as_matrix() for q in quats])
+    assert np.allclose(lie.quat_to_matrix(quats[:, [1, 2, 3, 0]], ordering="xyzw"), rots)
+
+    trans = rng.standard_normal((len(phis), 3))
+    assert np.allclose(lie.tq_to_matrix(trans, quats),
+                       [SE3(SO3.from_quaternion(q), t).as_matrix() for t, q in zip(trans, quats)])
+    assert np.allclose(lie.tr_to_matrix(trans, rots.reshape(-1, 9)),
+                       [SE3(SO3.from_matrix(r), t).as_matrix() for t, r in zip(trans, rots)])
@@ -0,0 +1,21 @@
+import numpy as np
+
+from loggers import decode_mask, encode_mask
+
+
+def test_rle():
+    rng = np.random.default_rng(0)
+    masks = [rng.random((7, 5)) < p for p in [0.1, 0.5, 0.9]]
+    masks += [np.zeros((7, 5), dtype=bool), np.ones((7, 5), dtype=bool)]
+    for mask in masks:
+        rle = encode_mask(mask)
+        assert np.array_equal(mask, decode_mask(rle))
+        assert [7, 5] == rle["size"] and mask.sum() == sum(rle["counts"][1::2])
+
+    # Runs of 0 first, empty if the first pixel is set, over the columns
+    assert [35] == encode_mask(masks[3])["counts"] and [0, 35] == encode_mask(masks[4])["counts"]
+    mask = np.zeros((4, 6), dtype=bool)
+    mask[1:3, 2:5] = True
+    rle = encode_mask(mask)
+    assert [9, 2, 2, 2, 2, 2, 5] == rle["counts"] and [2, 1, 3, 2] == rle["bbox"]
+    assert [0, 0, 0, 0] == encode_mask(masks[3])["bbox"] and [0, 0, 5, 7] == encode_mask(masks[4])["bbox"]
@@ -0,0 +1,81 @@
+import re
+from pathlib import Path
+
+import numpy as np
+from mujoco._structs import MjModel
+from transforms3d.quaternions import quat2mat
+
+from catalog import get_target_object_ground_truth, get_target_object_mesh_ground_truth
+from dynamics import get_mesh_inertia, get_obj_inertia, join_inertias, load_obj
+
+
+targets_dir = Path(__file__).parent / "xml_models" / "targets"
+
+# Box of 1 x 2 x 3 with a corner at (5, 5, 5), its 12 triangles counter-clockwise
+box_vertices = 5 + np.array([[x, y, z] for x in (0, 1) for y in (0, 2) for z in (0, 3)], float)
+box_faces = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                      [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]])
+
+
+def test_box():
+    box = get_mesh_inertia(box_vertices, box_faces, density=2.0)
+    assert np.isclose(box["volume"], 6)
+    assert np.isclose(box["mass"], 12)
+    assert np.allclose(box["com"], [5.5, 6, 6.5])
+    assert np.allclose(box["inertia"], np.diag([2 * 2 + 3 * 3, 1 + 3 * 3, 1 + 2 * 2]))
+
+
+def test_obj_and_join():
+    # Quads are fanned into triangles
+    obj = "\n".join([f"v {x} {y} {z}" for x, y, z in box_vertices]
+                    + ["f 1/1/1 2/2/2 4/4/4 3/3/3", "f 5 7 8 6", "f 1 5 6 2",
+                       "f 3 4 8 7", "f 1 3 7 5", "f 2 6 8 4"])
+    vertices, faces = load_obj(obj)
+    assert 12 == len(faces)
+    box = get_obj_inertia(obj, density=2.0)
+    assert np.allclose(box["inertia"], get_mesh_inertia(box_vertices, box_faces, 2.0)["inertia"])
+
+    # Two halves of the box along z
+    lower, upper = box_vertices.copy(), box_vertices.copy()
+    lower[:, 2] = np.minimum(lower[:, 2], 6.5)
+    upper[:, 2] = np.maximum(upper[:, 2], 6.5)
+    joined = join_inertias([get_mesh_inertia(lower, box_faces, 2.0),
+                            get_mesh_inertia(upper, box_faces, 2.0)])
+    for key in ["volume", "mass", "com", "inertia"]:
+        assert np.allclose(joined[key], box[key])
+
+
+def test_against_mujoco():
+    # Both meshes are closed
+    for target in ["wooden-tray-2", "hammer"]:
+        target_dir = targets_dir / target
+        xml = (target_dir / "object.xml").read_text()
+        xml = xml.replace('meshdir="assets" texturedir="assets"', 'inertiafromgeom="true"') \
+                 .replace('<mesh file', '<mesh inertia="exact" file') \
+                 .replace('contype="0" conaffinity="0"/>', 'contype="0" conaffinity="0" density="0"/>')
+        assets = {p.name: p.read_bytes() for p in (target_dir / "assets").iterdir()}
+        m = MjModel.from_xml_string(xml, assets=assets)  # of the collision geoms
+
+        obj_names = re.findall(r'<mesh inertia="exact" file="([^"]+)"', xml)
+        # Of the default density of MuJoCo
+        joined = join_inertias([get_obj_inertia(assets[name], 1000.0) for name in obj_names])
+        body = m.body("object")
+        rot = quat2mat(body.iquat)
+        assert np.isclose(joined["mass"], body.mass[0])
+        assert np.allclose(joined["com"], body.ipos, atol=1e-8)
+        assert np.allclose(joined["inertia"], rot @ np.diag(body.inertia) @ rot.T, rtol=1e-6,
+                           atol=1e-9)
+
+
+def test_against_cad():
+    target_dir = targets_dir / "hammer"
+    cad_gt_path = target_dir / "object_cad_gt.csv"
+    ground_truth = get_target_object_ground_truth(cad_gt_path)
+    meshes = [(target_dir / "assets" / f"object_{i}.obj").read_bytes() for i in range(2)]
+    mesh_ground_truth = get_target_object_mesh_ground_truth(meshes, cad_gt_path,
+                                                            ground_truth["aabb_scale"])
+
+    assert np.isclose(mesh_ground_truth["mass"], ground_truth["mass"], rtol=1e-3)
+    assert np.allclose(mesh_ground_truth["com"], ground_truth["com"].astype(float), atol=1e-4)
+    assert np.allclose(mesh_ground_truth["globalinertia"], ground_truth["globalinertia"],
+                       atol=1e-5)
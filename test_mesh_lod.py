@@ -0,0 +1,53 @@
+import numpy as np
+
+from catalog import count_faces, decimate, split_texcoords, write_obj
+from dynamics import get_mesh_inertia, load_obj
+
+
+def get_sphere(n_rings: int = 60, n_segments: int = 120) -> tuple[np.ndarray, np.ndarray]:
+    """Unit UV sphere, its triangles counter-clockwise seen from outside"""
+
+    theta = np.linspace(0, np.pi, n_rings + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, n_segments, endpoint=False)
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    vertices = np.vstack([[0, 0, 1],
+                          np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi),
+                                    np.cos(theta)], axis=-1).reshape(-1, 3),
+                          [0, 0, -1]])
+    ring = lambda i, j: 1 + i * n_segments + j % n_segments
+    faces = [[0, ring(0, j), ring(0, j + 1)] for j in range(n_segments)]
+    for i in range(n_rings - 2):
+        for j in range(n_segments):
+            faces += [[ring(i, j), ring(i + 1, j), ring(i + 1, j + 1)],
+                      [ring(i, j), ring(i + 1, j + 1), ring(i, j + 1)]]
+    faces += [[len(vertices) - 1, ring(n_rings - 2, j + 1), ring(n_rings - 2, j)]
+              for j in range(n_segments)]
+    return vertices, np.array(faces)
+
+
+def test_decimate():
+    vertices, faces = get_sphere()
+    full = get_mesh_inertia(vertices, faces)
+    for n_faces in [5000, 1000, 200]:
+        lod_vertices, lod_faces, _ = decimate(vertices, faces, n_faces)
+        assert 0.5 * n_faces < len(lod_faces) <= n_faces
+        lod = get_mesh_inertia(lod_vertices, lod_faces)
+        assert np.isclose(lod["volume"], full["volume"], rtol=0.05)
+        assert np.allclose(lod["com"], full["com"], atol=0.01)
+
+
+def test_texcoords():
+    vertices, faces = get_sphere(20, 40)
+    uvs = vertices[:, :2] * 0.5 + 0.5
+    obj = write_obj(vertices, faces, uvs)
+    assert len(faces) == count_faces(obj)
+
+    # A corner per vertex, the texture coordinates then split at none
+    loaded, loaded_faces, loaded_uvs, uv_faces = load_obj(obj, texcoords=True)
+    split, split_faces, split_uvs = split_texcoords(loaded, loaded_faces, loaded_uvs, uv_faces)
+    assert len(split) == len(vertices)
+    assert np.allclose(split[split_faces], vertices[faces])
+    assert np.allclose(split_uvs[split_faces], uvs[faces])
+
+    lod_vertices, lod_faces, lod_uvs = decimate(vertices, faces, 200, uvs)
+    assert len(lod_uvs) == len(lod_vertices) and len(lod_faces) <= 200
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from numpy import linalg as nla
+
+from sensors import WrenchNoise, WrenchNoiseConfig
+
+
+def get_clean(n_frames=30):
+    return np.random.default_rng(42).standard_normal((n_frames, 6)) * [1, 2, 3, 0.1, 0.2, 0.3]
+
+
+def test_realizations(tmp_path):
+    clean = get_clean()
+    cfg = WrenchNoiseConfig(n_realizations=4, seed=7, models=["GaussianNoise", "BiasDrift"], drift_rate=0.01)
+
+    # Reproducible from the seed and K, also of a single realization
+    realizations = WrenchNoise(cfg).realize(clean)
+    assert (4, 30, 6) == realizations.shape
+    assert np.array_equal(realizations, WrenchNoise(cfg).realize(clean))
+    assert np.array_equal(realizations[2], WrenchNoise(cfg).realize(clean, 2))
+    assert np.array_equal(realizations[[3, 1]], WrenchNoise(cfg).realize(clean, [3, 1]))
+    assert not np.allclose(realizations[0], realizations[1])
+
+    # Regenerated from the clean signal and the config saved
+    WrenchNoise(cfg).save(tmp_path / "noise.npz", clean)
+    noise, loaded = WrenchNoise.load(tmp_path / "noise.npz")
+    assert np.array_equal(realizations, noise.realize(loaded))
+
+
+def test_baseline():
+    # The 5% gaussian perturbation of seed 0 before the noise models
+    clean = get_clean()
+    rng = np.random.default_rng(0)
+    expected = clean.copy()
+    fs_std = 0.05 * nla.norm(clean[..., :3], axis=1).max()
+    ts_std = 0.05 * nla.norm(clean[..., 3:], axis=1).max()
+    expected[..., :3] += fs_std * rng.standard_normal((len(clean), 3))
+    expected[..., 3:] += ts_std * rng.standard_normal((len(clean), 3))
+
+    realizations = WrenchNoise(WrenchNoiseConfig(n_realizations=3)).realize(clean)
+    assert np.array_equal(expected, realizations[0])
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError, match="'Gaussian' is invalid"):
+        WrenchNoise(WrenchNoiseConfig(models=["GaussianNoise", "Gaussian"]))
@@ -0,0 +1,49 @@
+from time import sleep
+
+import numpy as np
+import pytest
+
+from pacers import RealtimePacer, RealtimePacerConfig
+
+
+def run(pacer, n_steps, slow_steps, slow_stage, delay=3e-3):
+    """Steps of a fast "plan" and a "log", the slow stage taking delay at slow_steps"""
+
+    pacer.start(n_steps, ["plan", "log"])
+    for step in range(n_steps):
+        pacer.tick()
+        for stage in ["plan", "log"]:
+            if stage == slow_stage and step in slow_steps:
+                sleep(delay)
+            pacer.lap(stage)
+        pacer.wait()
+
+    return pacer.summary()
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_deadline_misses(enabled):
+    cfg = RealtimePacerConfig(enabled=enabled, period=2e-3, deadline_stages=["plan"])
+
+    # Only the deadline stages are charged to a deadline
+    summary = run(RealtimePacer(cfg, None, None), 30, [3, 7, 11], "plan")
+    assert 3 == summary["deadline_misses"] and [3, 7, 11] == summary["missed_steps"]
+    assert np.isclose(summary["miss_rate"], 0.1)
+    assert 3e-3 <= summary["compute_latency"]["max"] == summary["stage_latency"]["plan"]["max"]
+    summary = run(RealtimePacer(cfg, None, None), 30, [3, 7, 11], "log")
+    assert 0 == summary["deadline_misses"] and 3e-3 <= summary["stage_latency"]["log"]["max"]
+
+    if enabled:
+        # A period per step besides the overruns, re-anchored after them
+        assert 30 * 2e-3 <= summary["wall_time"]
+        assert 0 <= summary["jitter"]["p50"] < 2e-3 and 5e-4 < summary["jitter"]["max"]
+    else:
+        assert summary["wall_time"] < 30 * 2e-3 and summary["jitter"] is None
+
+
+def test_no_steps():
+    # e.g., simulate() resumed from the checkpoint of the last step
+    summary = run(RealtimePacer(RealtimePacerConfig(enabled=True), None, None), 0, [], "plan")
+    assert 0 == summary["n_steps"] == summary["deadline_misses"]
+    assert np.isnan(summary["compute_latency"]["max"]) and np.isnan(summary["jitter"]["std"])
+    assert [] == summary["compute_latency"]["histogram"]["counts"]
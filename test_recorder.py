@@ -0,0 +1,54 @@
+import numpy as np
+
+from loggers import TrajectoryRecorder
+
+
+def get_recorder(capacity):
+    recorder = TrajectoryRecorder(capacity)
+    recorder.add("time")
+    recorder.add("wrench", (6, ))
+    recorder.add("flag", dtype=bool)
+    return recorder
+
+
+def record(recorder, n_rows):
+    for _ in range(n_rows):
+        row = recorder.next_row()
+        recorder["time"][row] = row
+        recorder["wrench"][row] = np.arange(6) + row
+        recorder["flag"][row] = row % 2
+
+
+def test_grow():
+    recorder = get_recorder(3)
+    record(recorder, 7)
+
+    # Grown past the capacity, keeping the rows written before
+    assert 7 == len(recorder) and 7 <= recorder.capacity
+    assert np.array_equal(np.arange(7), recorder.view("time"))
+    assert np.array_equal(np.arange(6) + np.arange(7)[:, None], recorder.view("wrench"))
+    assert bool == recorder.view("flag").dtype and [0, 1, 0, 1, 0, 1, 0] == list(recorder.view("flag"))
+
+
+def test_views_extend():
+    recorder = get_recorder(10)
+    record(recorder, 4)
+
+    # Only the written rows, as views of the columns
+    views = recorder.views()
+    assert ["time", "wrench", "flag"] == list(views)
+    assert all(4 == len(view) for view in views.values())
+    assert all(np.shares_memory(view, recorder[name]) for name, view in views.items())
+    recorder["time"][0] = -1
+    assert -1 == views["time"][0]
+
+    # Appended from the views of another recorder, e.g., of a checkpoint, and grown
+    resumed = get_recorder(2)
+    resumed.extend(views)
+    record(resumed, 3)
+    assert 7 == len(resumed)
+    assert np.array_equal([-1, 1, 2, 3, 4, 5, 6], resumed.view("time"))
+    assert np.array_equal(recorder.view("wrench"), resumed.view("wrench")[:4])
+    assert not np.shares_memory(resumed["time"], recorder["time"])
+    resumed.extend({})
+    assert 7 == len(resumed)
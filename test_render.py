@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+from mujoco import Renderer
+from mujoco._functions import mj_forward
+
+from core import autoinstantiate, generate_model_data, get_element_id, render, simulate
+from loggers import LayeredRenderer, decode_mask
+
+
+def get_logger(tmp_path, cfg, **logger_cfg):
+    cfg.logger.update(dataset_dir=str(tmp_path / "dataset"), fig_width=48, fig_height=32,
+                      **logger_cfg)
+    m, d, _ = generate_model_data(cfg)
+    cfg.logger.aabb_scale = float(m.numeric_data[get_element_id(m, "numeric", "target/aabb_scale")])
+    return m, d, autoinstantiate(cfg.logger, m, d)
+
+
+def test_cameras(tmp_path, make_config, rendering):
+    cfg = make_config("hammer", 0.1)
+    m, d, logger = get_logger(tmp_path, cfg, n_orbit_cams=1)
+    physics = simulate(m, d, logger, autoinstantiate(cfg.planner, m, d),
+                       autoinstantiate(cfg.controller, m, d))
+    rendered = render(m, d, logger, physics["states"], [0, 3])
+
+    assert ["tracking", "orbit0"] == logger.camera_names
+    assert [["0000.png", "0000_orbit0.png"], ["0003.png", "0003_orbit0.png"]] == rendered["file_names"]
+    for file_names, matrices in zip(rendered["file_names"], rendered["transform_matrices"]):
+        for file_name in file_names:
+            image = cv2.imread(str(logger.complete_image_dir / file_name), cv2.IMREAD_UNCHANGED)
+            assert (32, 48, 4) == image.shape and image[..., 3].any()  # the target is masked in
+        assert (2, 4, 4) == np.shape(matrices) and not np.allclose(*matrices)
+
+
+def test_layered_renderer(make_config, rendering):
+    # Against the public API of Renderer, so that a change of its internals fails here
+    m, d, _ = generate_model_data(make_config("hammer"))
+    mj_forward(m, d)
+    layered, reference = LayeredRenderer(m, 32, 48), Renderer(m, 32, 48)
+    for renderer in [layered, reference]:
+        renderer.update_scene(d, "tracking")
+
+    segmentation, depth = layered.render_segmentation_depth()
+    reference.enable_segmentation_rendering()
+    assert np.array_equal(segmentation, reference.render())
+    reference.disable_segmentation_rendering()
+    reference.enable_depth_rendering()
+    assert np.array_equal(depth, reference.render())
+    reference.disable_depth_rendering()
+    assert np.array_equal(layered.render(), reference.render())  # the flags are restored
+
+
+def test_depth(tmp_path, make_config, rendering):
+    m, d, logger = get_logger(tmp_path, make_config("hammer"), depth=True, mask_storage="rle")
+    mj_forward(m, d)
+    _, annotations = logger.render(d, "0000.png")
+    reference = Renderer(m, 32, 48)
+    reference.update_scene(d, "tracking")
+    reference.enable_segmentation_rendering()
+    segmentation = reference.render()
+    reference.disable_segmentation_rendering()
+    reference.enable_depth_rendering()
+    expected = reference.render()
+
+    # 16-bit counts of depth_unit, 0 for the background and out of range
+    counts = cv2.imread(str(logger.complete_image_dir / annotations[0]["depth_file_name"]),
+                        cv2.IMREAD_UNCHANGED)
+    assert np.uint16 == counts.dtype and (32, 48) == counts.shape
+    geoms = 0 <= segmentation[..., 0]
+    in_range = geoms & (expected < np.iinfo(np.uint16).max * logger.depth_unit)
+    assert in_range.any() and np.all(0 == counts[~in_range]) and np.all(0 < counts[in_range])
+    errors = np.abs(logger.depth_unit * counts[in_range] - expected[in_range])
+    assert np.all(errors <= 0.5001 * logger.depth_unit)  # rounded to the nearest count
+
+    # The mask stored as RLE is the target's part of the geoms
+    mask = decode_mask(annotations[0]["mask"])
+    assert mask.any() and not np.any(mask & ~geoms)
@@ -0,0 +1,87 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+from omegaconf import OmegaConf
+
+from core import autoinstantiate, compose_frames, generate_model_data, get_element_id, render, simulate
+from main import Scorer
+from replay import ReplayConfig, load_replay_config, replay
+
+# Keys of a frame other than its images and camera
+FT_KEYS = ["pose_sen_obj", "twist_sen", "dtwist_sen", "ft_sen"]
+
+
+def test_replay_config(tmp_path):
+    OmegaConf.save(OmegaConf.create(dict(target_name="hammer",
+                                         logger=dict(fig_width=800, fig_height=800),
+                                         planner=dict(duration=3.0))),
+                   tmp_path / "config.yaml")
+
+    cfg = load_replay_config(ReplayConfig(str(tmp_path), ["logger.fig_width=1280",
+                                                          "lod.render=preview"]))
+    assert (1280, 800, "preview") == (cfg.logger.fig_width, cfg.logger.fig_height, cfg.lod.render)
+    assert 3.0 == cfg.planner.duration
+
+    # The physics is replayed, never rerun
+    with pytest.raises(ValueError):
+        load_replay_config(ReplayConfig(str(tmp_path), ["planner.duration=5"]))
+    with pytest.raises(ValueError):
+        load_replay_config(ReplayConfig(str(tmp_path), ["lod.collision=1000"]))
+    # Neither is the identification, nor the frames' rate of the states
+    for override in ["logger.fps=30", "logger.n_folds=3", "logger.aabb_scale=1.0"]:
+        with pytest.raises(ValueError):
+            load_replay_config(ReplayConfig(str(tmp_path), [override]))
+
+
+def make_dataset(tmp_path, cfg):
+    """Run the stages of main.py on a short episode into a dataset dir"""
+
+    cfg.logger.update(dataset_dir=str(tmp_path / "dataset"), fig_width=64, fig_height=48,
+                      n_bootstraps=20)
+    m, d, gt = generate_model_data(cfg)
+    cfg.logger.aabb_scale = float(m.numeric_data[get_element_id(m, "numeric", "target/aabb_scale")])
+    (tmp_path / "dataset").mkdir()
+    OmegaConf.save(cfg, tmp_path / "dataset" / "config.yaml")
+
+    logger = autoinstantiate(cfg.logger, m, d)
+    physics = simulate(m, d, logger, autoinstantiate(cfg.planner, m, d),
+                       autoinstantiate(cfg.controller, m, d))
+    rendered = render(m, d, logger, physics["states"])
+    np.savez(tmp_path / "dataset" / "states.npz", states=physics["states"],
+             indices=rendered["indices"])
+
+    fts_sen = autoinstantiate(cfg.noise, m, d).realize(physics["fts_sen_clean"])
+    frames = compose_frames(logger, physics, rendered, fts_sen[0])
+    scorer = Scorer(gt["mass"], gt["mass"] * gt["com"], gt["globalinertia"], cfg.logger.aabb_scale)
+    logger.finish(frames, physics["regressors"], scorer, fts_sen, None, rendered["indices"],
+                  len(physics["time"]))
+
+
+def test_replay(tmp_path, make_config, rendering):
+    make_dataset(tmp_path, make_config("hammer", 0.2))
+    src_dir, dst_dir = tmp_path / "dataset", tmp_path / "replayed"
+
+    replay(ReplayConfig(str(src_dir), ["logger.fig_width=96", f"logger.dataset_dir={dst_dir}"],
+                        n_workers=2))
+
+    assert (dst_dir / "states.npz").is_file() and (dst_dir / "output.mp4").is_file()
+    assert 96 == OmegaConf.load(dst_dir / "config.yaml").logger.fig_width
+    for path in sorted(src_dir.glob("transform*.json")):
+        with open(path) as f:
+            expected = json.load(f)
+        with open(dst_dir / path.name) as f:
+            transform = json.load(f)
+
+        # The identification and the FT data of the frames are carried over
+        for key in ["labels", "global_gt", "lstsq", "noise_realizations", "uncertainty"]:
+            assert expected[key] == transform[key], (path.name, key)
+        assert len(expected["frames"]) == len(transform["frames"])
+        for expected_frame, frame in zip(expected["frames"], transform["frames"]):
+            assert all(expected_frame[key] == frame[key] for key in FT_KEYS)
+            assert np.allclose(expected_frame["transform_matrix"], frame["transform_matrix"])
+
+            # Re-rendered under the new settings
+            image = cv2.imread(str(dst_dir / frame["file_path"]), cv2.IMREAD_UNCHANGED)
+            assert (48, 96, 4) == image.shape and image[..., 3].any()
@@ -0,0 +1,67 @@
+import numpy as np
+from omegaconf import OmegaConf
+
+from results import ResultsStore, ResultsStoreConfig, hash_config
+
+LABELS = ["total_mass", "mx", "my", "mz", "ixx", "iyy", "izz", "ixy", "iyz", "izx", "aabb_scale", "score"]
+
+
+def get_summaries(score, estimate, splits=("full", "train", "valid")):
+    """Summaries of Logger.finish() with a score and the 10 inertial params per split"""
+
+    return {split: dict(path=f"transform_{split}.json",
+                        n_frames=10,
+                        labels=LABELS,
+                        global_gt=[*np.arange(10.0), 1.0, np.nan],
+                        lstsq=[*estimate, np.nan, score + i],
+                        uncertainty=dict(bootstrap=dict(score_lower=score - 1, score_upper=score + 1)),
+                        )
+            for i, split in enumerate(splits)}
+
+
+def get_config(target_name, dataset_dir, n_steps=100):
+    return OmegaConf.create(dict(target_name=target_name, planner=dict(n_steps=n_steps),
+                                 logger=dict(dataset_dir=dataset_dir)))
+
+
+def test_register(tmp_path):
+    store = ResultsStore(ResultsStoreConfig(path=str(tmp_path / "results.sqlite")))
+    cfg = get_config("hammer", "run_a")
+    run_id = store.register(cfg, get_summaries(3.0, np.arange(10.0) + 0.5), dict(simulate=1.0, finish=0.5))
+
+    # Only the 10 inertial params are kept, without aabb_scale and the score
+    run = store.get(run_id)
+    assert LABELS[:10] == run["labels"]
+    assert list(np.arange(10.0) + 0.5) == run["estimate"]
+    assert list(np.arange(10.0)) == run["ground_truth"]
+    assert 3.0 == run["score"] == run["splits"]["full"]["score"]
+    assert 4.0 == run["splits"]["train"]["score"] and 10 == run["splits"]["valid"]["n_frames"]
+    assert "hammer" == run["target"] and "run_a" == run["dataset_dir"]
+
+    # Configs differing only in volatile fields are the same config
+    assert run["config_hash"] == hash_config(OmegaConf.to_container(get_config("hammer", "run_b")))
+    assert run["config_hash"] != hash_config(OmegaConf.to_container(get_config("hammer", "run_a", 200)))
+
+
+def test_leaderboard_diff(tmp_path):
+    store = ResultsStore(ResultsStoreConfig(path=str(tmp_path / "results.sqlite")))
+    run_ids = [store.register(get_config(target, "run", n_steps), get_summaries(score, np.arange(10.0) * score),
+                              dict(simulate=score))
+               for target, score, n_steps in [("hammer", 2.0, 100), ("hammer", 1.0, 200), ("mallet", 0.5, 100)]]
+
+    # Lower scores first, of a target or a split if given
+    board = store.leaderboard()
+    assert [run_ids[2], run_ids[1], run_ids[0]] == list(board["run_id"])
+    assert [0.5, 1.0, 2.0] == list(board["score"]) and [0.5, 1.0, 2.0] == list(board["total_time"])
+    assert [run_ids[1], run_ids[0]] == list(store.leaderboard("hammer")["run_id"])
+    assert [3.0, 4.0] == list(store.leaderboard("hammer", split="valid")["score"])
+    assert [run_ids[2]] == list(store.leaderboard(limit=1)["run_id"])
+    assert store.leaderboard(split="test").empty
+
+    diff = store.diff(run_ids[0], run_ids[1])
+    assert ["planner.n_steps"] == list(diff["config"].index)
+    assert [100, 200] == diff["config"].loc["planner.n_steps"].tolist()
+    assert LABELS[:10] == list(diff["estimate"].index)
+    assert np.allclose(-np.arange(10.0), diff["estimate"]["difference"])
+    assert [2.0, 1.0] == diff["score"].loc["full"].tolist()
+    assert [2.0, 1.0] == diff["timings"].loc["simulate"].tolist()
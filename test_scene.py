@@ -0,0 +1,51 @@
+import numpy as np
+from mujoco._functions import mj_forward
+
+from core import (SceneConfig, autoinstantiate, generate_model_data, generate_scene_model_data,
+                  simulate, simulate_scene)
+from dynamics import get_inverse_dynamics, stack_inverse_dynamics
+from transformations import Poses
+
+
+def test_inverse_batch(make_config):
+    inverses = []
+    for target_name in ["wooden-tray-2", "hammer"]:
+        m, d, _ = generate_model_data(make_config(target_name, 0.1))
+        mj_forward(m, d)
+        inverses.append(get_inverse_dynamics(m, Poses(m, d)))
+
+    trajs = np.random.default_rng(0).standard_normal((2, 3, m.nu))
+    ctrls, twists, dtwists = stack_inverse_dynamics(inverses)(trajs)
+    for inverse, traj, ctrl, twist, dtwist in zip(inverses, trajs, ctrls, twists, dtwists):
+        expected = inverse(traj)
+        assert np.allclose(ctrl, expected[0])
+        assert np.allclose(twist, expected[2]) and np.allclose(dtwist, expected[3])
+
+
+def test_scene(make_config, frame_logger):
+    cfg = make_config("wooden-tray-2", 0.1)
+    scene_cfg = SceneConfig(n_replicas=3, target_names=["wooden-tray-2", "hammer"])
+    m, d, replicas = generate_scene_model_data(cfg, scene_cfg)
+    assert ["wooden-tray-2", "hammer", "wooden-tray-2"] == [r.target_name for r in replicas]
+    assert 3 * replicas[0].m.nq == m.nq and 3 * replicas[0].m.nu == m.nu
+
+    # Collision geoms of different replicas share no bit
+    colliding = 0 != m.geom_contype
+    owners = [np.isin(m.geom_bodyid, r.bodies) & colliding for r in replicas]
+    assert all(owner.any() for owner in owners)
+    bits = [np.bitwise_or.reduce(m.geom_contype[owner]) for owner in owners]
+    assert all(0 == bits[i] & bits[j] for i in range(3) for j in range(i + 1, 3))
+
+    planners = [autoinstantiate(cfg.planner, r.m, r.d) for r in replicas]
+    controllers = [autoinstantiate(cfg.controller, r.m, r.d) for r in replicas]
+    physics = simulate_scene(m, d, replicas, 50, planners, controllers)
+
+    # A replica runs the episode of its model alone
+    m_alone, d_alone, _ = generate_model_data(cfg)
+    expected = simulate(m_alone, d_alone, frame_logger,
+                        autoinstantiate(cfg.planner, m_alone, d_alone),
+                        autoinstantiate(cfg.controller, m_alone, d_alone))
+    for k in [0, 2]:
+        for key in ["time", "fts_sen_clean", "regressors", "states"]:
+            assert np.allclose(physics[k][key], expected[key], atol=1e-8)
+    assert not np.allclose(physics[1]["fts_sen_clean"], expected["fts_sen_clean"])
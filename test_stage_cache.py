@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from caches import StageCache, StageCacheConfig
+
+
+def get_cache(tmp_path):
+    return StageCache(StageCacheConfig(cache_dir=str(tmp_path / ".cache"), track_code=False))
+
+
+def test_run(tmp_path):
+    cache = get_cache(tmp_path)
+    cfg = OmegaConf.create(dict(planner=dict(duration=1.0), logger=dict(fps=30)))
+    files_dir = tmp_path / "dataset"
+    files_dir.mkdir()
+    calls = []
+
+    def stage():
+        calls.append(cfg.planner.duration)
+        (files_dir / "states.npz").write_text(str(cfg.planner.duration))
+        return dict(states=np.arange(3) * cfg.planner.duration)
+
+    def run():
+        key = cache.key("simulate", cfg.planner)
+        return cache.run("simulate", key, stage, lambda _: [files_dir / "states.npz"], files_dir)
+
+    run()
+    assert not cache.hits["simulate"]
+
+    # Skipped with its files restored while the inputs are unchanged, even if
+    # settings it does not read change
+    (files_dir / "states.npz").unlink()
+    cfg.logger.fps = 60
+    outputs = run()
+    assert cache.hits["simulate"] and [1.0] == calls
+    assert np.array_equal(outputs["states"], [0.0, 1.0, 2.0])
+    assert "1.0" == (files_dir / "states.npz").read_text()
+
+    # Rerun when they change
+    cfg.planner.duration = 2.0
+    outputs = run()
+    assert not cache.hits["simulate"] and [1.0, 2.0] == calls
+    assert np.array_equal(outputs["states"], [0.0, 2.0, 4.0])
+
+    # Always rerun if disabled
+    cache.enabled = False
+    run()
+    assert not cache.hits["simulate"] and [1.0, 2.0, 2.0] == calls
+
+
+def test_concurrent_publish(tmp_path):
+    cache = get_cache(tmp_path)
+    key = cache.key("render", "inputs")
+    outputs = dict(frames=np.arange(100_000))
+
+    def publish_and_load(_):
+        cache.save("render", key, outputs)
+        return cache.load("render", key)
+
+    with ThreadPoolExecutor(8) as executor:
+        loaded = list(executor.map(publish_and_load, range(32)))
+
+    # Every run sees a complete entry, and no temporary directory is left
+    assert all(np.array_equal(outputs["frames"], o["frames"]) for o in loaded)
+    assert [key] == [p.name for p in (tmp_path / ".cache" / "render").iterdir()]
@@ -0,0 +1,21 @@
+import numpy as np
+from mujoco._functions import mj_forward
+
+from core import generate_model_data
+from dynamics import StateSpace, StateSpaceConfig
+
+
+def test_analytic_linearization(make_config):
+    m, d, _ = generate_model_data(make_config("hammer"))
+
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        d.qpos[:] = rng.uniform(-1, 1, m.nq)
+        d.qvel[:] = rng.standard_normal(m.nv)
+        d.ctrl[:] = rng.standard_normal(m.nu)
+        mj_forward(m, d)
+        analytic = StateSpace(StateSpaceConfig(method="analytic"), m, d)
+        finite_difference = StateSpace(StateSpaceConfig(method="finite_difference"), m, d)  # mjd_transitionFD
+
+        assert np.allclose(analytic.A, finite_difference.A, rtol=0, atol=1e-6)
+        assert np.allclose(analytic.B, finite_difference.B, rtol=0, atol=1e-6)
@@ -0,0 +1,68 @@
+import os
+import shutil
+from pathlib import Path
+
+import catalog.target_catalog as target_catalog
+from catalog import TargetCatalog, TargetCatalogConfig
+
+
+def get_catalog(tmp_path, monkeypatch):
+    targets_dir = tmp_path / "targets"
+    shutil.copytree(Path("xml_models/targets/hammer"), targets_dir / "hammer")
+    catalog = TargetCatalog(TargetCatalogConfig(targets_dir=str(targets_dir),
+                                                path=str(tmp_path / "target_catalog.json")))
+
+    # Count the hashes and the builds to tell a skipped target from a rebuilt one
+    calls = dict(hash_files=0, build_entry=0)
+
+    def hash_files(*args, **kwargs):
+        calls["hash_files"] += 1
+        return _hash_files(*args, **kwargs)
+
+    def build_entry(*args, **kwargs):
+        calls["build_entry"] += 1
+        return _build_entry(*args, **kwargs)
+
+    _hash_files, _build_entry = target_catalog.hash_files, catalog._build_entry
+    monkeypatch.setattr(target_catalog, "hash_files", hash_files)
+    monkeypatch.setattr(catalog, "_build_entry", build_entry)
+
+    return catalog, targets_dir / "hammer", calls
+
+
+def test_refresh(tmp_path, monkeypatch):
+    catalog, target_dir, calls = get_catalog(tmp_path, monkeypatch)
+    assert catalog.table().empty
+
+    assert catalog.refresh() == ["hammer"]
+    assert calls == dict(hash_files=1, build_entry=1)
+    entry = dict(catalog.entries["hammer"])
+    assert entry["error"] is None
+    assert list(catalog.table().index) == ["hammer"]
+
+    # Untouched: skipped without reading its files
+    assert catalog.refresh() == []
+    assert calls == dict(hash_files=1, build_entry=1)
+    assert catalog.entries["hammer"] == entry
+
+    # Touched only: the fingerprint is updated without a rebuild
+    csv_path = target_dir / "object_cad_gt.csv"
+    stat = csv_path.stat()
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert catalog.refresh() == []
+    assert calls == dict(hash_files=2, build_entry=1)
+    assert catalog.entries["hammer"]["content_hash"] == entry["content_hash"]
+    assert catalog.entries["hammer"]["fingerprint"] != entry["fingerprint"]
+
+    # Content changed: rebuilt
+    xml_path = target_dir / "object.xml"
+    xml_path.write_text(xml_path.read_text() + "<!-- changed -->\n")
+    assert catalog.refresh() == ["hammer"]
+    assert calls == dict(hash_files=3, build_entry=2)
+    assert catalog.entries["hammer"]["content_hash"] != entry["content_hash"]
+    assert catalog.entries["hammer"]["error"] is None
+
+    # The index is reloaded as saved
+    reloaded = TargetCatalog(TargetCatalogConfig(targets_dir=str(target_dir.parent),
+                                                 path=str(catalog.path)))
+    assert reloaded.entries == catalog.entries
@@ -0,0 +1,43 @@
+import numpy as np
+
+from loggers import Telemetry, TelemetryConfig
+from visualization import lttb_indices, minmax_indices
+
+
+def test_downsampling():
+    x = np.linspace(0, 10, 100001)
+    y = np.sin(x) + (np.arange(len(x)) == 54321) * 5  # a spike kept by both
+
+    indices = minmax_indices(y, 500)
+    assert len(indices) <= 1002 and np.all(np.diff(indices) > 0)
+    assert 54321 in indices and {0, len(x) - 1} <= set(indices)
+    assert np.isclose(y[indices].min(), y.min()) and np.isclose(y[indices].max(), y.max())
+
+    indices = lttb_indices(x, y, 1000)
+    assert 1000 == len(indices) and np.all(np.diff(indices) > 0)
+    assert 54321 in indices and {0, len(x) - 1} <= set(indices)
+
+    short = np.arange(10.0)
+    assert np.array_equal(minmax_indices(short, 500), np.arange(10))
+    assert np.array_equal(lttb_indices(short, short, 1000), np.arange(10))
+
+
+def test_telemetry(tmp_path):
+    image_path = tmp_path / "telemetry.png"
+    telemetry = Telemetry(TelemetryConfig(enabled=True, interval=2, history=50, rate=50.0,
+                                          image_path=str(image_path)))
+    telemetry.start(n_joints=6)
+
+    rng = np.random.default_rng(0)
+    params = rng.standard_normal(10)
+    for step in range(200):
+        if telemetry.due(step):
+            telemetry.publish(1e-3 * step, rng.standard_normal(6), rng.standard_normal(3),
+                              rng.standard_normal(3))
+        regressor = rng.standard_normal((6, 10))
+        telemetry.accumulate(regressor, regressor @ params)
+
+    assert 100 == telemetry.control[0]  # published samples, the ring holding the last 50
+    assert np.allclose(np.linalg.solve(telemetry.gram, telemetry.moment), params)
+    telemetry.close(timeout=30.0)  # the final draw
+    assert image_path.is_file()
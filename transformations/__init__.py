@@ -1,2 +1,3 @@
+from .kernels import *
 from .poses import *
 from .transformations import *
@@ -0,0 +1,297 @@
+"""Batched SO(3)/SE(3) kernels over arrays of shape (..., k).
+
+They follow the conventions of liegroups: a twist is [rho, phi] (linear
+first), a pose is a 4x4 homogeneous matrix and a quaternion is wxyz unless
+given otherwise. Unlike the liegroups objects, every function takes a stack of
+elements at once, so a trajectory is processed without a per-element object.
+"""
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+SMALL_ANGLE = 1e-10  # [rad], below which the first-order expansions are used
+
+
+# =============================================================================
+# Lie algebra
+# =============================================================================
+def so3_wedge(phi: NDArray) -> NDArray:
+    """(..., 3) -> (..., 3, 3) skew-symmetric matrices"""
+
+    phi = np.asarray(phi, dtype=float)
+    x, y, z = phi[..., 0], phi[..., 1], phi[..., 2]
+    Phi = np.zeros((*phi.shape[:-1], 3, 3))
+    Phi[..., 0, 1], Phi[..., 0, 2] = -z, y
+    Phi[..., 1, 0], Phi[..., 1, 2] = z, -x
+    Phi[..., 2, 0], Phi[..., 2, 1] = -y, x
+    return Phi
+
+
+def so3_vee(Phi: NDArray) -> NDArray:
+    Phi = np.asarray(Phi, dtype=float)
+    return np.stack([Phi[..., 2, 1], Phi[..., 0, 2], Phi[..., 1, 0]], axis=-1)
+
+
+def se3_wedge(xi: NDArray) -> NDArray:
+    """(..., 6) -> (..., 4, 4) twist matrices"""
+
+    xi = np.asarray(xi, dtype=float)
+    Xi = np.zeros((*xi.shape[:-1], 4, 4))
+    Xi[..., :3, :3] = so3_wedge(xi[..., 3:])
+    Xi[..., :3, 3] = xi[..., :3]
+    return Xi
+
+
+def se3_vee(Xi: NDArray) -> NDArray:
+    Xi = np.asarray(Xi, dtype=float)
+    return np.concatenate([Xi[..., :3, 3], so3_vee(Xi[..., :3, :3])], axis=-1)
+
+
+def se3_curlywedge(xi: NDArray) -> NDArray:
+    """(..., 6) -> (..., 6, 6) adjoint representations of twists, ad(xi)"""
+
+    xi = np.asarray(xi, dtype=float)
+    Phi = so3_wedge(xi[..., 3:])
+    Psi = np.zeros((*xi.shape[:-1], 6, 6))
+    Psi[..., :3, :3] = Phi
+    Psi[..., :3, 3:] = so3_wedge(xi[..., :3])
+    Psi[..., 3:, 3:] = Phi
+    return Psi
+
+
+# =============================================================================
+# SO(3)
+# =============================================================================
+def _split_angle_axis(phi: NDArray) -> tuple[NDArray, NDArray, NDArray]:
+    angle = np.linalg.norm(phi, axis=-1)
+    small = angle < SMALL_ANGLE
+    axis = phi / np.where(small, 1, angle)[..., np.newaxis]
+    return angle, axis, small
+
+
+def so3_exp(phi: NDArray) -> NDArray:
+    """(..., 3) -> (..., 3, 3) rotation matrices by the Rodrigues formula"""
+
+    phi = np.asarray(phi, dtype=float)
+    angle, axis, small = _split_angle_axis(phi)
+    s, c = np.sin(angle)[..., np.newaxis, np.newaxis], np.cos(angle)[..., np.newaxis, np.newaxis]
+    R = c * np.eye(3) + (1 - c) * axis[..., :, np.newaxis] * axis[..., np.newaxis, :] \
+      + s * so3_wedge(axis)
+    return np.where(small[..., np.newaxis, np.newaxis], np.eye(3) + so3_wedge(phi), R)
+
+
+def so3_log(R: NDArray) -> NDArray:
+    """(..., 3, 3) -> (..., 3) rotation vectors"""
+
+    R = np.asarray(R, dtype=float)
+    cos_angle = np.clip(0.5 * (np.trace(R, axis1=-2, axis2=-1) - 1), -1, 1)
+    angle = np.arccos(cos_angle)
+    sin_angle = np.sin(angle)
+    small = angle < SMALL_ANGLE
+    near_pi = ~small & (sin_angle < 1e-6)
+
+    antisym = so3_vee(R - np.swapaxes(R, -1, -2))
+    scale = np.where(small, 0.5, angle / (2 * np.where(small | near_pi, 1, sin_angle)))
+    phi = scale[..., np.newaxis] * antisym
+
+    if near_pi.any():
+        # R = 2 a a^T - I at pi, read the axis from the column of the largest
+        # diagonal term and its sign from the antisymmetric part
+        B = 0.5 * (R[near_pi] + np.eye(3))
+        k = np.argmax(np.diagonal(B, axis1=-2, axis2=-1), axis=-1)
+        axis = B[np.arange(len(B)), :, k]
+        axis /= np.linalg.norm(axis, axis=-1, keepdims=True)
+        sign = np.where(np.einsum("ni,ni->n", axis, antisym[near_pi]) < 0, -1, 1)
+        phi[near_pi] = (sign * angle[near_pi])[:, np.newaxis] * axis
+
+    return phi
+
+
+def so3_left_jacobian(phi: NDArray) -> NDArray:
+    phi = np.asarray(phi, dtype=float)
+    angle, axis, small = _split_angle_axis(phi)
+    safe_angle = np.where(small, 1, angle)
+    s = (np.sin(angle) / safe_angle)[..., np.newaxis, np.newaxis]
+    c = ((1 - np.cos(angle)) / safe_angle)[..., np.newaxis, np.newaxis]
+    J = s * np.eye(3) + (1 - s) * axis[..., :, np.newaxis] * axis[..., np.newaxis, :] \
+      + c * so3_wedge(axis)
+    return np.where(small[..., np.newaxis, np.newaxis], np.eye(3) + 0.5 * so3_wedge(phi), J)
+
+
+def so3_inv_left_jacobian(phi: NDArray) -> NDArray:
+    phi = np.asarray(phi, dtype=float)
+    angle, axis, small = _split_angle_axis(phi)
+    half = 0.5 * np.where(small, 1, angle)
+    cot = (half / np.tan(half))[..., np.newaxis, np.newaxis]
+    J = cot * np.eye(3) + (1 - cot) * axis[..., :, np.newaxis] * axis[..., np.newaxis, :] \
+      - half[..., np.newaxis, np.newaxis] * so3_wedge(axis)
+    return np.where(small[..., np.newaxis, np.newaxis], np.eye(3) - 0.5 * so3_wedge(phi), J)
+
+
+# =============================================================================
+# SE(3)
+# =============================================================================
+def se3_exp(xi: NDArray) -> NDArray:
+    """(..., 6) -> (..., 4, 4) poses"""
+
+    xi = np.asarray(xi, dtype=float)
+    T = np.zeros((*xi.shape[:-1], 4, 4))
+    T[..., :3, :3] = so3_exp(xi[..., 3:])
+    T[..., :3, 3] = np.einsum("...ij,...j->...i", so3_left_jacobian(xi[..., 3:]), xi[..., :3])
+    T[..., 3, 3] = 1
+    return T
+
+
+def se3_log(T: NDArray) -> NDArray:
+    """(..., 4, 4) -> (..., 6) twists"""
+
+    T = np.asarray(T, dtype=float)
+    phi = so3_log(T[..., :3, :3])
+    rho = np.einsum("...ij,...j->...i", so3_inv_left_jacobian(phi), T[..., :3, 3])
+    return np.concatenate([rho, phi], axis=-1)
+
+
+def screw_exp(screws: NDArray, thetas: NDArray) -> NDArray:
+    """Poses exp(screw * theta) of unit joint screws (..., 6) and coordinates (...,).
+
+    Pure prismatic screws (zero angular part) are a translation and pure
+    revolute ones (unit angular part) use sin and cos of the coordinate
+    directly. The others fall back on se3_exp.
+    """
+
+    screws = np.asarray(screws, dtype=float)
+    thetas = np.asarray(thetas, dtype=float)
+    screws, thetas = np.broadcast_arrays(screws, thetas[..., np.newaxis])
+    thetas = thetas[..., 0]
+    v, w = screws[..., :3], screws[..., 3:]
+    w_norm = np.linalg.norm(w, axis=-1)
+    prismatic = w_norm < SMALL_ANGLE
+    revolute = np.abs(w_norm - 1) < 1e-12
+
+    T = np.zeros((*screws.shape[:-1], 4, 4))
+    T[..., 3, 3] = 1
+    T[..., :3, :3] = np.eye(3)
+
+    # Prismatic: [[I, v theta], [0, 1]]
+    T[prismatic, :3, 3] = v[prismatic] * thetas[prismatic, np.newaxis]
+
+    # Revolute: R = I + s W + (1 - c) W^2, p = (I theta + (1 - c) W + (theta - s) W^2) v
+    W = so3_wedge(w[revolute])
+    W2 = W @ W
+    theta = thetas[revolute][:, np.newaxis, np.newaxis]
+    s, c = np.sin(theta), np.cos(theta)
+    T[revolute, :3, :3] = np.eye(3) + s * W + (1 - c) * W2
+    G = theta * np.eye(3) + (1 - c) * W + (theta - s) * W2
+    T[revolute, :3, 3] = np.einsum("nij,nj->ni", G, v[revolute])
+
+    general = ~(prismatic | revolute)
+    T[general] = se3_exp(screws[general] * thetas[general, np.newaxis])
+
+    return T
+
+
+def se3_inv(T: NDArray) -> NDArray:
+    T = np.asarray(T, dtype=float)
+    R_T = np.swapaxes(T[..., :3, :3], -1, -2)
+    inv = np.zeros_like(T)
+    inv[..., :3, :3] = R_T
+    inv[..., :3, 3] = -np.einsum("...ij,...j->...i", R_T, T[..., :3, 3])
+    inv[..., 3, 3] = 1
+    return inv
+
+
+def se3_compose(*Ts: NDArray) -> NDArray:
+    """Broadcast product T_1 T_2 ... T_n of stacks of poses"""
+
+    composed = np.asarray(Ts[0], dtype=float)
+    for T in Ts[1:]:
+        composed = composed @ T
+    return composed
+
+
+def se3_adjoint(T: NDArray) -> NDArray:
+    """(..., 4, 4) -> (..., 6, 6), [[R, t^ R], [0, R]]"""
+
+    T = np.asarray(T, dtype=float)
+    R = T[..., :3, :3]
+    Ad = np.zeros((*T.shape[:-2], 6, 6))
+    Ad[..., :3, :3] = R
+    Ad[..., :3, 3:] = so3_wedge(T[..., :3, 3]) @ R
+    Ad[..., 3:, 3:] = R
+    return Ad
+
+
+def se3_transform(T: NDArray, points: NDArray) -> NDArray:
+    """Apply poses (..., 4, 4) to points (..., 3)"""
+
+    T = np.asarray(T, dtype=float)
+    return np.einsum("...ij,...j->...i", T[..., :3, :3], points) + T[..., :3, 3]
+
+
+# =============================================================================
+# Conversions
+# =============================================================================
+def quat_to_matrix(q: NDArray, ordering: str = "wxyz") -> NDArray:
+    """(..., 4) unit quaternions -> (..., 3, 3) rotation matrices"""
+
+    q = np.asarray(q, dtype=float)
+    if "xyzw" == ordering:
+        x, y, z, w = np.moveaxis(q, -1, 0)
+    else:
+        w, x, y, z = np.moveaxis(q, -1, 0)
+
+    R = np.empty((*q.shape[:-1], 3, 3))
+    R[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    R[..., 0, 1] = 2 * (x * y - w * z)
+    R[..., 0, 2] = 2 * (w * y + x * z)
+    R[..., 1, 0] = 2 * (w * z + x * y)
+    R[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    R[..., 1, 2] = 2 * (y * z - w * x)
+    R[..., 2, 0] = 2 * (x * z - w * y)
+    R[..., 2, 1] = 2 * (w * x + y * z)
+    R[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return R
+
+
+def matrix_to_quat(R: NDArray, ordering: str = "wxyz") -> NDArray:
+    """(..., 3, 3) rotation matrices -> (..., 4) unit quaternions with w >= 0"""
+
+    R = np.asarray(R, dtype=float)
+    # Candidates proportional to the quaternion from each of the diagonal
+    # terms, keeping the best conditioned one (Shepperd's method)
+    r00, r11, r22 = R[..., 0, 0], R[..., 1, 1], R[..., 2, 2]
+    candidates = np.stack([
+        np.stack([1 + r00 + r11 + r22, R[..., 2, 1] - R[..., 1, 2],
+                  R[..., 0, 2] - R[..., 2, 0], R[..., 1, 0] - R[..., 0, 1]], axis=-1),
+        np.stack([R[..., 2, 1] - R[..., 1, 2], 1 + r00 - r11 - r22,
+                  R[..., 0, 1] + R[..., 1, 0], R[..., 0, 2] + R[..., 2, 0]], axis=-1),
+        np.stack([R[..., 0, 2] - R[..., 2, 0], R[..., 0, 1] + R[..., 1, 0],
+                  1 - r00 + r11 - r22, R[..., 1, 2] + R[..., 2, 1]], axis=-1),
+        np.stack([R[..., 1, 0] - R[..., 0, 1], R[..., 0, 2] + R[..., 2, 0],
+                  R[..., 1, 2] + R[..., 2, 1], 1 - r00 - r11 + r22], axis=-1),
+    ], axis=-2)  # (..., 4, 4)
+    best = np.argmax(np.stack([r00 + r11 + r22, r00, r11, r22], axis=-1), axis=-1)
+    q = np.take_along_axis(candidates, best[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    q /= np.linalg.norm(q, axis=-1, keepdims=True)
+    q *= np.where(q[..., :1] < 0, -1, 1)
+
+    return q[..., [1, 2, 3, 0]] if "xyzw" == ordering else q
+
+
+def tq_to_matrix(t: NDArray, q: NDArray) -> NDArray:
+    """Poses (..., 4, 4) from translations (..., 3) and wxyz quaternions (..., 4)"""
+    return tr_to_matrix(t, quat_to_matrix(q))
+
+
+def tr_to_matrix(t: NDArray, r: NDArray) -> NDArray:
+    """Poses (..., 4, 4) from translations (..., 3) and rotations (..., 3, 3) or (..., 9)"""
+
+    t = np.asarray(t, dtype=float)
+    r = np.asarray(r, dtype=float)
+    r = r.reshape((*r.shape[:-1], 3, 3)) if 9 == r.shape[-1] else r
+    T = np.zeros((*np.broadcast_shapes(t.shape[:-1], r.shape[:-2]), 4, 4))
+    T[..., :3, :3] = r
+    T[..., :3, 3] = t
+    T[..., 3, 3] = 1
+    return T
@@ -1,4 +1,6 @@
+import subprocess
 from collections.abc import Iterable
+from pathlib import Path
 
 from mujoco._enums import mjtObj
 from mujoco._functions import mj_name2id
@@ -24,6 +26,8 @@ def get_element_id(m, elem_type, name):
 
     if "body"== elem_type:
         obj_enum = mjtObj.mjOBJ_BODY
+    elif "actuator"== elem_type:
+        obj_enum = mjtObj.mjOBJ_ACTUATOR
     elif "camera"== elem_type:
         obj_enum = mjtObj.mjOBJ_CAMERA
     elif "joint"== elem_type:
@@ -46,3 +50,16 @@ def get_element_id(m, elem_type, name):
 
     return id
 
+
+def get_code_version():
+    """Get the commit hash of the repository, suffixed with '-dirty' if modified"""
+    repo_dir = Path(__file__).parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return f"{commit}-dirty" if status else commit
@@ -17,7 +17,70 @@ orien_labels_w_tgt = [orien_labels, [label + "-tgt" for label in orien_labels]]
 act_tgt_ls = ["-", "--"]
 
 
-def ax_plot_lines(ax, x, ys, ylabel, c=cb_rgb, alpha=0.5, **kargs):
+def minmax_indices(y, n_buckets):
+    """Indices of the min and the max of y in each of n_buckets equal buckets, in order.
+
+    The envelope of a signal is kept as drawn with a bucket per pixel column.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    padded = np.concatenate([y, np.full(size * n_buckets - n, y[-1])]).reshape(n_buckets, size)
+    offsets = size * np.arange(n_buckets)
+    indices = np.concatenate([[0, n - 1], offsets + padded.argmin(axis=1),
+                              offsets + padded.argmax(axis=1)])
+
+    return np.unique(np.minimum(indices, n - 1))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of n_out points of (x, y) by the largest triangle three buckets.
+
+    The first and the last points are kept and a point is picked per bucket in
+    between, the one forming the largest triangle with the point picked in the
+    previous bucket and the mean of the next one (S. Steinarsson,
+    "Downsampling Time Series for Visual Representation").
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(int), n)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi, next_hi = edges[i], edges[i + 1], edges[i + 2]
+        mean_x, mean_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        areas = np.abs((x[a] - mean_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y - y[a]))
+        a = lo + areas.argmax()
+        indices[i + 1] = a
+
+    return indices
+
+
+def downsample(ax, x, y, method="minmax", max_points=None):
+    """Points of a line to draw on ax, up to max_points or twice its width in pixels"""
+    if method is None:
+        return x, y
+    if max_points is None:
+        max_points = 2 * max(int(ax.get_window_extent().width), 1)
+
+    if "minmax" == method:
+        indices = minmax_indices(y, max_points // 2)
+    elif "lttb" == method:
+        indices = lttb_indices(np.asarray(x, dtype=float), y, max_points)
+    else:
+        raise ValueError(f"'method' has to be either 'minmax', 'lttb' or None. "
+                         f"'{method}' is invalid.")
+
+    return np.asarray(x)[indices], y[indices]
+
+
+def ax_plot_lines(ax, x, ys, ylabel, c=cb_rgb, alpha=0.5, method="minmax", max_points=None,
+                  **kargs):
     # Update default plot variables with kargs
     defaults = {"c": c, "alpha": alpha}
     defaults.update(kargs)
@@ -32,9 +95,9 @@ def ax_plot_lines(ax, x, ys, ylabel, c=cb_rgb, alpha=0.5, **kargs):
     clip = min((len_x, len_y))
 
     for i, y in enumerate(ys):
+        # Only the points distinguishable at the resolution of the axes are drawn
         ax.plot(
-            x[:clip],
-            y[:clip],
+            *downsample(ax, x[:clip], y[:clip], method, max_points),
             **others,
             **{k: v[i % len(v)] for k, v in arr_like.items()},
             )